@@ -32,6 +32,7 @@ import warnings
 import dj_database_url
 
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 
 
 ##########################################################################
@@ -96,11 +97,51 @@ DATABASES = {
 
 DATABASES["default"]["ENGINE"] = "django.db.backends.postgresql_psycopg2"
 
+# A second connection to the same database that background jobs use to report their
+# progress outside of the job's transaction so that it is visible while the job runs.
+DATABASES["progress"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
+##########################################################################
+## Cache
+##########################################################################
+
+# Backends that do not require an external service; the database backend requires
+# the cache table to be created with `python manage.py createcachetable`. The cache
+# must be shared by the web and worker processes since invalidation happens in the
+# process that made the write, so the local memory backend is only for development
+# with a single process (the parley.E001 check refuses it when DEBUG is off).
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "parlance"),
+    "file": ("django.core.cache.backends.filebased.FileBasedCache", "/var/tmp/parlance"),
+    "database": ("django.core.cache.backends.db.DatabaseCache", "parlance_cache"),
+}
+
+PARLANCE_CACHE_BACKEND = environ_setting("PARLANCE_CACHE_BACKEND", default="database")
+if PARLANCE_CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"PARLANCE_CACHE_BACKEND must be one of {', '.join(CACHE_BACKENDS)}"
+    )
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[PARLANCE_CACHE_BACKEND][0],
+        "LOCATION": environ_setting(
+            "PARLANCE_CACHE_LOCATION", default=CACHE_BACKENDS[PARLANCE_CACHE_BACKEND][1]
+        ),
+        "TIMEOUT": int(environ_setting("PARLANCE_CACHE_TIMEOUT", default=300)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(environ_setting("PARLANCE_CACHE_MAX_ENTRIES", default=10000)),
+        },
+    },
+}
+
+
 ##########################################################################
 ## Runtime
 ##########################################################################
@@ -229,6 +270,77 @@ REST_FRAMEWORK = {
 }
 
 
+##########################################################################
+## Parlance Application Settings
+##########################################################################
+
+# Number of rows written per bulk insert when ingesting uploaded JSONL files
+PARLANCE_UPLOAD_BATCH_SIZE = int(
+    environ_setting("PARLANCE_UPLOAD_BATCH_SIZE", default=1000)
+)
+
+# Maximum size in bytes of a single JSONL line; bounds the upload streaming buffer
+PARLANCE_UPLOAD_MAX_LINE_SIZE = int(
+    environ_setting("PARLANCE_UPLOAD_MAX_LINE_SIZE", default=32 * 2**20)
+)
+
+# Reviewer agreement parameters used when reviews are created, updated, or deleted
+PARLANCE_AGREEMENT_THRESHOLD = float(
+    environ_setting("PARLANCE_AGREEMENT_THRESHOLD", default=0.5)
+)
+
+PARLANCE_AGREEMENT_LIKERT_METHOD = environ_setting(
+    "PARLANCE_AGREEMENT_LIKERT_METHOD", default="mean"
+)
+
+# Database alias used to report progress from within a job's transaction
+PARLANCE_PROGRESS_DATABASE = "progress"
+
+# Seconds a running job may go without a heartbeat before it is assumed its worker
+# died and the job is claimed again; must be several heartbeat intervals long.
+PARLANCE_JOB_TIMEOUT = int(environ_setting("PARLANCE_JOB_TIMEOUT", default=300))
+
+# Seconds between the heartbeats of a running job
+PARLANCE_JOB_HEARTBEAT_INTERVAL = int(
+    environ_setting("PARLANCE_JOB_HEARTBEAT_INTERVAL", default=30)
+)
+
+# Seconds before the first retry of a failed job; doubles with every attempt
+PARLANCE_JOB_RETRY_DELAY = int(
+    environ_setting("PARLANCE_JOB_RETRY_DELAY", default=30)
+)
+
+# Seconds that chart payloads are cached; charts are also re-keyed when metrics change
+PARLANCE_CHART_CACHE_TIMEOUT = int(
+    environ_setting("PARLANCE_CHART_CACHE_TIMEOUT", default=86400)
+)
+
+# Seconds that the dashboard statistics are cached; also invalidated on changes
+PARLANCE_STATS_CACHE_TIMEOUT = int(
+    environ_setting("PARLANCE_STATS_CACHE_TIMEOUT", default=3600)
+)
+
+# Tables estimated to have at least this many rows are not counted exactly
+PARLANCE_STATS_EXACT_LIMIT = int(
+    environ_setting("PARLANCE_STATS_EXACT_LIMIT", default=100000)
+)
+
+# Number of rows removed per statement when evaluations are deleted in the background
+PARLANCE_DELETE_CHUNK_SIZE = int(
+    environ_setting("PARLANCE_DELETE_CHUNK_SIZE", default=5000)
+)
+
+# Seconds that rendered template fragments are cached; also invalidated on changes
+PARLANCE_FRAGMENT_CACHE_TIMEOUT = int(
+    environ_setting("PARLANCE_FRAGMENT_CACHE_TIMEOUT", default=3600)
+)
+
+# Seconds between writes of each process's cache hit and miss counts to the cache
+PARLANCE_CACHE_STATS_INTERVAL = int(
+    environ_setting("PARLANCE_CACHE_STATS_INTERVAL", default=10)
+)
+
+
 ##########################################################################
 ## Logging and Error Reporting
 ##########################################################################
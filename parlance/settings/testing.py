@@ -18,7 +18,7 @@ Configuration for the testing environment.
 ##########################################################################
 
 from .base import *  # noqa
-from .base import REST_FRAMEWORK
+from .base import REST_FRAMEWORK, CACHES, CACHE_BACKENDS
 
 
 ##########################################################################
@@ -39,6 +39,11 @@ STATICFILES_STORAGE = "django.contrib.staticfiles.storage.StaticFilesStorage"
 MEDIA_ROOT = "/tmp/parlance_test/media"
 STATIC_ROOT = "/tmp/parlance_test/static"
 
+## Tests run in a single process and do not create the cache table
+CACHES["default"]["BACKEND"] = CACHE_BACKENDS["locmem"][0]
+CACHES["default"]["LOCATION"] = CACHE_BACKENDS["locmem"][1]
+SILENCED_SYSTEM_CHECKS = ["parley.E001"]
+
 
 ##########################################################################
 ## Django REST Framework
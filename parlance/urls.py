@@ -42,10 +42,11 @@ from parley.views import (
     EvaluationCreate,
     EvaluationDelete,
 )
-from parley.views import DownloadPrompts, DownloadAnalytics
-from parlance.views import Dashboard, AccountSettings, AccountProfile
+from parley.views import DownloadPrompts, DownloadAnalytics, ExportEvaluation
+from parlance.views import Dashboard, AccountSettings, AccountProfile, CacheStats
 from parley.views import (
     UploaderFormView,
+    UploadStatus,
     CreateReviewTask,
     ResponseDetail,
     UpdateResponseReview,
@@ -60,6 +61,7 @@ urlpatterns = [
     # Application Pages
     path("", Dashboard.as_view(), name="dashboard"),
     path("upload/", UploaderFormView.as_view(), name="upload"),
+    path("upload/<uuid:pk>", UploadStatus.as_view(), name="upload-status"),
     path("account/profile", AccountProfile.as_view(), name="account-profile"),
     path("account/settings", AccountSettings.as_view(), name="account-settings"),
     path("evaluations/", EvaluationList.as_view(), name="evaluations-list"),
@@ -75,6 +77,11 @@ urlpatterns = [
         DownloadAnalytics.as_view(),
         name="evaluation-analytics",
     ),
+    path(
+        "evaluations/<uuid:pk>/export/<slug:table>.<slug:fmt>",
+        ExportEvaluation.as_view(),
+        name="evaluation-export",
+    ),
     path(
         "evaluations/<uuid:pk>/delete",
         EvaluationDelete.as_view(),
@@ -92,6 +99,7 @@ urlpatterns = [
     path("models/", LLMList.as_view(), name="llms-list"),
     path("models/<uuid:pk>", LLMDetail.as_view(), name="llm-detail"),
     path("responses/<uuid:pk>", ResponseDetail.as_view(), name="response-detail"),
+    path("cache/stats/", CacheStats.as_view(), name="cache-stats"),
     # Admin URLs
     path("admin/", admin.site.urls),
     # Authentication URLs
@@ -17,9 +17,16 @@ Site level views and pages not associated with a specific app.
 ## Imports
 ##########################################################################
 
+from django.views import View
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.db.models import OuterRef
 from django.views.generic import TemplateView
-from parley.models import LLM, Evaluation, Prompt, Response, ReviewTask
+from django.core.exceptions import PermissionDenied
+from parley.aggregates import SubqueryCount
+from parley.stats import global_statistics
+from parley.cache import cache_statistics, hit_ratio, stats
+from parley.models import LLM, Response, ReviewTask
 
 
 ##########################################################################
@@ -35,16 +42,22 @@ class Dashboard(TemplateView):
         context['page_id'] = "dashboard"
 
         # Get statistics for stat cards
-        context['n_llms'] = LLM.objects.count()
-        context["n_evaluations"] = Evaluation.objects.count()
-        context["n_prompts"] = Prompt.objects.count()
-        context["n_responses"] = Response.objects.count()
-
-        # Get evaluations and models
-        context["evaluations"] = ReviewTask.objects.filter(
-            completed_on=None, user=self.request.user
+        context.update(global_statistics())
+
+        # Get the user's pending review tasks; progress is stored on the task
+        context["evaluations"] = (
+            ReviewTask.objects.filter(
+                completed_on=None,
+                user=self.request.user,
+                model_evaluation__evaluation__deleted_on=None,
+            )
+            .select_related("model_evaluation__evaluation", "model_evaluation__model")
         )
-        context["llms"] = LLM.objects.all()[:20]
+
+        # Get models with the number of responses each
+        context["llms"] = LLM.objects.annotate(
+            n_responses=SubqueryCount(Response.objects.filter(model=OuterRef("pk")))
+        )[:20]
 
         return context
 
@@ -67,6 +80,24 @@ class AccountProfile(TemplateView):
         context["page_id"] = "profile"
 
 
+class CacheStats(View):
+    """
+    Reports the hits and misses of each cache for tuning. Statistics of processes
+    other than this one are only included once they have been flushed to the cache
+    (and are not shared at all by the local memory backend).
+    """
+
+    def get(self, request):
+        if not request.user.is_staff:
+            raise PermissionDenied("only staff users can view cache statistics")
+
+        stats.flush()
+        results = cache_statistics()
+        for counts in results.values():
+            counts["ratio"] = hit_ratio(counts["hits"], counts["misses"])
+        return JsonResponse(results)
+
+
 ##########################################################################
 ## Error Views
 ##########################################################################
@@ -23,6 +23,7 @@ from .models import Sensitive
 from .models import Evaluation, Prompt
 from .models import ReviewTask, ResponseReview
 from .models import LLM, ModelEvaluation, Response
+from .models import Job, Upload, UploadFile
 
 
 # Register your models here.
@@ -34,3 +35,25 @@ admin.site.register(ResponseReview)
 admin.site.register(LLM)
 admin.site.register(ModelEvaluation)
 admin.site.register(Response)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+
+    list_display = ("name", "status", "attempts", "run_after", "completed_on")
+    list_filter = ("status", "name")
+    search_fields = ("dedupe_key",)
+
+
+class UploadFileInline(admin.TabularInline):
+
+    model = UploadFile
+    extra = 0
+
+
+@admin.register(Upload)
+class UploadAdmin(admin.ModelAdmin):
+
+    list_display = ("id", "kind", "user", "status", "created")
+    list_filter = ("status", "kind")
+    inlines = (UploadFileInline,)
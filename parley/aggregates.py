@@ -0,0 +1,74 @@
+# parley.aggregates
+# Database aggregate functions that are not provided by Django.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 10:12:31 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: aggregates.py [] benjamin@rotational.io $
+
+"""
+Database aggregate functions that are not provided by Django.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+from django.db.models import Aggregate, FloatField, IntegerField, Subquery
+
+
+##########################################################################
+## Aggregates
+##########################################################################
+
+
+class Percentile(Aggregate):
+    """
+    Computes a continuous percentile of the expression using the Postgres ordered-set
+    aggregate PERCENTILE_CONT, interpolating between adjacent values if necessary. NULL
+    values are ignored and NULL is returned if there are no values to aggregate.
+    """
+
+    function = "PERCENTILE_CONT"
+    name = "Percentile"
+    output_field = FloatField()
+    template = "%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+
+    def __init__(self, expression, percentile, **extra):
+        percentile = float(percentile)
+        if percentile < 0 or percentile > 1:
+            raise ValueError("percentile must be in the range [0, 1]")
+        super().__init__(expression, percentile=percentile, **extra)
+
+
+class Median(Percentile):
+    """
+    Computes the median of the expression as one of its values rather than by
+    interpolation; with an even number of values it is the upper of the two middle
+    values (the discrete percentile of the values in descending order), which matches
+    the median of likert_agreement.
+    """
+
+    function = "PERCENTILE_DISC"
+    name = "Median"
+    template = "%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s DESC)"
+
+    def __init__(self, expression, **extra):
+        super().__init__(expression, 0.5, **extra)
+
+
+class SubqueryCount(Subquery):
+    """
+    Counts the rows of a correlated subquery, e.g. the prompts of each evaluation in
+    a list. Unlike annotating Count across a join, counting several relations does
+    not multiply the rows that are grouped and no GROUP BY is needed.
+    """
+
+    template = "(SELECT COUNT(*) FROM (%(subquery)s) _count)"
+    output_field = IntegerField()
+
+    def __init__(self, queryset, **extra):
+        super().__init__(queryset.order_by().values("pk"), **extra)
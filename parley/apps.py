@@ -31,4 +31,5 @@ class ParleyConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
 
     def ready(self):
+        import parley.checks # noqa
         import parley.signals # noqa
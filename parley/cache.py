@@ -0,0 +1,235 @@
+# parley.cache
+# Cache keys, invalidation, fragment caching, and hit/miss statistics.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 20:48:53 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: cache.py [] benjamin@rotational.io $
+
+"""
+Cache keys, invalidation, fragment caching, and hit/miss statistics.
+
+Evaluations and LLMs have a version token in the cache that is part of the key of
+every fragment rendered from them. Writes to an evaluation, LLM, or model evaluation
+invalidate the token of the affected objects when the transaction commits, so a new
+token (and new fragment keys) is generated the next time they are rendered; stale
+fragments are never read again and simply expire.
+
+Hits and misses are counted per process and added to counters in the cache every
+PARLANCE_CACHE_STATS_INTERVAL seconds so that they can be reported by the cachestats
+command without a cache write for every lookup.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import time
+import uuid
+import atexit
+import hashlib
+import threading
+
+from functools import partial
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+VERSION_PREFIX = "parlance:version"
+FRAGMENT_PREFIX = "parlance:fragment"
+STATS_PREFIX = "parlance:cachestats"
+
+# Names of the caches whose hits and misses are recorded
+STATS_NAMES_KEY = f"{STATS_PREFIX}:names"
+
+
+##########################################################################
+## Versions and Invalidation
+##########################################################################
+
+
+def version_key(namespace, pk) -> str:
+    return f"{VERSION_PREFIX}:{namespace}:{pk}"
+
+
+def cache_versions(namespace, pks) -> dict:
+    """
+    Returns the current version token of each object with a single cache lookup,
+    creating tokens for objects that do not have one.
+    """
+    keys = {version_key(namespace, pk): pk for pk in pks}
+    found = cache.get_many(list(keys))
+
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        found.update(cache.get_many(missing))
+
+    return {keys[key]: token for key, token in found.items()}
+
+
+def cache_version(namespace, pk) -> str:
+    return cache_versions(namespace, [pk]).get(pk)
+
+
+def invalidate(namespace, *pks):
+    """
+    Invalidates the version tokens of the objects when the current transaction
+    commits so that fragments are not re-rendered from uncommitted data.
+    """
+    if pks:
+        keys = [version_key(namespace, pk) for pk in pks]
+        transaction.on_commit(partial(cache.delete_many, keys))
+
+
+def invalidate_model_evaluations(pairs):
+    """
+    Invalidates the LLMs and evaluations of (model_id, evaluation_id) pairs, e.g.
+    after model evaluations are bulk created, updated, or deleted without signals.
+    """
+    pairs = list(pairs)
+    invalidate("llm", *{model_id for model_id, _ in pairs})
+    invalidate("evaluation", *{evaluation_id for _, evaluation_id in pairs})
+
+
+def object_digest(*objs) -> str:
+    """
+    Returns a digest of the field values of loaded objects for fragments that should
+    change whenever any of the objects change.
+    """
+    digest = hashlib.md5(usedforsecurity=False)
+    for obj in objs:
+        for field in obj._meta.concrete_fields:
+            digest.update(repr(getattr(obj, field.attname)).encode("utf-8"))
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+##########################################################################
+## Fragments
+##########################################################################
+
+
+def fragment_key(name, vary_on) -> str:
+    digest = hashlib.md5(usedforsecurity=False)
+    for part in vary_on:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b":")
+    return f"{FRAGMENT_PREFIX}:{name}:{digest.hexdigest()}"
+
+
+def cached_fragment(name, vary_on, render):
+    """
+    Returns the fragment identified by the name and the values it varies on from the
+    cache or renders and caches it if it is not cached.
+    """
+    key = fragment_key(name, vary_on)
+    value = cache.get(key)
+    if value is not None:
+        stats.record(name, hit=True)
+        return value
+
+    stats.record(name, hit=False)
+    value = render()
+    cache.set(key, value, settings.PARLANCE_FRAGMENT_CACHE_TIMEOUT)
+    return value
+
+
+##########################################################################
+## Hit and Miss Statistics
+##########################################################################
+
+
+class CacheStatistics(object):
+    """
+    Counts cache hits and misses by cache name in the process and periodically adds
+    the counts to shared counters in the cache.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def record(self, name, hit=True):
+        interval = self.interval
+        if interval is None:
+            interval = settings.PARLANCE_CACHE_STATS_INTERVAL
+
+        with self.lock:
+            self.counts[(name, "hits" if hit else "misses")] += 1
+            if time.monotonic() - self.last_flush < interval:
+                return
+            counts = self.drain()
+
+        self.write(counts)
+
+    def drain(self) -> Counter:
+        counts, self.counts = self.counts, Counter()
+        self.last_flush = time.monotonic()
+        return counts
+
+    def flush(self):
+        with self.lock:
+            counts = self.drain()
+        self.write(counts)
+
+    def write(self, counts):
+        if not counts:
+            return
+
+        names = cache.get(STATS_NAMES_KEY, set())
+        if not {name for name, _ in counts} <= names:
+            cache.set(STATS_NAMES_KEY, names | {name for name, _ in counts}, None)
+
+        for (name, kind), n in counts.items():
+            key = f"{STATS_PREFIX}:{name}:{kind}"
+            cache.add(key, 0, None)
+            try:
+                cache.incr(key, n)
+            except ValueError:
+                # The counter was evicted between the add and the incr
+                cache.set(key, n, None)
+
+
+stats = CacheStatistics()
+atexit.register(stats.flush)
+
+
+def cache_statistics() -> dict:
+    """
+    Returns the hits and misses recorded by all processes for each cache name.
+    """
+    names = sorted(cache.get(STATS_NAMES_KEY, set()))
+    keys = {
+        f"{STATS_PREFIX}:{name}:{kind}": (name, kind)
+        for name in names
+        for kind in ("hits", "misses")
+    }
+
+    results = {name: {"hits": 0, "misses": 0} for name in names}
+    for key, value in cache.get_many(list(keys)).items():
+        name, kind = keys[key]
+        results[name][kind] = value
+    return results
+
+
+def hit_ratio(hits, misses):
+    total = hits + misses
+    return hits / total if total else None
+
+
+def reset_statistics():
+    names = cache.get(STATS_NAMES_KEY, set())
+    cache.delete_many(
+        [f"{STATS_PREFIX}:{name}:{kind}" for name in names for kind in ("hits", "misses")]
+        + [STATS_NAMES_KEY]
+    )
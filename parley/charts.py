@@ -0,0 +1,261 @@
+# parley.charts
+# Chart payloads of the cached model evaluation metrics for the detail pages.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 16:47:05 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: charts.py [] benjamin@rotational.io $
+
+"""
+Chart payloads of the cached model evaluation metrics for the detail pages.
+
+Charts only change when the metrics of a model evaluation are cached (or the names
+shown in the chart change), so the JSON payloads are stored in the Django cache under
+a key that includes the latest metrics_last_cached_on of the model evaluations in the
+chart. Re-caching metrics changes the key, so stale charts are never served and the
+detail pages only run a single aggregate query to look up the key.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import json
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from parley.cache import stats
+
+
+# TODO: Use an actual color palette that we can dynamically select colors from
+COLORS = [
+    "rgb(255, 99, 132)",
+    "rgb(54, 162, 235)",
+    "rgb(255, 206, 86)",
+    "rgb(75, 192, 192)",
+    "rgb(153, 102, 255)",
+]
+
+# Metrics that are shown as percentages
+BOOLEAN_METRICS = {
+    "Similarity": ("similarity_processed", "n_similar", "n_not_similar"),
+    "Correct Label": (
+        "labels_processed",
+        "n_labeled_correctly",
+        "n_labeled_incorrectly",
+    ),
+    "Valid Output": (
+        "valid_output_processed",
+        "n_valid_output_type",
+        "n_invalid_output_type",
+    ),
+    "Leaks Sensitive": (
+        "sensitive_processed",
+        "n_leaks_sensitive",
+        "n_no_sensitive_leaks",
+    ),
+    "Is Readable": ("readability_processed", "n_readable", "n_not_readable"),
+    "Is Factual": ("factual_processed", "n_factual", "n_not_factual"),
+    "Is Correct Style": ("style_processed", "n_correct_style", "n_incorrect_style"),
+}
+
+CHART_METRICS = {
+    "Similarity": (
+        "similarity_processed",
+        "percent_similar",
+        "similarity_normalized",
+    ),
+    "Correct Label": (
+        "labels_processed",
+        "percent_labeled_correctly",
+        "labels_normalized",
+    ),
+    "Valid Output": (
+        "valid_output_processed",
+        "percent_valid_output_type",
+        "valid_output_normalized",
+    ),
+    "Leaks Sensitive": (
+        "sensitive_processed",
+        "percent_leaks_sensitive",
+        "sensitive_normalized",
+    ),
+    "Is Readable": (
+        "readability_processed",
+        "percent_readable",
+        "readability_normalized",
+    ),
+    "Is Factual": ("factual_processed", "percent_factual", "factual_normalized"),
+    "Is Correct Style": (
+        "style_processed",
+        "percent_correct_style",
+        "style_normalized",
+    ),
+    "Mean Helpfulness": (
+        "helpfulness_processed",
+        "mean_helpfulness",
+        "mean_helpfulness_normalized",
+    ),
+    "Median Helpfulness": (
+        "helpfulness_processed",
+        "median_helpfulness",
+        "median_helpfulness_normalized",
+    ),
+}
+
+
+##########################################################################
+## Cached Charts
+##########################################################################
+
+
+def chart_cache_key(prefix, obj, model_evaluations, related):
+    """
+    Computes the cache key of a chart from the latest time the metrics of its model
+    evaluations were cached and the latest modification of the objects whose names
+    are shown in the chart.
+    """
+    version = model_evaluations.aggregate(
+        n=Count("id"),
+        cached=Max("metrics_last_cached_on"),
+        modified=Max(f"{related}__modified"),
+    )
+
+    parts = [prefix, obj.pk, obj.modified, version["n"], version["cached"]]
+    parts.append(version["modified"])
+    return ":".join(
+        str(part.timestamp()) if hasattr(part, "timestamp") else str(part)
+        for part in parts
+    )
+
+
+def cached_chart(key, compute):
+    chart = cache.get(key)
+    stats.record("charts", hit=chart is not None)
+    if chart is None:
+        chart = {k: json.dumps(v) for k, v in compute().items()}
+        cache.set(key, chart, settings.PARLANCE_CHART_CACHE_TIMEOUT)
+    return chart
+
+
+def evaluation_chart(evaluation) -> dict:
+    """
+    Returns the JSON encoded labels and datasets of the chart comparing the metrics
+    of the models in the evaluation.
+    """
+    model_evaluations = evaluation.model_evaluations.all()
+    key = chart_cache_key("chart:evaluation", evaluation, model_evaluations, "model")
+    return cached_chart(
+        key, lambda: compute_evaluation_chart(model_evaluations.select_related("model"))
+    )
+
+
+def llm_chart(llm) -> dict:
+    """
+    Returns the JSON encoded labels and datasets of the chart comparing the metrics
+    of the model across its evaluations.
+    """
+    model_evaluations = llm.model_evaluations.filter(evaluation__deleted_on=None)
+    key = chart_cache_key("chart:llm", llm, model_evaluations, "evaluation")
+    return cached_chart(
+        key, lambda: compute_llm_chart(model_evaluations.select_related("evaluation"))
+    )
+
+
+##########################################################################
+## Chart Computation
+##########################################################################
+
+
+def compute_evaluation_chart(model_evaluations) -> dict:
+    """
+    Each dataset is a model and each label is a metric that has been processed for
+    at least one of the models; the values of each metric are scaled to sum to 1.
+    """
+    models = list(model_evaluations)
+    labels = [
+        label
+        for label, (has_metric, _, _) in CHART_METRICS.items()
+        if any(getattr(model, has_metric) for model in models)
+    ]
+
+    datasets = []
+    for i, model in enumerate(models):
+        color = COLORS[i % len(COLORS)]
+        dataset = {
+            "label": model.model.name,
+            "data": [],
+            "trueValues": [],
+            "borderColor": color,
+            "backgroundColor": color,
+        }
+
+        for metric_name in labels:
+            processed, true_value, normalized = CHART_METRICS[metric_name]
+            if getattr(model, processed):
+                dataset["data"].append(getattr(model, normalized))
+                true_value = round(getattr(model, true_value), 2)
+                if metric_name in BOOLEAN_METRICS:
+                    # Handle percentages
+                    true_value = f"{true_value} %"
+                dataset["trueValues"].append(true_value)
+            else:
+                dataset["data"].append(0)
+                dataset["trueValues"].append(0)
+
+        datasets.append(dataset)
+
+    # Ensure dataset values sum to 1 for each metric
+    for i in range(len(labels)):
+        total = sum(dataset["data"][i] for dataset in datasets)
+        if total > 0:
+            for dataset in datasets:
+                dataset["data"][i] = round(dataset["data"][i] / total, 2)
+
+    return {"labels": labels, "datasets": datasets}
+
+
+def compute_llm_chart(model_evaluations) -> dict:
+    """
+    Each dataset is an evaluation of the model and each label is a metric that has
+    been processed for at least one of the evaluations.
+    """
+    chart = {"labels": [], "datasets": []}
+    evaluations = {}
+    normalized_values = defaultdict(lambda: defaultdict(float))
+    for me in model_evaluations:
+        for metric, (has_metric, _, normalized) in CHART_METRICS.items():
+            if not getattr(me, has_metric):
+                continue
+
+            # Get the normalized value
+            normalized_values[metric][str(me.id)] = getattr(me, normalized)
+            evaluations[str(me.id)] = me.evaluation.name
+
+    color_index = 0
+    for metric, values in normalized_values.items():
+        chart["labels"].append(metric)
+        for model, value in values.items():
+            for ds in chart["datasets"]:
+                if ds["label"] == evaluations[model]:
+                    break
+            else:
+                color = COLORS[color_index % len(COLORS)]
+                color_index += 1
+                ds = {
+                    "label": evaluations[model],
+                    "data": [],
+                    "borderColor": color,
+                    "backgroundColor": color,
+                }
+                chart["datasets"].append(ds)
+            ds["data"].append(value)
+
+    return chart
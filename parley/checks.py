@@ -0,0 +1,49 @@
+# parley.checks
+# System checks of the parlance deployment configuration.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Mon Oct 19 10:02:41 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: checks.py [] benjamin@rotational.io $
+
+"""
+System checks of the parlance deployment configuration.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+LOCMEM_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+
+
+##########################################################################
+## Checks
+##########################################################################
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Cached fragments, statistics, and metrics are invalidated in the process that
+    writes the data (often the job worker), so the cache must be shared by all
+    processes or the web processes serve stale pages until the entries expire.
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend == LOCMEM_BACKEND and not settings.DEBUG:
+        return [
+            Error(
+                "the local memory cache is not shared between processes",
+                hint="set PARLANCE_CACHE_BACKEND to database or file",
+                obj="CACHES",
+                id="parley.E001",
+            )
+        ]
+    return []
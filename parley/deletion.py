@@ -0,0 +1,131 @@
+# parley.deletion
+# Chunked background deletion of evaluations and their data.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 20:07:14 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: deletion.py [] benjamin@rotational.io $
+
+"""
+Chunked background deletion of evaluations and their data.
+
+Deleting an evaluation with Model.delete() loads every related prompt, response, and
+review into memory to run the cascade and send the per-row signals. Instead the
+evaluation is marked as deleted, which hides it immediately, and a background job
+removes its rows table by table (children first) with DELETE statements of at most
+PARLANCE_DELETE_CHUNK_SIZE rows that are each committed on their own. The job can
+be retried at any point since every chunk only deletes rows that still exist. The
+work done by the signals is replaced by invalidating the cached statistics and
+model evaluations once the evaluation is gone.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+from django.conf import settings
+from django.utils import timezone
+from django.db import connections
+
+from parley.stats import statistics_changed
+from parley.cache import invalidate_model_evaluations
+from parley.models import Evaluation, ModelEvaluation, Prompt, Response
+from parley.models import Job, ResponseReview, ReviewTask
+
+
+##########################################################################
+## Deletion
+##########################################################################
+
+
+def mark_deleted(evaluation):
+    """
+    Hide the evaluation and enqueue the job that deletes it. Must be called in a
+    transaction so that the job is only queued if the evaluation is marked.
+    """
+    # Prevent circular import, parley.jobs imports this module to register the task.
+    from parley.jobs import enqueue
+
+    evaluation.deleted_on = timezone.now()
+    evaluation.save(update_fields=["deleted_on", "modified"])
+    statistics_changed()
+
+    return enqueue(
+        "delete_evaluation",
+        dedupe_key=f"delete_evaluation:{evaluation.pk}",
+        evaluation=evaluation.pk,
+    )
+
+
+def deletion_steps(evaluation) -> list:
+    """
+    Returns the querysets of the rows to delete in an order that does not violate
+    any foreign key constraints.
+    """
+    return [
+        ResponseReview.objects.filter(response__prompt__evaluation=evaluation),
+        Job.objects.filter(model_evaluation__evaluation=evaluation),
+        ReviewTask.objects.filter(model_evaluation__evaluation=evaluation),
+        Response.objects.filter(prompt__evaluation=evaluation),
+        Prompt.objects.filter(evaluation=evaluation),
+        ModelEvaluation.objects.filter(evaluation=evaluation),
+    ]
+
+
+def delete_chunk(queryset, chunk_size) -> int:
+    """
+    Deletes at most chunk_size rows of the queryset with a single DELETE statement
+    without fetching them or sending signals. Returns the number of rows deleted.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+
+    subquery, params = queryset.order_by().values("pk")[:chunk_size].query.sql_with_params()
+    sql = (
+        f"DELETE FROM {qn(model._meta.db_table)} "
+        f"WHERE {qn(model._meta.pk.column)} IN ({subquery})"
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def delete_evaluation(evaluation, chunk_size=None, progress=None):
+    """
+    Deletes the data of the evaluation in chunks and then the evaluation itself. If
+    progress is specified it is called with the fraction of rows deleted after each
+    chunk. Should not be called in a transaction, otherwise the chunks are not
+    committed until the whole evaluation is deleted.
+    """
+    chunk_size = chunk_size or settings.PARLANCE_DELETE_CHUNK_SIZE
+    pairs = list(
+        ModelEvaluation.objects.filter(evaluation=evaluation).values_list(
+            "model_id", "evaluation_id"
+        )
+    )
+
+    steps = deletion_steps(evaluation)
+    total = sum(queryset.count() for queryset in steps)
+
+    deleted = 0
+    for queryset in steps:
+        while True:
+            n_rows = delete_chunk(queryset, chunk_size)
+            if n_rows == 0:
+                break
+
+            deleted += n_rows
+            if progress is not None and total > 0:
+                progress(min(deleted / total, 1.0))
+
+    # Only the evaluation row and references to it (e.g. uploads) are left
+    Evaluation.objects.filter(pk=evaluation.pk).delete()
+
+    invalidate_model_evaluations(pairs)
+    statistics_changed()
+    return deleted
@@ -28,3 +28,9 @@ class ParlanceUploadError(ParlanceError):
     """
     Trouble uploading a file to import data into parlance
     """
+
+
+class ParlanceJobError(ParlanceError):
+    """
+    A background job could not be enqueued or run
+    """
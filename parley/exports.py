@@ -0,0 +1,376 @@
+# parley.exports
+# Streaming exports of evaluation data for download.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 16:02:37 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: exports.py [] benjamin@rotational.io $
+
+"""
+Streaming exports of evaluation data for download.
+
+Exports are generators that fetch rows with a server-side cursor and yield them one
+at a time so that they can be streamed with a StreamingHttpResponse; the memory used
+by an export does not depend on the size of the evaluation. Columnar exports are
+written as Parquet or Arrow IPC files one record batch at a time.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import csv
+import json
+import zlib
+
+from django.db.models import Max, Q
+from django.core.exceptions import ImproperlyConfigured
+from parley.models import Prompt, Response, ResponseReview
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa, pq = None, None
+
+
+# Number of rows fetched from the server-side cursor at a time
+CHUNK_SIZE = 2000
+
+# Number of rows per record batch (and Parquet row group) in columnar exports
+RECORD_BATCH_SIZE = 10000
+
+
+##########################################################################
+## Helpers
+##########################################################################
+
+
+class Echo(object):
+    """
+    A file-like object that returns what is written to it rather than buffering it,
+    so that csv.writer can be used to encode rows for streaming.
+    """
+
+    def write(self, value):
+        return value
+
+
+def gzip_stream(chunks, level=6):
+    """
+    Compresses a stream of bytes as a single gzip member on the fly. The compressor
+    buffers its output internally, so compressed blocks are only yielded once enough
+    input has been consumed. Partial exports that are resumed can be concatenated
+    since multi-member gzip files decompress to the concatenation of their members.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+##########################################################################
+## Prompts
+##########################################################################
+
+
+PROMPT_FIELDS = (
+    "id",
+    "system",
+    "prompt",
+    "history",
+    "notes",
+    "expected_output_type",
+    "expected_output",
+    "expected_label",
+)
+
+
+def prompts_jsonl(evaluation, offset=0, limit=None):
+    """
+    Yields the included prompts of the evaluation as encoded JSON lines. The prompts
+    are in a stable order so that an interrupted download can be resumed by skipping
+    the number of lines that were already received with offset; limit bounds the
+    number of prompts exported.
+    """
+    prompts = (
+        Prompt.objects.filter(evaluation=evaluation, exclude=False)
+        .values(*PROMPT_FIELDS)
+        .order_by("order", "-created", "id")
+    )
+
+    if limit is not None:
+        prompts = prompts[offset:offset + limit]
+    elif offset:
+        prompts = prompts[offset:]
+
+    evaluation_id = str(evaluation.pk)
+    for row in prompts.iterator(chunk_size=CHUNK_SIZE):
+        row["id"] = str(row["id"])
+        row = {"id": row.pop("id"), "evaluation": evaluation_id, **row}
+        yield (json.dumps(row) + "\n").encode("utf-8")
+
+
+##########################################################################
+## Analytics
+##########################################################################
+
+
+def analytics_pivot(models) -> dict:
+    """
+    Returns the aggregates that pivot the labels of the responses of each model, given
+    as (id, name, version) tuples, into a column per model, in the order of the models.
+    """
+    return {
+        f"model_{i}": Max("responses__label", filter=Q(responses__model_id=pk))
+        for i, (pk, _, _) in enumerate(models)
+    }
+
+
+def analytics_header(models) -> list:
+    return ["id", "prompt", "expected"] + [f"{name}-{version}" for _, name, version in models]
+
+
+def analytics_row(row, pivot, evaluation) -> list:
+    """
+    Assembles the export row of an annotated prompt; models without a response to the
+    prompt have an empty (None) label.
+    """
+    # Use the cached evaluation so that str(prompt) does not query for it
+    prompt = Prompt(
+        id=row["id"], title=row["title"], order=row["order"], evaluation=evaluation
+    )
+    return [row["id"], str(prompt), row["expected_label"]] + [row[key] for key in pivot]
+
+
+def analytics_rows(evaluation):
+    """
+    Yields the header and a row per included prompt of the evaluation with the label
+    of each model's response to the prompt. The labels are pivoted into a column per
+    model by a single grouped query rather than a query per prompt and model.
+    """
+    models = list(evaluation.llms.values_list("id", "name", "version"))
+    yield analytics_header(models)
+
+    pivot = analytics_pivot(models)
+    prompts = (
+        Prompt.objects.filter(evaluation=evaluation, exclude=False)
+        .values("id", "title", "order", "expected_label")
+        .annotate(**pivot)
+        .order_by("order", "-created")
+    )
+
+    for row in prompts.iterator(chunk_size=CHUNK_SIZE):
+        yield analytics_row(row, pivot, evaluation)
+
+
+def analytics_csv(evaluation):
+    """
+    Yields the analytics export of the evaluation as encoded CSV lines.
+    """
+    writer = csv.writer(Echo())
+    for row in analytics_rows(evaluation):
+        yield writer.writerow(row)
+
+
+##########################################################################
+## Columnar
+##########################################################################
+
+
+# Columns of each table as (field lookup, column name, type)
+COLUMNAR_TABLES = {
+    "prompts": (
+        ("id", "id", "uuid"),
+        ("title", "title", "string"),
+        ("order", "order", "int32"),
+        ("exclude", "exclude", "bool"),
+        ("system", "system", "string"),
+        ("prompt", "prompt", "string"),
+        ("expected_output_type", "expected_output_type", "string"),
+        ("expected_output", "expected_output", "string"),
+        ("expected_label", "expected_label", "string"),
+        ("created", "created", "timestamp"),
+    ),
+    "responses": (
+        ("id", "id", "uuid"),
+        ("prompt_id", "prompt_id", "uuid"),
+        ("model_id", "model_id", "uuid"),
+        ("model__name", "model_name", "string"),
+        ("model__version", "model_version", "string"),
+        ("output", "output", "string"),
+        ("output_similarity", "output_similarity", "float64"),
+        ("is_similar", "is_similar", "bool"),
+        ("label", "label", "string"),
+        ("label_correct", "label_correct", "bool"),
+        ("valid_output_type", "valid_output_type", "bool"),
+        ("leaks_sensitive", "leaks_sensitive", "bool"),
+        ("is_factual", "is_factual", "bool"),
+        ("is_readable", "is_readable", "bool"),
+        ("is_correct_style", "is_correct_style", "bool"),
+        ("helpfulness", "helpfulness", "int8"),
+        ("max_new_tokens", "max_new_tokens", "int32"),
+        ("inference_on", "inference_on", "timestamp"),
+        ("inference_duration", "inference_duration", "duration"),
+    ),
+    "reviews": (
+        ("id", "id", "int64"),
+        ("review_id", "review_id", "int64"),
+        ("review__user__username", "reviewer", "string"),
+        ("response_id", "response_id", "uuid"),
+        ("output_correct", "output_correct", "bool"),
+        ("label_correct", "label_correct", "bool"),
+        ("is_factual", "is_factual", "bool"),
+        ("is_readable", "is_readable", "bool"),
+        ("is_correct_style", "is_correct_style", "bool"),
+        ("helpfulness", "helpfulness", "int8"),
+        ("notes", "notes", "string"),
+        ("created", "created", "timestamp"),
+    ),
+}
+
+COLUMNAR_FORMATS = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+def columnar_queryset(evaluation, table):
+    """
+    Returns the rows of the table for the evaluation. Rows are not sorted so that the
+    database does not have to sort millions of rows before streaming them.
+    """
+    if table == "prompts":
+        queryset = Prompt.objects.filter(evaluation=evaluation)
+    elif table == "responses":
+        queryset = Response.objects.filter(prompt__evaluation=evaluation)
+    elif table == "reviews":
+        queryset = ResponseReview.objects.filter(response__prompt__evaluation=evaluation)
+    else:
+        raise ValueError(f"unknown table \"{table}\"")
+
+    lookups = [lookup for lookup, _, _ in COLUMNAR_TABLES[table]]
+    return queryset.values_list(*lookups).order_by()
+
+
+def arrow_schema(table):
+    types = {
+        "uuid": pa.string(),
+        "string": pa.string(),
+        "bool": pa.bool_(),
+        "int8": pa.int8(),
+        "int32": pa.int32(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "duration": pa.duration("us"),
+    }
+    return pa.schema([
+        pa.field(name, types[kind], nullable=True)
+        for _, name, kind in COLUMNAR_TABLES[table]
+    ])
+
+
+class StreamSink(object):
+    """
+    A write-only file-like object that buffers the bytes written by an Arrow writer
+    until they are drained into the response stream.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.buffer.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.buffer = b"".join(self.buffer), []
+        return data
+
+
+def record_batches(queryset, table, schema):
+    """
+    Yields record batches of the rows of the queryset, which are fetched with a
+    server-side cursor so that only a single batch of rows is held in memory.
+    """
+    uuids = [i for i, (_, _, kind) in enumerate(COLUMNAR_TABLES[table]) if kind == "uuid"]
+
+    rows = []
+    for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+        rows.append(row)
+        if len(rows) >= RECORD_BATCH_SIZE:
+            yield record_batch(rows, uuids, schema)
+            rows = []
+
+    if rows:
+        yield record_batch(rows, uuids, schema)
+
+
+def record_batch(rows, uuids, schema):
+    columns = [list(column) for column in zip(*rows)]
+    for i in uuids:
+        columns[i] = [str(value) if value is not None else None for value in columns[i]]
+
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def columnar_export(evaluation, table, fmt="parquet"):
+    """
+    Returns a generator that yields the table (prompts, responses, or reviews) of the
+    evaluation encoded as a Parquet or Arrow IPC file, written one record batch at a
+    time. The arguments are validated when this function is called rather than when
+    the stream is first consumed.
+    """
+    if pa is None:
+        raise ImproperlyConfigured("pyarrow is required for columnar exports")
+
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"unknown columnar format \"{fmt}\"")
+
+    queryset = columnar_queryset(evaluation, table)
+    schema = arrow_schema(table)
+    return write_columnar(record_batches(queryset, table, schema), schema, fmt)
+
+
+def write_columnar(batches, schema, fmt="parquet"):
+    """
+    Yields the bytes of a Parquet or Arrow IPC file containing the record batches as
+    each batch is written.
+    """
+    sink = StreamSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    else:
+        writer = pa.ipc.new_file(pa.PythonFile(sink, mode="w"), schema)
+
+    for batch in batches:
+        writer.write_batch(batch)
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
@@ -19,15 +19,20 @@ Forms for handling and validating user input.
 
 import os
 import json
-import tempfile
+import zlib
 from datetime import datetime, timedelta
 
 from django import forms
+from django.db.models import Q
+from django.conf import settings
 from collections import defaultdict
 from django.utils.timezone import make_aware
-from django.db.utils import IntegrityError
 from django.contrib.auth.models import User
 from parley.exceptions import ParlanceUploadError
+from parley.cache import invalidate
+from parley.tasks import count_review_task_prompts
+from parley.linkage import bulk_linkage
+from parley.models.sensitive import invalidate_sensitive_scanner
 from django.core.exceptions import ValidationError
 from parley.models import ModelEvaluation, ReviewTask, ResponseReview
 from parley.models import LLM, Evaluation, Prompt, Response, Sensitive
@@ -105,6 +110,327 @@ class UploaderCounts(object):
         return "\n".join(lines)
 
 
+class IngestBatch(object):
+    """
+    Buffers unsaved model instances and writes them to the database with bulk_create
+    once the batch size is reached. Models are flushed in the order they were first
+    added so that foreign key targets are inserted before the rows referencing them.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.PARLANCE_UPLOAD_BATCH_SIZE
+        self.buffers = {}
+        self.n_buffered = 0
+
+    def add(self, obj):
+        self.buffers.setdefault(obj.__class__, []).append(obj)
+        self.n_buffered += 1
+        if self.n_buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for model, objs in self.buffers.items():
+            if objs:
+                model.objects.bulk_create(objs, batch_size=self.batch_size)
+                objs.clear()
+        self.n_buffered = 0
+
+
+class UpsertBatch(object):
+    """
+    Buffers the rows of the generic uploader and writes them with batched upserts
+    (INSERT ... ON CONFLICT DO UPDATE) keyed on the natural key of each row, which is
+    its id if specified or otherwise one of the model's unique constraints. Rows are
+    grouped by model, key, and the set of fields they specify since each bulk upsert
+    must update the same columns. Before each upsert the keys that already exist are
+    queried so that created and updated objects are counted per file.
+
+    Rows can reference objects that are still buffered because groups are flushed in
+    foreign key dependency order.
+    """
+
+    ORDER = (Sensitive, LLM, Evaluation, Prompt, Response)
+
+    def __init__(self, counts, batch_size=None):
+        self.counts = counts
+        self.batch_size = batch_size or settings.PARLANCE_UPLOAD_BATCH_SIZE
+        self.groups = defaultdict(dict)
+        self.n_buffered = 0
+
+    @staticmethod
+    def natural_key(model, row):
+        """
+        Returns the fields that identify the row or None if the row does not specify
+        all of the fields of any unique constraint.
+        """
+        if "id" in row:
+            return ("id",)
+
+        uniques = [tuple(fields) for fields in model._meta.unique_together]
+        uniques.extend(
+            (field.name,)
+            for field in model._meta.fields
+            if field.unique and not field.primary_key
+        )
+
+        for fields in uniques:
+            if all(field in row for field in fields):
+                return fields
+        return None
+
+    @staticmethod
+    def key_value(obj, key):
+        value = []
+        for name in key:
+            field = obj._meta.get_field(name)
+            value.append(field.to_python(getattr(obj, field.attname)))
+        return tuple(value)
+
+    def add(self, fname, obj, key, fields):
+        model = obj.__class__
+        value = self.key_value(obj, key)
+        group = self.groups[(model, key, frozenset(fields))]
+
+        # Later rows with the same key replace earlier ones in the batch; since the
+        # earlier row is written first, the later row is counted as an update.
+        if value in group:
+            self.counts.updated(fname, model.__name__)
+            group[value] = (group[value][0], obj)
+        else:
+            group[value] = (fname, obj)
+            self.n_buffered += 1
+
+        if self.n_buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for model in self.ORDER:
+            groups = [
+                (key, fields, rows)
+                for (gmodel, key, fields), rows in self.groups.items()
+                if gmodel is model and rows
+            ]
+
+            for key, fields, rows in groups:
+                self.upsert(model, key, fields, rows)
+                rows.clear()
+
+        self.n_buffered = 0
+
+    @staticmethod
+    def key_filter(attnames, values):
+        """
+        Returns a filter that matches the rows with any of the key values; filtering
+        on only one field of a composite key would match every row with that value
+        (e.g. every response of the model rather than the responses in the batch).
+        """
+        if len(attnames) == 1:
+            return Q(**{f"{attnames[0]}__in": {value[0] for value in values}})
+
+        return Q(*(Q(**dict(zip(attnames, value))) for value in values), _connector=Q.OR)
+
+    def upsert(self, model, key, fields, rows):
+        attnames = [model._meta.get_field(name).attname for name in key]
+        existing = set(
+            model.objects.filter(self.key_filter(attnames, rows)).values_list(*attnames)
+        )
+
+        objs = []
+        for value, (fname, obj) in rows.items():
+            self.counts.increment(fname, obj, value not in existing)
+            objs.append(obj)
+
+        update_fields = [name for name in fields if name not in key]
+        if update_fields and hasattr(model, "modified"):
+            update_fields.append("modified")
+
+        if update_fields:
+            model.objects.bulk_create(
+                objs,
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=key,
+                update_fields=update_fields,
+            )
+        else:
+            model.objects.bulk_create(
+                objs, batch_size=self.batch_size, ignore_conflicts=True
+            )
+
+        if model is Response:
+            self.link_model_evaluations(objs)
+        elif model is Prompt:
+            # Prompts may have been reordered, excluded, or moved between evaluations
+            evaluation_ids = {obj.evaluation_id for obj in objs}
+            for evaluation_id in evaluation_ids:
+                count_review_task_prompts(evaluation_id)
+            invalidate("evaluation", *evaluation_ids)
+        elif model is Evaluation:
+            invalidate("evaluation", *{obj.pk for obj in objs})
+        elif model is LLM:
+            invalidate("llm", *{obj.pk for obj in objs})
+        elif model is Sensitive:
+            invalidate_sensitive_scanner()
+
+    def link_model_evaluations(self, responses):
+        """
+        Bulk inserts do not send the signals that link models to evaluations and
+        maintain the cached metrics, so record the model evaluations of the batch of
+        responses with the bulk linkage. The model evaluations are reconciled when the
+        enclosing bulk_linkage block exits, or immediately if there is none.
+        """
+        prompts = dict(
+            Prompt.objects.filter(
+                id__in={response.prompt_id for response in responses}
+            ).values_list("id", "evaluation_id")
+        )
+
+        with bulk_linkage() as linkage:
+            linkage.link(
+                (response.model_id, prompts[response.prompt_id])
+                for response in responses
+            )
+
+
+class IdentityMap(object):
+    """
+    Upload-scoped map of the primary keys of the objects that rows may reference.
+    The references of a chunk of rows are prefetched with a single query per model
+    and objects created earlier in the upload are added to the map so that foreign
+    keys are resolved without a query per row. Only primary keys are kept so that
+    the map stays small for large uploads.
+    """
+
+    def __init__(self):
+        self.known = defaultdict(set)
+
+    @staticmethod
+    def normalize(model, pk):
+        try:
+            return model._meta.pk.to_python(pk)
+        except ValidationError:
+            return None
+
+    def add(self, model, pk):
+        pk = self.normalize(model, pk)
+        if pk is not None:
+            self.known[model].add(pk)
+
+    def prefetch(self, references):
+        """
+        Loads the primary keys of the (model, pk) references that are not yet known.
+        """
+        missing = defaultdict(set)
+        for model, pk in references:
+            pk = self.normalize(model, pk)
+            if pk is not None and pk not in self.known[model]:
+                missing[model].add(pk)
+
+        for model, pks in missing.items():
+            self.known[model].update(
+                model.objects.filter(pk__in=pks).values_list("pk", flat=True)
+            )
+
+    def resolve(self, model, pk):
+        """
+        Returns an instance of the model that can be assigned to a foreign key, or
+        None if no object with the primary key exists.
+        """
+        pk = self.normalize(model, pk)
+        if pk is None or pk not in self.known[model]:
+            return None
+        return model(pk=pk)
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+JSONL_EXTENSIONS = {".jsonl", ".jsonlines"}
+
+
+def jsonl_extension(name):
+    """
+    Returns the JSON lines extension of a filename, ignoring a trailing .gz suffix for
+    compressed uploads, e.g. "prompts.jsonl.gz" returns ".jsonl".
+    """
+    root, ext = os.path.splitext(name)
+    if ext == ".gz":
+        _, ext = os.path.splitext(root)
+    return ext
+
+
+def iter_decompressed(chunks, chunk_size=64 * 2**10):
+    """
+    Yields the uncompressed bytes of a stream of chunks. If the stream begins with the
+    gzip magic bytes it is inflated on the fly with output bounded by chunk_size,
+    otherwise the chunks are passed through unmodified.
+    """
+    decompressor = None
+    for i, chunk in enumerate(chunks):
+        if i == 0 and chunk[:2] == GZIP_MAGIC:
+            decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+
+        if decompressor is None:
+            yield chunk
+            continue
+
+        try:
+            while chunk:
+                yield decompressor.decompress(chunk, chunk_size)
+                chunk = decompressor.unconsumed_tail
+                if decompressor.eof:
+                    # Handle multi-member gzip files (e.g. concatenated with cat)
+                    chunk = chunk or decompressor.unused_data
+                    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        except zlib.error as e:
+            raise ParlanceUploadError(f"could not decompress gzip upload: {e}")
+
+    if decompressor is not None:
+        yield decompressor.flush()
+
+
+def iter_jsonlines(f, max_line_size=None):
+    """
+    Streams JSON objects from an uploaded file using its chunks rather than reading the
+    whole file into memory. The buffer only ever holds the current chunk and a partial
+    line, which may not exceed max_line_size bytes. Yields the line number and parsed
+    object; errors report the byte offset of the line in the uncompressed stream.
+    """
+    max_line_size = max_line_size or settings.PARLANCE_UPLOAD_MAX_LINE_SIZE
+
+    def parse(lineno, offset, line):
+        try:
+            return json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ParlanceUploadError(
+                f"invalid json on line {lineno} (byte offset {offset}) of {f.name}"
+            )
+
+    lineno = 0
+    offset = 0
+    buf = b""
+    for chunk in iter_decompressed(f.chunks()):
+        buf += chunk
+        start = 0
+        while True:
+            end = buf.find(b"\n", start)
+            if end < 0:
+                break
+            lineno += 1
+            yield lineno, parse(lineno, offset + start, buf[start:end])
+            start = end + 1
+
+        offset += start
+        buf = buf[start:]
+        if len(buf) > max_line_size:
+            raise ParlanceUploadError(
+                f"line {lineno + 1} (byte offset {offset}) of {f.name} "
+                f"exceeds the maximum line size of {max_line_size} bytes"
+            )
+
+    if buf.strip():
+        lineno += 1
+        yield lineno, parse(lineno, offset, buf)
+
+
 ##########################################################################
 ## Forms
 ##########################################################################
@@ -112,21 +438,14 @@ class UploaderCounts(object):
 
 class BaseUploader(forms.Form):
 
-    def read_jsonlines(self, path):
-        with open(path, "r") as f:
-            for i, line in enumerate(f.readlines()):
-                try:
-                    yield i + 1, json.loads(line)
-                except json.JSONDecodeError:
-                    fname = os.path.basename(path)
-                    raise ParlanceUploadError(f"invalid json on line {i+1} of {fname}")
+    # Optional callable that wraps the rows read from each file to report progress
+    progress = None
 
-    def write_temporary_file(self, td, f):
-        path = os.path.join(td, f.name)
-        with open(path, "wb") as fh:
-            for chunk in f.chunks():
-                fh.write(chunk)
-        return path
+    def read_jsonlines(self, f):
+        rows = iter_jsonlines(f)
+        if self.progress is not None:
+            return self.progress(f, rows)
+        return rows
 
 
 class Uploader(BaseUploader):
@@ -137,57 +456,95 @@ class Uploader(BaseUploader):
         files = self.cleaned_data["jsonl"]
         for f in files:
             # Ensure these files are JSON lines files
-            _, ext = os.path.splitext(f.name)
-            if ext not in {".jsonl", ".jsonlines"}:
-                raise ValidationError("must specify only .jsonlines or .jsonl files")
+            if jsonl_extension(f.name) not in JSONL_EXTENSIONS:
+                raise ValidationError(
+                    "must specify only .jsonlines or .jsonl files (optionally gzipped)"
+                )
         return files
 
+    TYPES = {
+        "llm": LLM,
+        "evaluation": Evaluation,
+        "prompt": Prompt,
+        "response": Response,
+        "sensitive": Sensitive,
+    }
+
+    # Foreign keys of each type as (field, related model)
+    REFERENCES = {
+        Prompt: (("evaluation", Evaluation),),
+        Response: (("model", LLM), ("prompt", Prompt)),
+    }
+
     def handle_upload(self):
         counts = UploaderCounts()
+        batch = UpsertBatch(counts)
+        references = IdentityMap()
         files = self.cleaned_data["jsonl"]
-        with tempfile.TemporaryDirectory() as td:
-            for f in files:
-                self.handle_uploaded_file(td, f, counts)
+        for f in files:
+            self.handle_uploaded_file(f, batch, references)
+        batch.flush()
         return counts
 
-    def handle_uploaded_file(self, td, f, counts):
-        # Write the file to a temporary file on disk
-        path = self.write_temporary_file(td, f)
-
-        # Read the temporary file and handle contents
-        for r, row in self.read_jsonlines(path):
+    def handle_uploaded_file(self, f, batch, references):
+        # Stream the uploaded file and handle contents in chunks
+        chunk = []
+        for r, row in self.read_jsonlines(f):
             if "type" not in row:
                 raise ParlanceUploadError(f"missing type field on line {r} of {f.name}")
 
-            rtype = {
-                "llm": LLM,
-                "evaluation": Evaluation,
-                "prompt": Prompt,
-                "response": Response,
-                "sensitive": Sensitive,
-            }.get(row.pop("type").strip().lower(), None)
-
-            if rtype is None:
+            rtype = row.pop("type")
+            if rtype.strip().lower() not in self.TYPES:
                 raise ParlanceUploadError(
-                    f"unknown type \"{row['type']}\" on line {r} of {f.name}"
+                    f"unknown type \"{rtype}\" on line {r} of {f.name}"
                 )
 
+            chunk.append((r, self.TYPES[rtype.strip().lower()], row))
+            if len(chunk) >= batch.batch_size:
+                self.handle_chunk(f, chunk, batch, references)
+                chunk = []
+
+        self.handle_chunk(f, chunk, batch, references)
+
+    def handle_chunk(self, f, chunk, batch, references):
+        references.prefetch(
+            (model, row.get(key, None))
+            for _, rtype, row in chunk
+            for key, model in self.REFERENCES.get(rtype, ())
+        )
+
+        for r, rtype, row in chunk:
             # Handle Foreign Keys
-            if rtype == Prompt:
-                self.link_reference(row, "evaluation", Evaluation)
-            elif rtype == Response:
-                self.link_reference(row, "model", LLM)
-                self.link_reference(row, "prompt", Prompt)
+            for key, model in self.REFERENCES.get(rtype, ()):
+                self.link_reference(row, key, model, references, f"line {r} of {f.name}")
+
+            # Rows without a natural key cannot be upserted, so fall back to looking
+            # them up by all of their fields after writing any rows they depend on.
+            key = batch.natural_key(rtype, row)
+            if key is None:
+                batch.flush()
+                obj, created = rtype.objects.get_or_create(**row)
+                batch.counts.increment(f.name, obj, created)
+                references.add(rtype, obj.pk)
+                continue
+
+            try:
+                batch.add(f.name, rtype(**row), key, row.keys())
+            except (TypeError, ValueError, ValidationError) as e:
+                raise ParlanceUploadError(
+                    f"invalid {rtype.__name__} on line {r} of {f.name}: {e}"
+                )
 
-            counts.increment(f.name, *rtype.objects.get_or_create(**row))
+            if "id" in row:
+                references.add(rtype, row["id"])
 
-    def link_reference(self, row, key, model):
-        try:
-            row[key] = model.objects.get(id=row[key])
-        except (KeyError, model.DoesNotExist):
+    def link_reference(self, row, key, model, references, location):
+        obj = references.resolve(model, row.get(key, None))
+        if obj is None:
             raise ParlanceUploadError(
-                f"could not associate \"{row.get(key, '')}\" with existing {model.__name__} object"
+                f"could not associate \"{row.get(key, '')}\" with existing {model.__name__} object on {location}"
             )
+        row[key] = obj
 
 
 class EvaluationUploader(BaseUploader):
@@ -198,6 +555,9 @@ class EvaluationUploader(BaseUploader):
     models_file = forms.FileField(required=True)
     prompts_file = forms.FileField(allow_empty_file=False)
 
+    # Number of rows per bulk insert, defaults to PARLANCE_UPLOAD_BATCH_SIZE
+    batch_size = None
+
     def parse_message(self, message, allowed_roles=["system", "user", "assistant"]):
         # Ensure the message has a role and content
         role = message.get("role", None)
@@ -291,82 +651,90 @@ class EvaluationUploader(BaseUploader):
         )
 
         counts = UploaderCounts()
-        with tempfile.TemporaryDirectory() as td:
-            # Process the models file and create the LLMs
-            model_file = self.cleaned_data["models_file"]
-            path = self.write_temporary_file(td, model_file)
-            for r, row in self.read_jsonlines(path):
-                try:
-                    name, created = self.parse_model(row)
-                except ValidationError as e:
-                    raise ParlanceUploadError(
-                        f"invalid model JSON on line {r} of {model_file.name}: {e}"
-                    )
-                llm, _ = LLM.objects.get_or_create(name=name, trained_on=created)
-                evaluation.llms.add(llm)
-                counts.increment(model_file.name, llm, True)
-
-            # Process the prompts file
-            order = 1
-            prompts = set()
-            prompts_file = self.cleaned_data["prompts_file"]
-            path = self.write_temporary_file(td, prompts_file)
-            for r, row in self.read_jsonlines(path):
-                try:
-                    system, user, assistant, model = self.parse_prompt(row)
-                except ValidationError as e:
-                    raise ParlanceUploadError(
-                        f"invalid prompt JSON on line {r} of {prompts_file.name}: {e}"
-                    )
-                key = (system, user)
-                if key not in prompts:
-                    prompt = Prompt.objects.create(
-                        system=system,
-                        prompt=user,
-                        order=order,
-                        evaluation=evaluation,
-                    )
-                    prompts.add(key)
-                    order += 1
-                    counts.increment(prompts_file.name, prompt, True)
-                else:
-                    prompt = Prompt.objects.get(
-                        system=system,
-                        prompt=user,
-                        evaluation=evaluation,
-                    )
 
-                # Add the response for this prompt
-                try:
-                    llm = LLM.objects.get(name=model, evaluation=evaluation)
-                except LLM.DoesNotExist:
-                    raise ParlanceUploadError(f"could not find model by name '{model}'")
-
-                # We only support one response per prompt per model
-                try:
-                    response = Response.objects.create(
-                        model=llm,
-                        prompt=prompt,
-                        output=assistant,
-                        inference_on=(
-                            make_aware(datetime.fromtimestamp(row["inference_on"]))
-                            if "inference_on" in row
-                            else None
-                        ),
-                        inference_duration=(
-                            timedelta(seconds=row["inference_seconds"])
-                            if "inference_seconds" in row
-                            else None
-                        ),
-                    )
-                except IntegrityError:
-                    raise ParlanceUploadError(
-                        f"duplicate prompt for model '{model}' at line {r} of {prompts_file.name}"
-                    )
-                counts.increment(prompts_file.name, response, True)
+        # Process the models file and create the LLMs
+        llms = {}
+        model_file = self.cleaned_data["models_file"]
+        for r, row in self.read_jsonlines(model_file):
+            try:
+                name, created = self.parse_model(row)
+            except ValidationError as e:
+                raise ParlanceUploadError(
+                    f"invalid model JSON on line {r} of {model_file.name}: {e}"
+                )
+            llm, _ = LLM.objects.get_or_create(name=name, trained_on=created)
+            llms[name] = llm
+            counts.increment(model_file.name, llm, True)
+        evaluation.llms.add(*llms.values())
+
+        # Process the prompts file; prompts and responses are buffered in memory
+        # and written with bulk inserts to avoid several queries per line.
+        batch = IngestBatch(self.batch_size)
+        self.ingest_prompts(evaluation, llms, batch, counts)
+        batch.flush()
 
         return evaluation, counts
 
+    def ingest_prompts(self, evaluation, llms, batch, counts):
+        """
+        Adds a prompt for every distinct (system, prompt) pair of the prompts file and
+        a response for each line to the batch. Prompts are added to the batch before
+        the responses that reference them so that they are always inserted first,
+        even when the batch is flushed between them.
+        """
+        prompts = {}
+        responses = set()
+        prompts_file = self.cleaned_data["prompts_file"]
+        for r, row in self.read_jsonlines(prompts_file):
+            try:
+                system, user, assistant, model = self.parse_prompt(row)
+            except ValidationError as e:
+                raise ParlanceUploadError(
+                    f"invalid prompt JSON on line {r} of {prompts_file.name}: {e}"
+                )
+
+            key = (system, user)
+            if key not in prompts:
+                prompt = Prompt(
+                    system=system,
+                    prompt=user,
+                    order=len(prompts) + 1,
+                    evaluation=evaluation,
+                )
+                prompts[key] = prompt.id
+                batch.add(prompt)
+                counts.increment(prompts_file.name, prompt, True)
+
+            # Add the response for this prompt
+            llm = llms.get(model, None)
+            if llm is None:
+                raise ParlanceUploadError(f"could not find model by name '{model}'")
+
+            # We only support one response per prompt per model
+            if (prompts[key], llm.id) in responses:
+                raise ParlanceUploadError(
+                    f"duplicate prompt for model '{model}' at line {r} of {prompts_file.name}"
+                )
+            responses.add((prompts[key], llm.id))
+
+            response = Response(
+                model=llm,
+                prompt_id=prompts[key],
+                output=assistant,
+                inference_on=(
+                    make_aware(datetime.fromtimestamp(row["inference_on"]))
+                    if "inference_on" in row
+                    else None
+                ),
+                inference_duration=(
+                    timedelta(seconds=row["inference_seconds"])
+                    if "inference_seconds" in row
+                    else None
+                ),
+            )
+            batch.add(response)
+            counts.increment(prompts_file.name, response, True)
+
 
 class CreateReviewForm(forms.Form):
 
@@ -375,11 +743,13 @@ class CreateReviewForm(forms.Form):
 
     def save(self):
         try:
+            me = ModelEvaluation.objects.get(
+                pk=self.cleaned_data["evaluation"], evaluation__deleted_on=None
+            )
             ReviewTask.objects.create(
                 user=User.objects.get(pk=self.cleaned_data["user"]),
-                model_evaluation=ModelEvaluation.objects.get(
-                    pk=self.cleaned_data["evaluation"]
-                ),
+                model_evaluation=me,
+                n_prompts=me.prompts().count(),
             )
         except (User.DoesNotExist, ModelEvaluation.DoesNotExist):
             return
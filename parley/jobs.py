@@ -0,0 +1,348 @@
+# parley.jobs
+# Background task queue backed by the jobs table in the database.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 13:52:28 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: jobs.py [] benjamin@rotational.io $
+
+"""
+Background task queue backed by the jobs table in the database.
+
+Functions are registered as tasks with the @task decorator and enqueued by name with
+keyword arguments that must be JSON serializable. The worker management command
+claims queued jobs with SELECT ... FOR UPDATE SKIP LOCKED so that any number of
+worker processes can run concurrently without external services. Failed jobs are
+retried with exponential backoff until they run out of attempts.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import threading
+import traceback
+
+from datetime import timedelta
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils import timezone
+from django.db.models import Q
+from django.db.models.functions import Now
+from django.db import DatabaseError, IntegrityError, connections, transaction
+
+from parley.exceptions import ParlanceJobError
+from parley.models import Job, JobStatus, Evaluation, ModelEvaluation
+from parley import deletion, tasks, uploads
+
+
+# Registered tasks by name
+REGISTRY = {}
+
+
+##########################################################################
+## Task Registration
+##########################################################################
+
+
+class Task(object):
+    """
+    A registered task. If dedupe is True and the task is enqueued for a model
+    evaluation then only one job for the task and model evaluation is queued at a
+    time. If bind is True then the job is passed to the function as the first
+    argument, e.g. so that the task can report its progress. If atomic is False then
+    the job is not run in a transaction so that the task can commit its work in
+    chunks; such tasks must be safe to resume when they are retried.
+    """
+
+    def __init__(
+        self, fn, name=None, max_attempts=3, dedupe=False, bind=False, atomic=True
+    ):
+        self.fn = fn
+        self.name = name or fn.__name__
+        self.max_attempts = max_attempts
+        self.dedupe = dedupe
+        self.bind = bind
+        self.atomic = atomic
+
+    def __call__(self, job):
+        if self.bind:
+            return self.fn(job, **job.args)
+        return self.fn(**job.args)
+
+    def enqueue(self, **kwargs):
+        return enqueue(self.name, **kwargs)
+
+
+def task(name=None, max_attempts=3, dedupe=False, bind=False, atomic=True):
+    """
+    Decorator that registers a function as a task that can be enqueued by name.
+    """
+    def decorator(fn):
+        registered = Task(fn, name, max_attempts, dedupe, bind, atomic)
+        if registered.name in REGISTRY:
+            raise ParlanceJobError(f"a task named '{registered.name}' is registered")
+
+        REGISTRY[registered.name] = registered
+        return fn
+    return decorator
+
+
+##########################################################################
+## Queue Operations
+##########################################################################
+
+
+def enqueue(name, dedupe_key=None, run_after=None, **kwargs) -> Job:
+    """
+    Enqueue a job to run the named task with the keyword arguments. If a model
+    evaluation is passed as the model_evaluation keyword argument, the job is linked
+    to it so that its status can be shown in the UI. If a job with the same dedupe key
+    is already queued then that job is returned instead of creating a new one.
+
+    Jobs are created in the current transaction so they are only visible to workers
+    once the transaction commits.
+    """
+    if name not in REGISTRY:
+        raise ParlanceJobError(f"no task named '{name}' is registered")
+
+    task = REGISTRY[name]
+    me = kwargs.get("model_evaluation", None)
+    if isinstance(me, ModelEvaluation):
+        me = kwargs["model_evaluation"] = me.pk
+
+    if dedupe_key is None and task.dedupe and me is not None:
+        dedupe_key = f"{name}:{me}"
+
+    for _ in range(3):
+        if dedupe_key is not None:
+            job = Job.objects.filter(dedupe_key=dedupe_key, status=JobStatus.QUEUED)
+            job = job.first()
+            if job is not None:
+                return job
+
+        try:
+            with transaction.atomic():
+                return Job.objects.create(
+                    name=name,
+                    args=kwargs,
+                    dedupe_key=dedupe_key,
+                    model_evaluation_id=me,
+                    max_attempts=task.max_attempts,
+                    run_after=run_after or timezone.now(),
+                )
+        except IntegrityError:
+            # Another process queued a job with the same dedupe key; fetch it.
+            if dedupe_key is None:
+                raise
+
+    raise ParlanceJobError(f"could not enqueue job with dedupe key '{dedupe_key}'")
+
+
+def claim() -> Job:
+    """
+    Claim the next job that is ready to run and mark it as running, returning None if
+    there are no jobs ready. Running jobs whose worker has not sent a heartbeat for
+    the PARLANCE_JOB_TIMEOUT are assumed to belong to a worker that died and are
+    claimed again. Locked rows are skipped so concurrent workers never claim the same
+    job.
+    """
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.PARLANCE_JOB_TIMEOUT)
+
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=JobStatus.QUEUED, run_after__lte=now)
+                | Q(status=JobStatus.RUNNING, heartbeat__lt=expired)
+                | Q(status=JobStatus.RUNNING, heartbeat=None, started_on__lt=expired)
+            )
+            .order_by("run_after")
+            .first()
+        )
+
+        if job is None:
+            return None
+
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.started_on = now
+        job.heartbeat = now
+        job.progress = None
+        job.save()
+    return job
+
+
+def run(job: Job) -> bool:
+    """
+    Run a claimed job in a transaction so that a failed attempt leaves no partial
+    changes behind (unless the task is not atomic). Returns True if the job succeeded,
+    otherwise the job is either requeued with exponential backoff or marked as failed.
+    """
+    try:
+        if job.name not in REGISTRY:
+            raise ParlanceJobError(f"no task named '{job.name}' is registered")
+
+        registered = REGISTRY[job.name]
+        with heartbeat(job):
+            if registered.atomic:
+                with transaction.atomic():
+                    registered(job)
+            else:
+                registered(job)
+    except Exception:
+        fail(job, traceback.format_exc())
+        return False
+
+    job.status = JobStatus.SUCCEEDED
+    job.completed_on = timezone.now()
+    job.progress = 1.0
+    job.error = None
+    job.save()
+    return True
+
+
+def fail(job: Job, error: str):
+    """
+    Record a failed attempt, requeueing the job if it has attempts remaining. If
+    another job with the same dedupe key has been queued in the meantime, the failed
+    job is superseded by it and is marked as failed instead.
+    """
+    now = timezone.now()
+    job.error = error
+
+    if job.attempts < job.max_attempts:
+        delay = settings.PARLANCE_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        job.status = JobStatus.QUEUED
+        job.run_after = now + timedelta(seconds=delay)
+
+        try:
+            with transaction.atomic():
+                job.save()
+            return
+        except IntegrityError:
+            job.error += "\nsuperseded by a queued job with the same dedupe key"
+
+    job.status = JobStatus.FAILED
+    job.completed_on = now
+    job.save()
+
+
+def report_progress(job: Job, progress: float):
+    """
+    Update the fraction of the job that is complete. Progress is written with a
+    separate database connection so that it is visible outside of the job's
+    transaction while the job is running.
+    """
+    job.progress = progress
+    Job.objects.using(settings.PARLANCE_PROGRESS_DATABASE).filter(pk=job.pk).update(
+        progress=progress, heartbeat=Now()
+    )
+
+
+@contextmanager
+def heartbeat(job: Job, interval=None):
+    """
+    Updates the heartbeat of the job from a background thread while the block runs so
+    that a long running job is not claimed again by another worker. The heartbeat is
+    written with the progress connection so that it is visible outside of the job's
+    transaction.
+    """
+    interval = interval or settings.PARLANCE_JOB_HEARTBEAT_INTERVAL
+    stopped = threading.Event()
+
+    def beat():
+        jobs = Job.objects.using(settings.PARLANCE_PROGRESS_DATABASE).filter(pk=job.pk)
+        try:
+            while not stopped.wait(interval):
+                try:
+                    jobs.update(heartbeat=Now())
+                except DatabaseError:
+                    # Try again at the next interval; the job is only reclaimed if
+                    # heartbeats are missed for the entire job timeout.
+                    continue
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{job.pk}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+##########################################################################
+## Registered Tasks
+##########################################################################
+
+
+@task("analyze", dedupe=True)
+def analyze(model_evaluation, **kwargs):
+    tasks.analyze(ModelEvaluation.objects.get(pk=model_evaluation), **kwargs)
+
+
+@task("run_prechecks", dedupe=True)
+def run_prechecks(model_evaluation, **kwargs):
+    tasks.run_prechecks(ModelEvaluation.objects.get(pk=model_evaluation), **kwargs)
+
+
+# The responses are written with bulk updates that do not send signals, so the
+# metrics of the model evaluation are recomputed once the results are written.
+@task("evaluate_similarity", dedupe=True)
+def evaluate_similarity(model_evaluation):
+    me = ModelEvaluation.objects.get(pk=model_evaluation)
+    tasks.evaluate_similarity(me)
+    tasks.cache_metrics(me)
+
+
+@task("compute_agreement", dedupe=True)
+def compute_agreement(model_evaluation, **kwargs):
+    me = ModelEvaluation.objects.get(pk=model_evaluation)
+    tasks.compute_agreement(me, **kwargs)
+    tasks.cache_metrics(me)
+
+
+@task("cache_metrics", dedupe=True)
+def cache_metrics(model_evaluation):
+    tasks.cache_metrics(ModelEvaluation.objects.get(pk=model_evaluation))
+
+
+@task("process_upload", bind=True)
+def process_upload(job, evaluation):
+    """
+    Post-processing after an evaluation upload: cache the metrics of every model
+    evaluation, since responses are bulk inserted without signals.
+    """
+    evaluation = Evaluation.objects.get(pk=evaluation)
+    model_evaluations = list(evaluation.model_evaluations.all())
+    for i, me in enumerate(model_evaluations):
+        tasks.cache_metrics(me)
+        report_progress(job, (i + 1) / len(model_evaluations))
+
+
+@task("ingest_upload", bind=True)
+def ingest_upload(job, upload):
+    uploads.ingest(job, upload)
+
+
+@task("delete_evaluation", bind=True, atomic=False)
+def delete_evaluation(job, evaluation):
+    """
+    Delete an evaluation that has been marked for deletion along with all of its
+    data, committing one chunk of rows at a time.
+    """
+    try:
+        evaluation = Evaluation.objects.get(pk=evaluation)
+    except Evaluation.DoesNotExist:
+        return
+
+    deletion.delete_evaluation(
+        evaluation, progress=lambda progress: report_progress(job, progress)
+    )
@@ -0,0 +1,194 @@
+# parley.linkage
+# Batched maintenance of model evaluations for bulk response changes.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 19:21:36 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: linkage.py [] benjamin@rotational.io $
+
+"""
+Batched maintenance of model evaluations for bulk response changes.
+
+The response signals link models to evaluations and update the cached metrics with
+several queries per response, which does not scale to creating or deleting hundreds
+of thousands of responses. Inside of bulk_linkage the signal handlers only record
+the model evaluations that were affected (without querying) and the model
+evaluations are reconciled once, with set-based queries, when the block exits
+successfully:
+
+    with transaction.atomic(), bulk_linkage():
+        evaluation.delete()
+
+Blocks can be nested; the model evaluations are reconciled when the outermost block
+exits. Code that bulk inserts responses without signals can record the model
+evaluations it affected with link.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import threading
+
+from contextlib import contextmanager
+
+from django.db.models import Exists, F, OuterRef, Q
+
+from parley.metrics import aggregator
+from parley.cache import invalidate, invalidate_model_evaluations
+from parley.aggregates import SubqueryCount
+from parley.stats import statistics_changed
+from parley.models import ModelEvaluation, Prompt, Response, ResponseReview, ReviewTask
+
+
+# Kinds of changes to the responses of a model evaluation
+LINKED = "linked"
+UNLINKED = "unlinked"
+CHANGED = "changed"
+
+# Maximum number of ids in a single IN clause when resolving prompts
+RESOLVE_BATCH_SIZE = 10000
+
+_local = threading.local()
+
+
+##########################################################################
+## Bulk Linkage
+##########################################################################
+
+
+def current_linkage():
+    """
+    Returns the BulkLinkage of the active bulk_linkage block or None.
+    """
+    return getattr(_local, "linkage", None)
+
+
+@contextmanager
+def bulk_linkage():
+    """
+    Suspends the per-response signal handlers for the block and reconciles the model
+    evaluations that were affected when it exits. If the block raises an exception
+    nothing is reconciled, since the enclosing transaction should be rolled back.
+    """
+    linkage = current_linkage()
+    if linkage is not None:
+        yield linkage
+        return
+
+    linkage = _local.linkage = BulkLinkage()
+    try:
+        yield linkage
+    finally:
+        _local.linkage = None
+    linkage.reconcile()
+
+
+class BulkLinkage(object):
+    """
+    Records the model evaluations whose responses were created, deleted, or changed
+    and the review tasks whose reviews were deleted during a bulk_linkage block.
+
+    Responses are recorded by (model, evaluation) if their prompt has been loaded,
+    otherwise by (model, prompt) and the prompts are resolved to evaluations with a
+    single query per batch when reconciling. If a prompt no longer exists (e.g. its
+    evaluation was deleted) any model evaluation of the model that no longer has any
+    responses is unlinked.
+    """
+
+    def __init__(self):
+        self.pairs = {LINKED: set(), UNLINKED: set(), CHANGED: set()}
+        self.prompts = {LINKED: set(), UNLINKED: set(), CHANGED: set()}
+        self.review_tasks = set()
+
+    def record(self, kind, response):
+        if Response.prompt.is_cached(response):
+            self.pairs[kind].add((response.model_id, response.prompt.evaluation_id))
+        else:
+            self.prompts[kind].add((response.model_id, response.prompt_id))
+
+    def link(self, pairs):
+        """
+        Record (model_id, evaluation_id) pairs that have new responses.
+        """
+        self.pairs[LINKED].update(pairs)
+
+    def review_deleted(self, review):
+        self.review_tasks.add(review.review_id)
+
+    def reconcile(self):
+        orphans = self.resolve()
+        linked, unlinked = self.pairs[LINKED], self.pairs[UNLINKED]
+
+        if linked:
+            ModelEvaluation.objects.bulk_create(
+                [ModelEvaluation(model_id=llm, evaluation_id=ev) for llm, ev in linked],
+                ignore_conflicts=True,
+            )
+
+        if unlinked or orphans:
+            query = Q(model_id__in=orphans) if orphans else Q(pk__in=[])
+            for llm, ev in unlinked:
+                query |= Q(model_id=llm, evaluation_id=ev)
+
+            responses = Response.objects.filter(
+                model_id=OuterRef("model_id"),
+                prompt__evaluation_id=OuterRef("evaluation_id"),
+            )
+            ModelEvaluation.objects.filter(query).exclude(Exists(responses)).delete()
+
+        for pair in linked | unlinked | self.pairs[CHANGED]:
+            aggregator.record_stale(*pair)
+
+        if self.review_tasks:
+            self.reconcile_review_tasks()
+
+        if linked or unlinked or orphans:
+            invalidate("llm", *orphans)
+            invalidate_model_evaluations(linked | unlinked)
+            statistics_changed()
+
+    def resolve(self) -> set:
+        """
+        Resolves the recorded prompts to evaluations and returns the ids of models
+        whose deleted responses belonged to prompts that no longer exist.
+        """
+        prompt_ids = list({
+            prompt_id for prompts in self.prompts.values() for _, prompt_id in prompts
+        })
+
+        evaluations = {}
+        for i in range(0, len(prompt_ids), RESOLVE_BATCH_SIZE):
+            evaluations.update(
+                Prompt.objects.filter(
+                    id__in=prompt_ids[i:i + RESOLVE_BATCH_SIZE]
+                ).values_list("id", "evaluation_id")
+            )
+
+        orphans = set()
+        for kind, prompts in self.prompts.items():
+            for model_id, prompt_id in prompts:
+                if prompt_id in evaluations:
+                    self.pairs[kind].add((model_id, evaluations[prompt_id]))
+                elif kind == UNLINKED:
+                    orphans.add(model_id)
+
+            prompts.clear()
+        return orphans
+
+    def reconcile_review_tasks(self):
+        """
+        Recount the reviews of the review tasks that lost reviews and mark completed
+        tasks that are no longer complete as unfinished.
+        """
+        tasks = ReviewTask.objects.filter(pk__in=self.review_tasks)
+        tasks.update(
+            n_reviewed=SubqueryCount(ResponseReview.objects.filter(review=OuterRef("pk")))
+        )
+
+        unfinished = tasks.filter(completed_on__isnull=False, n_prompts__gt=0)
+        unfinished.filter(n_reviewed=0).update(completed_on=None, started_on=None)
+        unfinished.filter(n_prompts__gt=F("n_reviewed")).update(completed_on=None)
@@ -17,15 +17,57 @@ Runs the metrics analytics commands and caches them on the model evaluations.
 ## Imports
 ##########################################################################
 
-from parley.models import ModelEvaluation, Sensitive
+import traceback
 
-from parley.tasks import cache_metrics, evaluate_label_correct
-from parley.tasks import evaluate_valid_output_type, evaluate_leaks_sensitive
-from parley.tasks import evaluate_cyberjudge_label_correct, extract_cyberjudge_label
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
 
+from parley.jobs import enqueue
+from parley.parallel import analyze_model_evaluation, init_worker
+from parley.models import ModelEvaluation
+from parley.tasks import PRECHECKS
+from parley.similarity import SCORED_METRICS
+
+from django.db import connections
 from django.core.management.base import BaseCommand, CommandError
 
 
+# Options passed to the analysis of each model evaluation (and to worker processes)
+ANALYSIS_OPTIONS = PRECHECKS + (
+    "similarity",
+    "readable_threshold",
+    "factual_threshold",
+    "style_threshold",
+    "helpfulness_metric",
+)
+
+
+##########################################################################
+## Analysis
+##########################################################################
+
+
+def analysis_kwargs(opts):
+    """
+    Converts the command line options into the keyword arguments of tasks.analyze.
+    """
+    kwargs = {key: opts[key] for key in PRECHECKS}
+    kwargs["similarity"] = opts["similarity"]
+    kwargs["likert_method"] = opts["helpfulness_metric"]
+    kwargs["thresholds"] = {
+        "is_factual": opts["factual_threshold"],
+        "is_readable": opts["readable_threshold"],
+        "is_correct_style": opts["style_threshold"],
+    }
+    return kwargs
+
+
+##########################################################################
+## Command
+##########################################################################
+
+
 class Command(BaseCommand):
 
     help = "Run metrics analytics tasks and cache them on model evaluations"
@@ -55,6 +97,12 @@ class Command(BaseCommand):
             action="store_true",
             help="evaluation sensitive leaks before metrics",
         )
+        parser.add_argument(
+            "-s",
+            "--similarity",
+            action="store_true",
+            help="score output similarity to expected output before metrics",
+        )
         parser.add_argument(
             "-R",
             "--readable-threshold",
@@ -90,6 +138,20 @@ class Command(BaseCommand):
             action="store_true",
             help="run the evaluation metrics across all model evaluations",
         )
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=1,
+            metavar="N",
+            help="analyze model evaluations in parallel with N worker processes",
+        )
+        parser.add_argument(
+            "-Q",
+            "--enqueue",
+            action="store_true",
+            help="enqueue the analysis as background jobs for the worker to run",
+        )
         parser.add_argument(
             "-y",
             "--yes",
@@ -131,41 +193,76 @@ class Command(BaseCommand):
         if not opts["yes"]:
             if not self.confirm("continue with analysis?"):
                 self.stdout.write(self.style.WARNING("canceled operation by user"))
+                return
 
-        # Prepare pre-checks
-        self._sensitive = None
-        prechecks = self.prechecks(**opts)
-        if len(prechecks) > 0:
-            print(f"performing {len(prechecks)} prechecks on responses")
+        # Similarity scoring is skipped for metrics that cannot be scored yet
+        if opts["similarity"]:
+            unscored = model_evaluations.exclude(
+                evaluation__similarity_metric__in=SCORED_METRICS
+            )
+            for me in unscored.select_related("evaluation"):
+                metric = me.evaluation.get_similarity_metric_display()
+                self.stdout.write(self.style.WARNING(
+                    f"cannot score {metric} similarity, skipping similarity of {me}"
+                ))
+
+        workers, enqueue_jobs = opts["workers"], opts["enqueue"]
+        opts = {key: opts[key] for key in ANALYSIS_OPTIONS}
+        if any(opts[key] for key in PRECHECKS):
+            print("performing prechecks on responses")
+
+        pks = list(model_evaluations.values_list("id", flat=True))
+        if enqueue_jobs:
+            for pk in pks:
+                enqueue("analyze", model_evaluation=pk, **analysis_kwargs(opts))
+            self.stdout.write(
+                self.style.SUCCESS(f"enqueued analysis of {len(pks)} model evaluations")
+            )
+            return
 
-        for me in model_evaluations:
-            # Perform any required pre-checks
-            if len(prechecks) > 0:
-                for response in me.responses():
-                    for check in prechecks:
-                        check(response)
-
-            # Compute annotator agreement for the model evaluation
-            for response in me.responses():
-                response.is_factual = response.agree_boolean(
-                    "is_factual", true_threshold=opts["factual_threshold"]
-                )
-                response.is_readable = response.agree_boolean(
-                    "is_readable", true_threshold=opts["readable_threshold"]
-                )
-                response.is_correct_style = response.agree_boolean(
-                    "is_correct_style", true_threshold=opts["style_threshold"]
-                )
-                response.helpfulness = response.agree_likert(
-                    "helpfulness", method=opts["helpfulness_metric"]
-                )
-                response.save()
-
-            # Cache metrics for the evaluation
-            cache_metrics(me)
+        errors = []
+        for i, (pk, elapsed, error) in enumerate(self.analyze(pks, opts, workers)):
+            status = "failed" if error else "done"
+            print(f"[{i+1}/{len(pks)}] {pk} {status} in {elapsed:0.2f}s")
+            if error:
+                errors.append((pk, error))
+
+        if errors:
+            for pk, error in errors:
+                self.stderr.write(f"error analyzing model evaluation {pk}:\n{error}")
+            raise CommandError(f"analysis failed for {len(errors)} model evaluations")
 
         self.stdout.write(self.style.SUCCESS("successfully completed analysis"))
 
+    def analyze(self, pks, opts, workers=1):
+        """
+        Yields the results of analyzing each model evaluation as they complete, either
+        serially or across a pool of worker processes.
+        """
+        kwargs = analysis_kwargs(opts)
+        workers = min(workers, len(pks))
+        if workers <= 1:
+            for pk in pks:
+                yield analyze_model_evaluation(pk, kwargs)
+            return
+
+        # Close connections so they are not inherited by the workers
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=init_worker,
+        ) as pool:
+            futures = {
+                pool.submit(analyze_model_evaluation, pk, kwargs): pk for pk in pks
+            }
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except BrokenProcessPool:
+                    # A worker died (e.g. was killed) so the analysis did not complete
+                    yield futures[future], 0.0, traceback.format_exc()
+
     def validate_input(self, *args, **opts):
         if opts["cyberjudge"] and opts["labels"]:
             raise CommandError("specify either cyberjudge or simple labeling")
@@ -180,6 +277,12 @@ class Command(BaseCommand):
         if opts["all"] and opts["filter"]:
             raise CommandError("specify either --all or --filter not both")
 
+        if opts["workers"] < 1:
+            raise CommandError("specify at least one worker")
+
+        if opts["workers"] > 1 and opts["enqueue"]:
+            raise CommandError("specify either --workers or --enqueue not both")
+
     def get_queryset(self, **opts):
         if opts["all"]:
             return ModelEvaluation.objects.all()
@@ -200,37 +303,3 @@ class Command(BaseCommand):
 
             if result[0] == "n":
                 return False
-
-    def prechecks(self, **opts):
-        """
-        Puts together the precheck functions.
-        """
-        prechecks = []
-        precheck_funcs = (
-            ("output_type", self.evaluate_output_type),
-            ("sensitive", self.evaluate_sensitive),
-            ("cyberjudge", self.evaluate_cyberjudge),
-            ("labels", self.evaluate_labels),
-        )
-
-        # NOTE: it is assumed precheck_funcs is sorted by application order
-        for name, fn in precheck_funcs:
-            if opts[name]:
-                prechecks.append(fn)
-
-        return prechecks
-
-    def evaluate_cyberjudge(self, response):
-        extract_cyberjudge_label(response)
-        evaluate_cyberjudge_label_correct(response)
-
-    def evaluate_labels(self, response):
-        evaluate_label_correct(response)
-
-    def evaluate_output_type(self, response):
-        evaluate_valid_output_type(response)
-
-    def evaluate_sensitive(self, response):
-        if self._sensitive is None:
-            self._sensitive = list(Sensitive.objects.all())
-        evaluate_leaks_sensitive(response, self._sensitive)
@@ -0,0 +1,351 @@
+# parley.management.commands.benchmark
+# Benchmarks analytics computations against the current database.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 10:48:17 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: benchmark.py [] benjamin@rotational.io $
+
+"""
+Benchmarks analytics computations against the current database.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import time
+import statistics
+
+from collections import defaultdict
+
+from parley.models import LLM, Evaluation, Prompt, Response
+from parley.models import ModelEvaluation, ReviewTask, ResponseReview
+from parley.tasks import METRIC_FIELDS, BOOLEAN_METRICS, SCALAR_METRICS
+from parley.tasks import compute_metrics
+
+from django.db import connection, transaction
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+
+##########################################################################
+## Reference Implementations
+##########################################################################
+
+
+def tally_metrics(me: ModelEvaluation) -> dict:
+    """
+    The original in-Python implementation of cache_metrics that materializes every
+    response of the model evaluation, kept as a baseline to benchmark against.
+    """
+    metrics = {
+        "n_prompts": me.prompts().count(),
+        "n_responses": me.responses().count(),
+    }
+
+    counts = defaultdict(lambda: defaultdict(int))
+    values = defaultdict(list)
+    for response in me.responses():
+        for field in METRIC_FIELDS:
+            metric = getattr(response, field)
+            if metric is not None:
+                counts[field][metric] += 1
+                if field in SCALAR_METRICS:
+                    values[field].append(metric)
+
+    for field, (pos, neg) in BOOLEAN_METRICS.items():
+        if field not in counts:
+            metrics[pos], metrics[neg] = None, None
+            continue
+        metrics[pos] = counts[field].get(True, 0)
+        metrics[neg] = counts[field].get(False, 0)
+
+    for field, (mean, median) in SCALAR_METRICS.items():
+        vals = sorted(values[field])
+        metrics[mean] = sum(vals) / len(vals) if vals else None
+        metrics[median] = vals[len(vals) // 2] if vals else None
+
+    return metrics
+
+
+def hot_queries(me: ModelEvaluation) -> dict:
+    """
+    The queries the application runs constantly for a model evaluation, as unevaluated
+    querysets so that their plans can be explained.
+    """
+    # The response to the middle prompt is used for the previous and next queries
+    orders = me.prompts().exclude(order=None).values_list("order", flat=True)
+    middle = orders.order_by("order")[orders.count() // 2] if orders.exists() else 0
+
+    responses = Response.objects.filter(
+        model=me.model_id, prompt__evaluation=me.evaluation_id
+    )
+
+    queries = {
+        "prompts": me.prompts().values_list("id", flat=True),
+        "responses": me.responses().values_list("id", flat=True),
+        "previous": responses.filter(prompt__order__lt=middle)
+        .order_by("-prompt__order")
+        .values_list("id", flat=True)[:1],
+        "next": responses.filter(prompt__order__gt=middle)
+        .order_by("prompt__order")
+        .values_list("id", flat=True)[:1],
+        "agreement": ResponseReview.objects.filter(response__in=me.responses())
+        .values("response_id", "is_factual", "helpfulness")
+        .order_by(),
+    }
+
+    user = me.review_tasks.values_list("user", flat=True).first()
+    if user is not None:
+        queries["dashboard"] = ReviewTask.objects.filter(
+            completed_on=None, user=user
+        ).values_list("id", flat=True)
+
+    return queries
+
+
+def generate_dataset(n_responses: int, n_models: int = 10, reviewed: float = 0.1):
+    """
+    Creates a synthetic evaluation with n_responses responses from n_models models and
+    reviews of a fraction of the responses. Rows are bulk inserted without signals so
+    metrics are not cached for the model evaluations. Returns the evaluation.
+    """
+    n_prompts = max(n_responses // n_models, 1)
+    batch_size = 10000
+
+    with transaction.atomic():
+        user, _ = User.objects.get_or_create(username="benchmark")
+        evaluation = Evaluation.objects.create(
+            name=f"Benchmark {n_responses} Responses", task="benchmark"
+        )
+
+        llms = LLM.objects.bulk_create([
+            LLM(name=f"benchmark-{evaluation.id.hex[:8]}-{i}")
+            for i in range(n_models)
+        ])
+
+        prompts = Prompt.objects.bulk_create(
+            (
+                Prompt(
+                    evaluation=evaluation,
+                    prompt=f"Benchmark prompt {i}",
+                    expected_output=f"Expected output {i}",
+                    order=i,
+                    exclude=i % 50 == 0,
+                )
+                for i in range(n_prompts)
+            ),
+            batch_size=batch_size,
+        )
+
+        mes = ModelEvaluation.objects.bulk_create(
+            ModelEvaluation(model=llm, evaluation=evaluation) for llm in llms
+        )
+        n_reviewed = int(n_prompts * reviewed)
+        n_included = sum(1 for prompt in prompts if not prompt.exclude)
+        tasks = ReviewTask.objects.bulk_create(
+            ReviewTask(
+                user=user,
+                model_evaluation=me,
+                completed_on=None,
+                n_prompts=n_included,
+                n_reviewed=n_reviewed,
+            )
+            for me in mes
+        )
+
+        for llm, task in zip(llms, tasks):
+            responses = Response.objects.bulk_create(
+                (
+                    Response(
+                        model=llm,
+                        prompt=prompt,
+                        output=f"Output {i} of {llm.name}",
+                        is_factual=i % 3 == 0,
+                    )
+                    for i, prompt in enumerate(prompts)
+                ),
+                batch_size=batch_size,
+            )
+
+            ResponseReview.objects.bulk_create(
+                (
+                    ResponseReview(
+                        review=task,
+                        response=response,
+                        is_factual=i % 2 == 0,
+                        helpfulness=i % 5 + 1,
+                    )
+                    for i, response in enumerate(responses[:n_reviewed])
+                ),
+                batch_size=batch_size,
+            )
+
+    # Update the planner statistics for the new rows
+    with connection.cursor() as cursor:
+        for model in (Prompt, Response, ReviewTask, ResponseReview):
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    return evaluation
+
+
+##########################################################################
+## Command
+##########################################################################
+
+
+class Command(BaseCommand):
+
+    help = "Benchmark analytics computations against the current database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--repeats",
+            type=int,
+            default=3,
+            help="number of times to repeat each measurement",
+        )
+        parser.add_argument(
+            "-A",
+            "--all",
+            action="store_true",
+            help="run the benchmark across all model evaluations",
+        )
+        parser.add_argument(
+            "-g",
+            "--generate",
+            type=int,
+            default=None,
+            metavar="N",
+            help="generate a synthetic evaluation with N responses to benchmark",
+        )
+        parser.add_argument(
+            "-e",
+            "--explain",
+            action="store_true",
+            help="print the EXPLAIN ANALYZE plan of each query benchmarked",
+        )
+        parser.add_argument(
+            "benchmark",
+            choices=["metrics", "queries"],
+            help="the benchmark to run",
+        )
+        parser.add_argument(
+            "model_evaluations",
+            nargs="*",
+            metavar="uuid",
+            help="specify the model evaluation(s) to benchmark",
+        )
+        return super().add_arguments(parser)
+
+    def handle(self, *args, **opts):
+        if opts["repeats"] < 1:
+            raise CommandError("must repeat each measurement at least once")
+
+        handler = getattr(self, f"benchmark_{opts['benchmark']}")
+        handler(**opts)
+
+    def get_model_evaluations(self, **opts):
+        if opts["all"] and opts["model_evaluations"]:
+            raise CommandError("specify either model evaluations or --all not both")
+
+        if opts["all"]:
+            return ModelEvaluation.objects.all()
+
+        if opts["generate"] is not None:
+            if opts["generate"] < 1:
+                raise CommandError("generate at least one response")
+
+            self.stdout.write(f"generating {opts['generate']} responses ...")
+            evaluation = generate_dataset(opts["generate"])
+            self.stdout.write(f"created evaluation {evaluation.id}")
+            return ModelEvaluation.objects.filter(
+                evaluation=evaluation
+            ) | ModelEvaluation.objects.filter(id__in=opts["model_evaluations"])
+
+        if not opts["model_evaluations"]:
+            raise CommandError("specify model evaluations to benchmark or --all")
+
+        return ModelEvaluation.objects.filter(id__in=opts["model_evaluations"])
+
+    def timeit(self, fn, *args, repeats=3):
+        """
+        Returns the result of the last call and the best wall time in seconds.
+        """
+        best, result = None, None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = fn(*args)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
+
+    def benchmark_metrics(self, **opts):
+        """
+        Compare the in-Python metrics tally with the database aggregation.
+        """
+        self.stdout.write(
+            f"{'model evaluation':<40} {'responses':>10} {'python':>10} "
+            f"{'database':>10} {'speedup':>8}  agrees"
+        )
+
+        for me in self.get_model_evaluations(**opts):
+            expected, python = self.timeit(tally_metrics, me, repeats=opts["repeats"])
+            actual, database = self.timeit(
+                compute_metrics, me, repeats=opts["repeats"]
+            )
+
+            mismatches = [
+                key
+                for key, value in expected.items()
+                if not self.close(value, actual[key])
+            ]
+
+            self.stdout.write(
+                f"{str(me.id):<40} {expected['n_responses']:>10} {python:>9.3f}s "
+                f"{database:>9.3f}s {python / database:>7.1f}x  "
+                + ("yes" if not mismatches else "no: " + ", ".join(mismatches))
+            )
+
+    def benchmark_queries(self, **opts):
+        """
+        Measure the latency of the hot path queries, e.g. to compare query plans before
+        and after migrating indexes. Queries are run repeats times after a warm up run
+        so that the latencies reflect a warm cache.
+        """
+        self.stdout.write(
+            f"{'model evaluation':<40} {'query':<12} {'rows':>8} "
+            f"{'best':>10} {'median':>10}"
+        )
+
+        for me in self.get_model_evaluations(**opts):
+            for name, query in hot_queries(me).items():
+                rows = len(list(query.all()))
+                latencies = []
+                for _ in range(opts["repeats"]):
+                    start = time.perf_counter()
+                    list(query.all())
+                    latencies.append(time.perf_counter() - start)
+
+                self.stdout.write(
+                    f"{str(me.id):<40} {name:<12} {rows:>8} "
+                    f"{min(latencies) * 1000:>8.2f}ms "
+                    f"{statistics.median(latencies) * 1000:>8.2f}ms"
+                )
+
+                if opts["explain"]:
+                    plan = query.explain(analyze=True, buffers=True)
+                    self.stdout.write(
+                        "\n".join("    " + line for line in plan.splitlines())
+                    )
+
+    @staticmethod
+    def close(a, b, tol=1e-9):
+        if a is None or b is None:
+            return a is b
+        return abs(a - b) <= tol
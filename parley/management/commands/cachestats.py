@@ -0,0 +1,60 @@
+# parley.management.commands.cachestats
+# Reports the hit and miss statistics of the parlance caches.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 21:36:12 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: cachestats.py [] benjamin@rotational.io $
+
+"""
+Reports the hit and miss statistics of the parlance caches.
+
+Statistics are flushed to the cache by each process periodically, so they are only
+shared between processes when a file or database cache backend is configured.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+from parley.cache import cache_statistics, hit_ratio, reset_statistics
+
+from django.core.management.base import BaseCommand
+
+
+##########################################################################
+## Command
+##########################################################################
+
+
+class Command(BaseCommand):
+
+    help = "Report the hits, misses, and hit ratio of each cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-r",
+            "--reset",
+            action="store_true",
+            help="reset the statistics after reporting them",
+        )
+        return super().add_arguments(parser)
+
+    def handle(self, *args, **opts):
+        results = cache_statistics()
+        if not results:
+            self.stdout.write(self.style.WARNING("no cache statistics recorded"))
+
+        for name, counts in results.items():
+            ratio = hit_ratio(counts["hits"], counts["misses"])
+            ratio = f"{ratio:0.1%}" if ratio is not None else "n/a"
+            self.stdout.write(
+                f"{name}: {counts['hits']} hits {counts['misses']} misses ({ratio})"
+            )
+
+        if opts["reset"]:
+            reset_statistics()
+            self.stdout.write(self.style.SUCCESS("cache statistics reset"))
@@ -0,0 +1,91 @@
+# parley.management.commands.reconcile
+# Checks incrementally maintained metrics against a full recomputation.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 11:52:40 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: reconcile.py [] benjamin@rotational.io $
+
+"""
+Checks incrementally maintained metrics against a full recomputation.
+
+The progress counters of the review tasks of each model evaluation are also checked
+against a count of their prompts and reviews.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+from parley.models import ModelEvaluation
+from parley.tasks import reconcile_metrics, reconcile_review_task
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+##########################################################################
+## Command
+##########################################################################
+
+
+class Command(BaseCommand):
+
+    help = "Check the cached metrics of model evaluations against a full recompute"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-A",
+            "--all",
+            action="store_true",
+            help="reconcile the metrics of all model evaluations",
+        )
+        parser.add_argument(
+            "-f",
+            "--fix",
+            action="store_true",
+            help="replace mismatched metrics and counters with the recomputed values",
+        )
+        parser.add_argument(
+            "model_evaluations",
+            nargs="*",
+            metavar="uuid",
+            help="specify the model evaluation(s) to reconcile",
+        )
+        return super().add_arguments(parser)
+
+    def handle(self, *args, **opts):
+        if opts["all"] and opts["model_evaluations"]:
+            raise CommandError("specify either model evaluations or --all not both")
+
+        if opts["all"]:
+            query = ModelEvaluation.objects.all()
+        elif opts["model_evaluations"]:
+            query = ModelEvaluation.objects.filter(id__in=opts["model_evaluations"])
+        else:
+            raise CommandError("specify model evaluations to reconcile or --all")
+
+        n_checked, n_mismatched = 0, 0
+        for me in query:
+            n_checked += 1
+            mismatches = reconcile_metrics(me, fix=opts["fix"])
+            for task in me.review_tasks.all():
+                for field, values in reconcile_review_task(task, fix=opts["fix"]).items():
+                    mismatches[f"review task {task.id} {field}"] = values
+
+            if not mismatches:
+                continue
+
+            n_mismatched += 1
+            self.stdout.write(self.style.WARNING(f"{me.id}: {len(mismatches)} mismatches"))
+            for field, (cached, expected) in mismatches.items():
+                self.stdout.write(f"  {field}: cached {cached} expected {expected}")
+
+        summary = f"{n_mismatched} of {n_checked} model evaluations had mismatches"
+        if n_mismatched and opts["fix"]:
+            summary += " (fixed)"
+
+        style = self.style.WARNING if n_mismatched else self.style.SUCCESS
+        self.stdout.write(style(summary))
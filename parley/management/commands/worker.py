@@ -0,0 +1,99 @@
+# parley.management.commands.worker
+# Runs background jobs from the database-backed task queue.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 14:18:51 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: worker.py [] benjamin@rotational.io $
+
+"""
+Runs background jobs from the database-backed task queue.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import time
+import signal
+
+from parley.jobs import claim, run
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+##########################################################################
+## Command
+##########################################################################
+
+
+class Command(BaseCommand):
+
+    help = "Run queued background jobs until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-b",
+            "--burst",
+            action="store_true",
+            help="exit once there are no more jobs ready to run",
+        )
+        parser.add_argument(
+            "-n",
+            "--max-jobs",
+            type=int,
+            default=None,
+            metavar="N",
+            help="exit after running N jobs",
+        )
+        parser.add_argument(
+            "-s",
+            "--sleep",
+            type=float,
+            default=1.0,
+            metavar="sec",
+            help="seconds to wait before polling an empty queue again",
+        )
+        return super().add_arguments(parser)
+
+    def handle(self, *args, **opts):
+        if opts["max_jobs"] is not None and opts["max_jobs"] < 1:
+            raise CommandError("specify at least one job to run")
+
+        # Finish the current job before exiting on SIGTERM or SIGINT
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        n_jobs = 0
+        while not self.stopping:
+            job = claim()
+            if job is None:
+                if opts["burst"]:
+                    break
+                time.sleep(opts["sleep"])
+                continue
+
+            start = time.perf_counter()
+            succeeded = run(job)
+            elapsed = time.perf_counter() - start
+            n_jobs += 1
+
+            if succeeded:
+                self.stdout.write(f"{job.name} {job.id} succeeded in {elapsed:0.2f}s")
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f"{job.name} {job.id} attempt {job.attempts} {job.status} "
+                    f"in {elapsed:0.2f}s"
+                ))
+
+            if opts["max_jobs"] is not None and n_jobs >= opts["max_jobs"]:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"worker ran {n_jobs} jobs"))
+
+    def stop(self, signum, frame):
+        self.stopping = True
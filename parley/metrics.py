@@ -0,0 +1,230 @@
+# parley.metrics
+# Incremental maintenance of the cached metrics on model evaluations.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 11:36:02 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: metrics.py [] benjamin@rotational.io $
+
+"""
+Incremental maintenance of the cached metrics on model evaluations.
+
+The cached counters on a ModelEvaluation (n_similar, n_factual, etc.) are fully
+recomputed by cache_metrics when the analyze command is run. Between runs, the signals
+in parley.signals compute the change to the counters caused by each response that is
+created, updated, or deleted and record it with the aggregator, which applies the
+changes with F-expressions when the transaction commits. The reconcile command checks
+the incrementally maintained counters against a full recomputation.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import weakref
+import threading
+
+from functools import partial
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.lookups import Exact
+from django.db.models.functions import Coalesce, Now
+from django.db.models import Avg, Case, F, IntegerField, OuterRef, Subquery, When
+
+from parley.aggregates import Median
+from parley.cache import invalidate_model_evaluations
+from parley.models import ModelEvaluation, Response
+from parley.tasks import BOOLEAN_METRICS, SCALAR_METRICS, cache_metrics
+
+
+##########################################################################
+## Deltas
+##########################################################################
+
+
+def metric_deltas(old=None, new=None) -> dict:
+    """
+    Computes the change to the cached counters of a model evaluation when the metric
+    values of a response change from old to new; old is None for a created response
+    and new is None for a deleted response. Returns a dictionary mapping counter fields
+    to their (non-zero) change. Scalar metrics such as helpfulness cannot be maintained
+    with counters, so if they change the metric field is mapped to 1 to indicate that
+    the scalar aggregates must be recomputed.
+    """
+    deltas = defaultdict(int)
+    if old is None:
+        deltas["n_responses"] += 1
+    if new is None:
+        deltas["n_responses"] -= 1
+
+    old, new = old or {}, new or {}
+    for field, (pos, neg) in BOOLEAN_METRICS.items():
+        for values, sign in ((old, -1), (new, 1)):
+            value = values.get(field, None)
+            if value is True:
+                deltas[pos] += sign
+            elif value is False:
+                deltas[neg] += sign
+
+    for field in SCALAR_METRICS:
+        if old.get(field, None) != new.get(field, None):
+            deltas[field] = 1
+
+    return {field: delta for field, delta in deltas.items() if delta != 0}
+
+
+def scalar_aggregate(aggregate):
+    """
+    Returns a subquery that computes the aggregate over the responses of the model
+    evaluation being updated.
+    """
+    responses = Response.objects.filter(
+        model=OuterRef("model"),
+        prompt__evaluation=OuterRef("evaluation"),
+        prompt__exclude=False,
+    )
+    return Subquery(
+        responses.order_by().values("model").annotate(value=aggregate).values("value")
+    )
+
+
+##########################################################################
+## Aggregator
+##########################################################################
+
+
+class PendingChanges(object):
+    """
+    The changes to the counters of model evaluations recorded in one savepoint (or in
+    the outermost transaction block), keyed by (model_id, evaluation_id). The deltas
+    of a model evaluation are None if its metrics must be recomputed in full.
+    """
+
+    def __init__(self):
+        self.changes = {}
+
+    def add(self, key, deltas):
+        if deltas is None or (key in self.changes and self.changes[key] is None):
+            self.changes[key] = None
+            return
+
+        merged = self.changes.setdefault(key, defaultdict(int))
+        for field, delta in deltas.items():
+            merged[field] += delta
+
+
+class MetricsAggregator(object):
+    """
+    Accumulates changes to the cached counters of model evaluations and applies them
+    when the current transaction commits, so that saving many responses in a single
+    transaction results in one UPDATE per model evaluation rather than one per save.
+    Outside of a transaction the changes are applied immediately.
+
+    Model evaluations can also be marked as stale when the change to their counters is
+    not known (e.g. after a bulk insert), in which case the metrics are recomputed in
+    full with cache_metrics when the transaction commits.
+
+    The changes are kept per savepoint: the first change in a savepoint registers a
+    commit hook that holds the changes of the savepoint. If the savepoint is rolled
+    back then Django discards the hook and its changes with it; otherwise the hook
+    applies them when the outermost transaction commits. Only a weak reference to the
+    changes of each savepoint is kept to find them for later changes, so changes that
+    were rolled back or already applied are never reused by another transaction.
+    """
+
+    def __init__(self, using=None):
+        self.using = using
+        self._local = threading.local()
+
+    @property
+    def state(self):
+        if not hasattr(self._local, "savepoints"):
+            self._local.savepoints = weakref.WeakValueDictionary()
+        return self._local
+
+    def record(self, model_id, evaluation_id, deltas):
+        """
+        Record the deltas computed by metric_deltas for a model evaluation.
+        """
+        if deltas:
+            self._register((model_id, evaluation_id), deltas)
+
+    def record_stale(self, model_id, evaluation_id):
+        """
+        Mark the metrics of a model evaluation for a full recomputation.
+        """
+        self._register((model_id, evaluation_id), None)
+
+    def _register(self, key, deltas):
+        connection = transaction.get_connection(self.using)
+        if not connection.in_atomic_block:
+            pending = PendingChanges()
+            pending.add(key, deltas)
+            self.flush(pending)
+            return
+
+        savepoint = tuple(connection.savepoint_ids)
+        pending = self.state.savepoints.get(savepoint)
+        if pending is None:
+            pending = self.state.savepoints[savepoint] = PendingChanges()
+            transaction.on_commit(partial(self.flush, pending), using=self.using)
+        pending.add(key, deltas)
+
+    def flush(self, pending):
+        """
+        Apply the committed changes to the model evaluations.
+        """
+        changes, pending.changes = pending.changes, {}
+        invalidate_model_evaluations(changes)
+
+        for (model_id, evaluation_id), deltas in changes.items():
+            query = ModelEvaluation.objects.filter(
+                model_id=model_id, evaluation_id=evaluation_id
+            )
+
+            if deltas is None:
+                for me in query:
+                    cache_metrics(me)
+                continue
+
+            updates = self.updates(deltas)
+            if updates:
+                query.update(**updates)
+
+    def updates(self, deltas):
+        """
+        Converts deltas into the F-expressions used to update a model evaluation.
+        """
+        updates = {}
+        if deltas.get("n_responses", 0) != 0:
+            updates["n_responses"] = F("n_responses") + deltas["n_responses"]
+
+        for pos, neg in BOOLEAN_METRICS.values():
+            if deltas.get(pos, 0) == 0 and deltas.get(neg, 0) == 0:
+                continue
+
+            # A metric with no values at all is None rather than zero
+            npos = Coalesce(F(pos), 0) + deltas.get(pos, 0)
+            nneg = Coalesce(F(neg), 0) + deltas.get(neg, 0)
+            empty = Exact(npos + nneg, 0)
+
+            for field, value in ((pos, npos), (neg, nneg)):
+                updates[field] = Case(
+                    When(empty, then=None), default=value, output_field=IntegerField()
+                )
+
+        for field, (mean, median) in SCALAR_METRICS.items():
+            if deltas.get(field, 0) != 0:
+                updates[mean] = scalar_aggregate(Avg(field))
+                updates[median] = scalar_aggregate(Median(field))
+
+        if updates:
+            updates["metrics_last_cached_on"] = Now()
+        return updates
+
+
+aggregator = MetricsAggregator()
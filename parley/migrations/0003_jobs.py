@@ -0,0 +1,44 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:51
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parley', '0002_rename_n_confabulations_modelevaluation_n_factual_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='The globally unique identifier of the object', primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, help_text='The timestamp that the object was created')),
+                ('modified', models.DateTimeField(auto_now=True, help_text='The timestamp that the object was last modified')),
+                ('name', models.CharField(help_text='The name of the registered task to run', max_length=255)),
+                ('args', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='The keyword arguments to call the task with')),
+                ('dedupe_key', models.CharField(blank=True, default=None, help_text='Only one job with this key may be queued at a time', max_length=255, null=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', help_text='The current state of the job', max_length=16)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='The number of times a worker has started the job')),
+                ('max_attempts', models.PositiveIntegerField(default=3, help_text='The number of attempts before the job is marked as failed')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='The job will not be run before this time')),
+                ('started_on', models.DateTimeField(blank=True, default=None, help_text='The timestamp the most recent attempt was started', null=True)),
+                ('completed_on', models.DateTimeField(blank=True, default=None, help_text='The timestamp the job succeeded or finally failed', null=True)),
+                ('progress', models.FloatField(blank=True, default=None, help_text='The fraction of the job completed, if reported by the task', null=True)),
+                ('error', models.TextField(blank=True, default=None, help_text='The traceback of the most recent failed attempt', null=True)),
+                ('model_evaluation', models.ForeignKey(blank=True, default=None, help_text='The model evaluation the job operates on, if any', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='parley.modelevaluation')),
+            ],
+            options={
+                'db_table': 'jobs',
+                'ordering': ('-created',),
+                'get_latest_by': 'created',
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['run_after'], name='jobs_queued_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('dedupe_key',), name='unique_queued_job')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:54
+
+import django.core.serializers.json
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parley', '0003_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Upload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='The globally unique identifier of the object', primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, help_text='The timestamp that the object was created')),
+                ('modified', models.DateTimeField(auto_now=True, help_text='The timestamp that the object was last modified')),
+                ('kind', models.CharField(choices=[('objs', 'Objects'), ('eval', 'Evaluation')], default='objs', help_text='The uploader form used to ingest the files', max_length=4)),
+                ('params', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='The non-file form fields submitted with the upload')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', help_text='The current state of the ingest', max_length=16)),
+                ('error', models.TextField(blank=True, default=None, help_text='The error that caused the ingest to fail', null=True)),
+                ('counts', models.TextField(blank=True, default=None, help_text='The HTML summary of the objects created and updated', null=True)),
+                ('evaluation', models.ForeignKey(blank=True, help_text='The evaluation created by an evaluation upload', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='parley.evaluation')),
+                ('job', models.ForeignKey(blank=True, help_text='The background job that ingests the upload', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads', to='parley.job')),
+                ('user', models.ForeignKey(blank=True, help_text='The user that submitted the upload', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'uploads',
+                'ordering': ('-created',),
+                'get_latest_by': 'created',
+            },
+        ),
+        migrations.CreateModel(
+            name='UploadFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, help_text='The timestamp that the object was created')),
+                ('modified', models.DateTimeField(auto_now=True, help_text='The timestamp that the object was last modified')),
+                ('field', models.CharField(help_text='The name of the form field the file was submitted as', max_length=255)),
+                ('name', models.CharField(help_text='The original name of the uploaded file', max_length=255)),
+                ('file', models.FileField(help_text='The stored copy of the uploaded file', upload_to='%Y/%m/%d/')),
+                ('size', models.BigIntegerField(default=0, help_text='The size of the uploaded file in bytes')),
+                ('bytes_processed', models.BigIntegerField(default=0, help_text='The number of bytes of the file read by the ingest')),
+                ('rows_processed', models.IntegerField(default=0, help_text='The number of JSON lines ingested from the file')),
+                ('started_on', models.DateTimeField(blank=True, default=None, help_text='The timestamp the ingest of the file started', null=True)),
+                ('completed_on', models.DateTimeField(blank=True, default=None, help_text='The timestamp the ingest of the file completed', null=True)),
+                ('upload', models.ForeignKey(help_text='The upload the file was submitted with', on_delete=django.db.models.deletion.CASCADE, related_name='files', to='parley.upload')),
+            ],
+            options={
+                'db_table': 'upload_files',
+                'ordering': ('created', 'id'),
+            },
+        ),
+    ]
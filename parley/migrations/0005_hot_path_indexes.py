@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently so that large tables are not locked for writes
+    atomic = False
+
+    dependencies = [
+        ('parley', '0004_uploads'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='prompt',
+            index=models.Index(fields=['evaluation', 'order'], include=('id', 'exclude'), name='prompts_evaluation_order_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='prompt',
+            index=models.Index(condition=models.Q(('exclude', False)), fields=['evaluation', 'order'], include=('id',), name='prompts_included_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='responsereview',
+            index=models.Index(fields=['response'], include=('output_correct', 'label_correct', 'is_factual', 'is_readable', 'is_correct_style', 'helpfulness'), name='response_reviews_metrics_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='reviewtask',
+            index=models.Index(condition=models.Q(('completed_on', None)), fields=['user', '-created'], name='review_tasks_pending_idx'),
+        ),
+        # The new indexes lead with these foreign keys so their indexes are dropped
+        migrations.AlterField(
+            model_name='prompt',
+            name='evaluation',
+            field=models.ForeignKey(db_index=False, help_text='The evaluation that this prompt is a part of', on_delete=django.db.models.deletion.CASCADE, related_name='prompts', to='parley.evaluation'),
+        ),
+        migrations.AlterField(
+            model_name='responsereview',
+            name='response',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='parley.response'),
+        ),
+    ]
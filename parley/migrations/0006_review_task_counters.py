@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:12
+
+from django.db import migrations, models
+
+
+def count_review_tasks(apps, schema_editor):
+    ReviewTask = apps.get_model("parley", "ReviewTask")
+    Prompt = apps.get_model("parley", "Prompt")
+
+    for task in ReviewTask.objects.select_related("model_evaluation"):
+        ReviewTask.objects.filter(pk=task.pk).update(
+            n_prompts=Prompt.objects.filter(
+                evaluation_id=task.model_evaluation.evaluation_id, exclude=False
+            ).count(),
+            n_reviewed=task.response_reviews.count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parley', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewtask',
+            name='n_prompts',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='The number of included prompts in the evaluation to be reviewed'),
+        ),
+        migrations.AddField(
+            model_name='reviewtask',
+            name='n_reviewed',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='The number of responses that have been reviewed by the user'),
+        ),
+        migrations.RunPython(count_review_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parley', '0006_review_task_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evaluation',
+            name='deleted_on',
+            field=models.DateTimeField(blank=True, default=None, editable=False, help_text='The timestamp the evaluation was marked to be deleted in the background', null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-19 03:31
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # The index is dropped concurrently so that prompts are not locked for writes
+    atomic = False
+
+    dependencies = [
+        ('parley', '0007_evaluation_deleted_on'),
+    ]
+
+    operations = [
+        # Duplicates prompts_evaluation_order_idx, which includes the exclude column
+        RemoveIndexConcurrently(
+            model_name='prompt',
+            name='prompts_included_idx',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parley', '0008_drop_prompts_included_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat',
+            field=models.DateTimeField(blank=True, default=None, help_text='The timestamp the worker running the job last reported it is alive', null=True),
+        ),
+    ]
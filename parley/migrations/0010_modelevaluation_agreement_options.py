@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parley', '0009_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modelevaluation',
+            name='agreement_options',
+            field=models.JSONField(default=None, editable=False, help_text='The thresholds and likert method reviewer agreement was last computed with', null=True),
+        ),
+    ]
@@ -22,3 +22,5 @@ from .llm import *
 from .sensitive import *
 from .enums import *
 from .user import *
+from .job import *
+from .upload import *
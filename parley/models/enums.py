@@ -63,3 +63,25 @@ class FivePointLikert(models.IntegerChoices):
     NEUTRAL = (3, _("Neutral"))
     AGREE = (4, _("Agree"))
     STRONGLY_AGREE = (5, _("Strongly Agree"))
+
+
+class JobStatus(models.TextChoices):
+    """
+    JobStatus tracks the lifecycle of a background job: jobs are queued until a worker
+    claims them, then either succeed or are requeued for retry until they run out of
+    attempts and fail.
+    """
+
+    QUEUED = ("queued", _("Queued"))
+    RUNNING = ("running", _("Running"))
+    SUCCEEDED = ("succeeded", _("Succeeded"))
+    FAILED = ("failed", _("Failed"))
+
+
+class UploadKind(models.TextChoices):
+    """
+    UploadKind identifies the uploader form that an upload was submitted with.
+    """
+
+    OBJECTS = ("objs", _("Objects"))
+    EVALUATION = ("eval", _("Evaluation"))
@@ -74,6 +74,14 @@ class Evaluation(BaseModel):
         help_text="This prompt set should be used in evaluations of new models",
     )
 
+    deleted_on = models.DateTimeField(
+        null=True,
+        blank=True,
+        default=None,
+        editable=False,
+        help_text="The timestamp the evaluation was marked to be deleted in the background",
+    )
+
     llms = models.ManyToManyField(
         "parley.LLM",
         through="parley.ModelEvaluation",
@@ -92,6 +100,10 @@ class Evaluation(BaseModel):
     def get_absolute_url(self):
         return reverse("evaluation-detail", args=(self.id,))
 
+    @property
+    def is_deleted(self):
+        return self.deleted_on is not None
+
 
 class Prompt(BaseModel):
     """
@@ -120,6 +132,7 @@ class Prompt(BaseModel):
     evaluation = models.ForeignKey(
         "parley.Evaluation",
         null=False,
+        db_index=False,
         on_delete=models.CASCADE,
         related_name="prompts",
         help_text="The evaluation that this prompt is a part of",
@@ -179,6 +192,15 @@ class Prompt(BaseModel):
         get_latest_by = "created"
         verbose_name = "prompt"
         verbose_name_plural = "prompts"
+        indexes = [
+            # Prompts of an evaluation in review order (e.g. previous/next response);
+            # also serves lookups by evaluation so the foreign key is not indexed.
+            models.Index(
+                fields=["evaluation", "order"],
+                include=["id", "exclude"],
+                name="prompts_evaluation_order_idx",
+            ),
+        ]
 
     def __str__(self):
         if self.title:
@@ -0,0 +1,160 @@
+# parley.models.job
+# Database-backed queue of background jobs run by worker processes.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 13:40:12 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: job.py [] benjamin@rotational.io $
+
+"""
+Database-backed queue of background jobs run by worker processes.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+from .base import BaseModel
+from .enums import JobStatus
+
+from django.db import models
+from django.utils import timezone
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+##########################################################################
+## Models
+##########################################################################
+
+
+class Job(BaseModel):
+    """
+    A job is a call to a registered task (see parley.jobs) that is stored in the
+    database until a worker process claims and runs it. Jobs with a dedupe key are
+    only enqueued once while they are queued, so e.g. requesting a metrics refresh
+    for a model evaluation many times results in a single job.
+    """
+
+    name = models.CharField(
+        max_length=255,
+        null=False,
+        blank=False,
+        help_text="The name of the registered task to run",
+    )
+
+    args = models.JSONField(
+        default=dict,
+        encoder=DjangoJSONEncoder,
+        blank=True,
+        help_text="The keyword arguments to call the task with",
+    )
+
+    dedupe_key = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        default=None,
+        help_text="Only one job with this key may be queued at a time",
+    )
+
+    model_evaluation = models.ForeignKey(
+        "parley.ModelEvaluation",
+        null=True,
+        blank=True,
+        default=None,
+        on_delete=models.CASCADE,
+        related_name="jobs",
+        help_text="The model evaluation the job operates on, if any",
+    )
+
+    status = models.CharField(
+        max_length=16,
+        choices=JobStatus,
+        default=JobStatus.QUEUED,
+        help_text="The current state of the job",
+    )
+
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="The number of times a worker has started the job",
+    )
+
+    max_attempts = models.PositiveIntegerField(
+        default=3,
+        help_text="The number of attempts before the job is marked as failed",
+    )
+
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        help_text="The job will not be run before this time",
+    )
+
+    started_on = models.DateTimeField(
+        null=True,
+        blank=True,
+        default=None,
+        help_text="The timestamp the most recent attempt was started",
+    )
+
+    heartbeat = models.DateTimeField(
+        null=True,
+        blank=True,
+        default=None,
+        help_text="The timestamp the worker running the job last reported it is alive",
+    )
+
+    completed_on = models.DateTimeField(
+        null=True,
+        blank=True,
+        default=None,
+        help_text="The timestamp the job succeeded or finally failed",
+    )
+
+    progress = models.FloatField(
+        null=True,
+        blank=True,
+        default=None,
+        help_text="The fraction of the job completed, if reported by the task",
+    )
+
+    error = models.TextField(
+        null=True,
+        blank=True,
+        default=None,
+        help_text="The traceback of the most recent failed attempt",
+    )
+
+    class Meta:
+        db_table = "jobs"
+        ordering = ("-created",)
+        get_latest_by = "created"
+        indexes = [
+            models.Index(
+                fields=["run_after"],
+                condition=models.Q(status=JobStatus.QUEUED),
+                name="jobs_queued_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=models.Q(status=JobStatus.QUEUED),
+                name="unique_queued_job",
+            ),
+        ]
+
+    @property
+    def is_active(self):
+        return self.status in {JobStatus.QUEUED, JobStatus.RUNNING}
+
+    @property
+    def percent_complete(self):
+        if self.progress is None:
+            return None
+        return int(self.progress * 100)
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
@@ -42,6 +42,55 @@ def llm_cover_upload_path(instance, filename):
     return os.path.join("covers", "llms", f"{instance.id}{ext}")
 
 
+def boolean_agreement(true_count, false_count, true_threshold=0.5):
+    """
+    Compute agreement for a boolean field from the number of true and false votes. If
+    threshold is between 0 and 1 then the proportion of votes must be positive to be
+    considered true. If the threshold is >= 1 then the field must have that number of
+    absolute votes to be considered true. None is returned if there are no votes to
+    avoid misleading results.
+    """
+    if true_threshold < 0:
+        raise ValueError("Threshold must be greater than or equal to 0")
+
+    if true_threshold < 1:
+        # Consider the proportion of true votes
+        total_count = true_count + false_count
+        if total_count == 0:
+            return None
+        proportion = float(true_count) / float(total_count)
+        return proportion >= true_threshold
+    else:
+        # Consider the absolute number of true votes
+        if true_count >= true_threshold:
+            return True
+        if false_count >= true_threshold:
+            return False
+        return None
+
+
+def likert_agreement(values, method="mean"):
+    """
+    Compute agreement for likert scale votes, either by "mean" or "median". None values
+    are ignored and None is returned if there are no votes.
+    """
+    if method not in ("mean", "median"):
+        raise ValueError("Method must be either mean or median")
+
+    # Filter out None values
+    values = [value for value in values if value is not None]
+
+    # If there are no reviews then return None
+    if len(values) == 0:
+        return None
+
+    # Compute the mean or median of the reviews
+    if method == "mean":
+        return sum(values) / len(values)
+    elif method == "median":
+        return sorted(values)[len(values) // 2]
+
+
 ##########################################################################
 ## Models
 ##########################################################################
@@ -337,20 +386,7 @@ class Response(BaseModel):
         false_count = ResponseReview.objects.filter(
             response=self, **{key: False}
         ).count()
-        if true_threshold < 1:
-            # Consider the proportion of true votes
-            total_count = true_count + false_count
-            if total_count == 0:
-                return None
-            proportion = float(true_count) / float(total_count)
-            return proportion >= true_threshold
-        else:
-            # Consider the absolute number of true votes
-            if true_count >= true_threshold:
-                return True
-            if false_count >= true_threshold:
-                return False
-            return None
+        return boolean_agreement(true_count, false_count, true_threshold)
 
     def agree_likert(self, key, method="mean"):
         """
@@ -366,19 +402,7 @@ class Response(BaseModel):
             .values_list(key, flat=True)
             .all()
         )
-
-        # Filter out None values
-        reviews = [review for review in reviews if review is not None]
-
-        # If there are no reviews then return None
-        if len(reviews) == 0:
-            return None
-
-        # Compute the mean or median of the reviews
-        if method == "mean":
-            return sum(reviews) / len(reviews)
-        elif method == "median":
-            return sorted(reviews)[len(reviews) // 2]
+        return likert_agreement(reviews, method)
 
     def get_previous(self):
         try:
@@ -472,6 +496,13 @@ class ModelEvaluation(BaseModel):
         editable=False,
     )
 
+    agreement_options = models.JSONField(
+        default=None,
+        null=True,
+        editable=False,
+        help_text="The thresholds and likert method reviewer agreement was last computed with",
+    )
+
     # Cached metric
     n_prompts = models.IntegerField(
         default=0,
@@ -632,6 +663,10 @@ class ModelEvaluation(BaseModel):
     def image(self):
         return self.model.image
 
+    @property
+    def latest_job(self):
+        return self.jobs.first()
+
     @property
     def percent_complete(self):
         return (
@@ -23,6 +23,11 @@ from django.db import models
 from .base import TimestampedModel
 
 
+# Cached scanner and the fingerprint of the sensitive terms it was built from
+_scanner = None
+_scanner_fingerprint = None
+
+
 class Sensitive(TimestampedModel):
     """
     Any data or information that should be considered sensitive and not included
@@ -83,3 +88,146 @@ class Sensitive(TimestampedModel):
 
     def __str__(self):
         return self.term
+
+
+##########################################################################
+## Sensitive Scanner
+##########################################################################
+
+
+def trie_pattern(terms) -> str:
+    """
+    Builds a regular expression that matches any of the literal terms by arranging
+    them into a prefix trie, so that the regex engine only follows the branches that
+    match the text rather than trying every term at every position. At each position
+    the longest matching term is preferred.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def compile_node(node):
+        end = "" in node
+        branches = [
+            re.escape(char) + compile_node(child)
+            for char, child in sorted(node.items())
+            if char != ""
+        ]
+
+        if not branches:
+            return ""
+
+        if len(branches) == 1 and not end:
+            return branches[0]
+
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if end else pattern
+
+    return compile_node(trie)
+
+
+class SensitiveScanner(object):
+    """
+    Scans text for all sensitive terms in a single pass per term group. Literal terms
+    are combined into one trie regex per case sensitivity group (case insensitive
+    terms are matched against the casefolded text, which is casefolded only once) and
+    regular expression terms are compiled once. Use sensitive_scanner() to get a
+    scanner for the current sensitive terms in the database.
+    """
+
+    def __init__(self, sensitive):
+        self.literals = {}
+        self.regexes = []
+        self.contains = {}
+
+        groups = {True: set(), False: set()}
+        for item in sensitive:
+            if not item.term:
+                continue
+
+            if item.is_regex:
+                flags = 0 if item.case_sensitive else re.IGNORECASE
+                self.regexes.append((item, re.compile(item.term, flags)))
+                continue
+
+            term = item.term if item.case_sensitive else item.term.casefold()
+            groups[item.case_sensitive].add(term)
+            self.literals.setdefault((item.case_sensitive, term), []).append(item)
+
+        # The pattern is searched with a lookahead so that overlapping matches are
+        # found, but only the longest term at each position is reported, so we also
+        # record which terms are contained in each term to report them as well.
+        self.patterns = {}
+        for case_sensitive, terms in groups.items():
+            if not terms:
+                continue
+
+            self.patterns[case_sensitive] = re.compile(f"(?=({trie_pattern(terms)}))")
+            for term in terms:
+                self.contains[(case_sensitive, term)] = [
+                    other for other in terms if other != term and other in term
+                ]
+
+    def search(self, text: str) -> bool:
+        """
+        Returns True if any sensitive term is found in the text.
+        """
+        for case_sensitive, pattern in self.patterns.items():
+            if pattern.search(text if case_sensitive else text.casefold()):
+                return True
+
+        for _, regex in self.regexes:
+            if regex.search(text):
+                return True
+        return False
+
+    def matches(self, text: str) -> list:
+        """
+        Returns the sensitive terms found in the text.
+        """
+        found = set()
+        for case_sensitive, pattern in self.patterns.items():
+            target = text if case_sensitive else text.casefold()
+            for match in pattern.finditer(target):
+                key = (case_sensitive, match.group(1))
+                if key in found:
+                    continue
+
+                found.add(key)
+                found.update((case_sensitive, t) for t in self.contains[key])
+
+        matched = [item for key in found for item in self.literals[key]]
+        matched.extend(item for item, regex in self.regexes if regex.search(text))
+        return matched
+
+    def __len__(self):
+        return sum(len(items) for items in self.literals.values()) + len(self.regexes)
+
+
+def sensitive_scanner() -> SensitiveScanner:
+    """
+    Returns a scanner for the sensitive terms in the database. The scanner is cached
+    and rebuilt when the sensitive terms change; the signals clear the cache on save
+    and delete, and the count and last modified timestamp of the terms are checked to
+    detect changes made by other processes.
+    """
+    global _scanner, _scanner_fingerprint
+    fingerprint = Sensitive.objects.aggregate(
+        count=models.Count("pk"), modified=models.Max("modified")
+    )
+
+    if _scanner is None or fingerprint != _scanner_fingerprint:
+        _scanner = SensitiveScanner(Sensitive.objects.all())
+        _scanner_fingerprint = fingerprint
+    return _scanner
+
+
+def invalidate_sensitive_scanner():
+    """
+    Clears the cached sensitive scanner so that it is rebuilt on next use.
+    """
+    global _scanner, _scanner_fingerprint
+    _scanner, _scanner_fingerprint = None, None
@@ -0,0 +1,198 @@
+# parley.models.upload
+# Uploaded files that are ingested into the database by background jobs.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 15:02:37 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: upload.py [] benjamin@rotational.io $
+
+"""
+Uploaded files that are ingested into the database by background jobs.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+from .base import BaseModel, TimestampedModel
+from .enums import JobStatus, UploadKind
+
+from django.db import models
+from django.urls import reverse
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+##########################################################################
+## Models
+##########################################################################
+
+
+class Upload(BaseModel):
+    """
+    An upload stores the files submitted to one of the uploader forms so that the
+    request can return immediately while a background job ingests the files. The
+    ingest of all files in an upload is all or nothing.
+    """
+
+    user = models.ForeignKey(
+        "auth.User",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="uploads",
+        help_text="The user that submitted the upload",
+    )
+
+    kind = models.CharField(
+        max_length=4,
+        choices=UploadKind,
+        default=UploadKind.OBJECTS,
+        help_text="The uploader form used to ingest the files",
+    )
+
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+        help_text="The non-file form fields submitted with the upload",
+    )
+
+    job = models.ForeignKey(
+        "parley.Job",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="uploads",
+        help_text="The background job that ingests the upload",
+    )
+
+    status = models.CharField(
+        max_length=16,
+        choices=JobStatus,
+        default=JobStatus.QUEUED,
+        help_text="The current state of the ingest",
+    )
+
+    error = models.TextField(
+        null=True,
+        blank=True,
+        default=None,
+        help_text="The error that caused the ingest to fail",
+    )
+
+    counts = models.TextField(
+        null=True,
+        blank=True,
+        default=None,
+        help_text="The HTML summary of the objects created and updated",
+    )
+
+    evaluation = models.ForeignKey(
+        "parley.Evaluation",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        help_text="The evaluation created by an evaluation upload",
+    )
+
+    class Meta:
+        db_table = "uploads"
+        ordering = ("-created",)
+        get_latest_by = "created"
+
+    def get_status_url(self):
+        return reverse("upload-status", args=(self.id,))
+
+    @property
+    def is_active(self):
+        return self.status in {JobStatus.QUEUED, JobStatus.RUNNING}
+
+    def __str__(self):
+        return f"{self.get_kind_display()} upload ({self.status})"
+
+
+class UploadFile(TimestampedModel):
+    """
+    A file that is part of an upload along with the progress of its ingest.
+    """
+
+    upload = models.ForeignKey(
+        "parley.Upload",
+        null=False,
+        on_delete=models.CASCADE,
+        related_name="files",
+        help_text="The upload the file was submitted with",
+    )
+
+    field = models.CharField(
+        max_length=255,
+        help_text="The name of the form field the file was submitted as",
+    )
+
+    name = models.CharField(
+        max_length=255,
+        help_text="The original name of the uploaded file",
+    )
+
+    file = models.FileField(
+        upload_to="%Y/%m/%d/",
+        help_text="The stored copy of the uploaded file",
+    )
+
+    size = models.BigIntegerField(
+        default=0,
+        help_text="The size of the uploaded file in bytes",
+    )
+
+    bytes_processed = models.BigIntegerField(
+        default=0,
+        help_text="The number of bytes of the file read by the ingest",
+    )
+
+    rows_processed = models.IntegerField(
+        default=0,
+        help_text="The number of JSON lines ingested from the file",
+    )
+
+    started_on = models.DateTimeField(
+        null=True,
+        blank=True,
+        default=None,
+        help_text="The timestamp the ingest of the file started",
+    )
+
+    completed_on = models.DateTimeField(
+        null=True,
+        blank=True,
+        default=None,
+        help_text="The timestamp the ingest of the file completed",
+    )
+
+    class Meta:
+        db_table = "upload_files"
+        ordering = ("created", "id")
+
+    @property
+    def percent_complete(self):
+        if self.completed_on is not None:
+            return 100
+        if not self.size:
+            return 0
+        return min(int(self.bytes_processed / self.size * 100), 100)
+
+    @property
+    def rows_per_second(self):
+        if self.started_on is None:
+            return None
+        end = self.completed_on or self.modified
+        elapsed = (end - self.started_on).total_seconds()
+        if elapsed <= 0:
+            return None
+        return self.rows_processed / elapsed
+
+    def __str__(self):
+        return self.name
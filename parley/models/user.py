@@ -65,11 +65,31 @@ class ReviewTask(TimestampedModel):
         help_text="The timestamp that the review was completed, null if not completed",
     )
 
+    n_prompts = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of included prompts in the evaluation to be reviewed",
+    )
+
+    n_reviewed = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of responses that have been reviewed by the user",
+    )
+
     class Meta:
         db_table = "review_tasks"
         ordering = ("-created",)
         get_latest_by = "created"
         unique_together = ("user", "model_evaluation")
+        indexes = [
+            # Review tasks that the user has not completed yet for the dashboard
+            models.Index(
+                fields=["user", "-created"],
+                condition=models.Q(completed_on=None),
+                name="review_tasks_pending_idx",
+            ),
+        ]
 
     @property
     def evaluation(self):
@@ -92,11 +112,9 @@ class ReviewTask(TimestampedModel):
 
     @property
     def percent_complete(self):
-        n_prompts = self.prompts().count()
-        if n_prompts == 0:
+        if self.n_prompts == 0:
             return 0
-        n_reviews = self.response_reviews.count()
-        return int((float(n_reviews) / float(n_prompts)) * 100)
+        return int((float(self.n_reviewed) / float(self.n_prompts)) * 100)
 
     def __str__(self):
         return f"{self.evaluation.name} ({self.model.name})"
@@ -118,6 +136,7 @@ class ResponseReview(TimestampedModel):
     response = models.ForeignKey(
         "parley.Response",
         null=False,
+        db_index=False,
         on_delete=models.CASCADE,
         related_name="reviews",
     )
@@ -183,3 +202,20 @@ class ResponseReview(TimestampedModel):
         ordering = ("-created",)
         get_latest_by = "created"
         unique_together = ("review", "response")
+        indexes = [
+            # Reviews of a response including the fields that reviewer agreement is
+            # computed from so that agreement can be computed from the index alone;
+            # also serves lookups by response so the foreign key is not indexed.
+            models.Index(
+                fields=["response"],
+                include=[
+                    "output_correct",
+                    "label_correct",
+                    "is_factual",
+                    "is_readable",
+                    "is_correct_style",
+                    "helpfulness",
+                ],
+                name="response_reviews_metrics_idx",
+            ),
+        ]
@@ -0,0 +1,174 @@
+# parley.navigation
+# Keyset navigation of the ordered responses of model evaluations.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 18:34:50 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: navigation.py [] benjamin@rotational.io $
+
+"""
+Keyset navigation of the ordered responses of model evaluations.
+
+The responses of a model evaluation are reviewed in the order of their prompts (by
+prompt order with unordered prompts last, then newest prompt first, then by response
+id). Rather than loading the whole sequence to find where a response is in it, the
+previous, next, and next unreviewed responses are found with keyset queries that
+filter on the (prompt order, prompt created, id) of the current response and fetch a
+single row, and the position of the response is counted in the same query as the
+length of the sequence.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+from django.db.models import Count, Q
+
+from parley.models import Response
+
+
+# The review order of responses; Postgres sorts NULL prompt orders last
+REVIEW_ORDER = ("prompt__order", "-prompt__created", "id")
+KEY_FIELDS = ("prompt__order", "prompt__created", "id")
+
+
+##########################################################################
+## Keyset Filters
+##########################################################################
+
+
+def follows(key) -> Q:
+    """
+    Returns a filter for the responses after the (prompt order, prompt created, id)
+    key in review order.
+    """
+    order, created, pk = key
+    tie = Q(prompt__created__lt=created) | Q(prompt__created=created, id__gt=pk)
+    if order is None:
+        return Q(prompt__order__isnull=True) & tie
+    return (
+        Q(prompt__order__gt=order)
+        | Q(prompt__order__isnull=True)
+        | (Q(prompt__order=order) & tie)
+    )
+
+
+def precedes(key) -> Q:
+    """
+    Returns a filter for the responses before the (prompt order, prompt created, id)
+    key in review order.
+    """
+    order, created, pk = key
+    tie = Q(prompt__created__gt=created) | Q(prompt__created=created, id__lt=pk)
+    if order is None:
+        return Q(prompt__order__isnull=False) | (Q(prompt__order__isnull=True) & tie)
+    return Q(prompt__order__lt=order) | (Q(prompt__order=order) & tie)
+
+
+##########################################################################
+## Response Sequences
+##########################################################################
+
+
+class ResponseSequence(object):
+    """
+    The responses of a model to the included prompts of an evaluation in review
+    order. Every lookup is a query that fetches at most one response id.
+    """
+
+    def __init__(self, model_id, evaluation_id):
+        self.model_id = model_id
+        self.evaluation_id = evaluation_id
+
+    def responses(self):
+        return (
+            Response.objects.filter(
+                model_id=self.model_id,
+                prompt__evaluation_id=self.evaluation_id,
+                prompt__exclude=False,
+            )
+            .order_by(*REVIEW_ORDER)
+            .values_list("id", flat=True)
+        )
+
+    def key(self, pk):
+        """
+        Returns the keyset key of the response or None if it is not in the sequence.
+        """
+        return (
+            Response.objects.filter(
+                pk=pk,
+                model_id=self.model_id,
+                prompt__evaluation_id=self.evaluation_id,
+                prompt__exclude=False,
+            )
+            .values_list(*KEY_FIELDS)
+            .first()
+        )
+
+    def first(self):
+        return self.responses().first()
+
+    def previous(self, pk):
+        key = self.key(pk)
+        if key is None:
+            return None
+        return self.responses().filter(precedes(key)).reverse().first()
+
+    def next(self, pk):
+        key = self.key(pk)
+        if key is None:
+            return None
+        return self.responses().filter(follows(key)).first()
+
+    def navigation(self, pk) -> dict:
+        """
+        Returns the previous and next responses, the (one-indexed) position of the
+        response, and the number of responses for rendering page controls.
+        """
+        key = self.key(pk)
+        if key is None:
+            return {
+                "previous": None,
+                "next": None,
+                "position": None,
+                "n_responses": self.responses().count(),
+            }
+
+        counts = self.responses().aggregate(
+            n_responses=Count("id"), n_preceding=Count("id", filter=precedes(key))
+        )
+
+        return {
+            "previous": self.responses().filter(precedes(key)).reverse().first(),
+            "next": self.responses().filter(follows(key)).first(),
+            "position": counts["n_preceding"] + 1,
+            "n_responses": counts["n_responses"],
+        }
+
+    def next_unreviewed(self, reviewed, after=None):
+        """
+        Returns the first response after the specified response (or from the start of
+        the sequence) whose id is not in reviewed (a collection or a queryset of
+        response ids), wrapping around to the start of the sequence. Returns None if
+        every response has been reviewed.
+        """
+        unreviewed = self.responses().exclude(id__in=reviewed)
+        if after is not None:
+            key = self.key(after)
+            if key is not None:
+                pk = unreviewed.filter(follows(key)).first()
+                if pk is not None:
+                    return pk
+        return unreviewed.first()
+
+
+def response_sequence(model_id, evaluation_id) -> ResponseSequence:
+    """
+    Returns the sequence of responses of the model to the included prompts of the
+    evaluation in review order.
+    """
+    return ResponseSequence(model_id, evaluation_id)
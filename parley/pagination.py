@@ -0,0 +1,102 @@
+# parley.pagination
+# Keyset pagination for list views.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 17:21:44 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: pagination.py [] benjamin@rotational.io $
+
+"""
+Keyset pagination for list views.
+
+Rather than counting the rows and skipping to an offset, each page is fetched with a
+filter on the (created, id) of the last object of the previous page, which is passed
+to the next page as an opaque cursor. Every page costs the same no matter how deep
+into the list it is.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import uuid
+import base64
+
+from datetime import datetime
+
+from django.http import Http404
+from django.db.models import Q
+
+
+##########################################################################
+## Cursors
+##########################################################################
+
+
+def encode_cursor(obj) -> str:
+    """
+    Encodes the position of the object in a list ordered by (-created, -id).
+    """
+    key = f"{obj.created.isoformat()}|{obj.pk}".encode("utf-8")
+    return base64.urlsafe_b64encode(key).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Returns the (created, id) position encoded by the cursor, raising ValueError if
+    the cursor is not valid.
+    """
+    try:
+        key = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created, pk = key.decode("utf-8").split("|")
+        created = datetime.fromisoformat(created)
+        return created, uuid.UUID(pk)
+    except (TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+##########################################################################
+## List Views
+##########################################################################
+
+
+class KeysetPaginationMixin(object):
+    """
+    Paginates a ListView of models with created timestamps and UUID primary keys by
+    keyset, newest first. The cursor of the next page is added to the context as
+    next_cursor and is None on the last page.
+    """
+
+    paginate_by = 50
+    cursor_param = "after"
+
+    def paginate_queryset(self, queryset, page_size):
+        queryset = queryset.order_by("-created", "-id")
+
+        cursor = self.request.GET.get(self.cursor_param, None)
+        if cursor:
+            try:
+                created, pk = decode_cursor(cursor)
+            except ValueError:
+                raise Http404("invalid page cursor")
+            queryset = queryset.filter(
+                Q(created__lt=created) | Q(created=created, id__lt=pk)
+            )
+
+        # Fetch one extra object to determine if there is another page
+        objects = list(queryset[: page_size + 1])
+        self.next_cursor = None
+        if len(objects) > page_size:
+            objects = objects[:page_size]
+            self.next_cursor = encode_cursor(objects[-1])
+
+        return None, None, objects, bool(cursor) or self.next_cursor is not None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["next_cursor"] = self.next_cursor
+        context["cursor_param"] = self.cursor_param
+        return context
@@ -0,0 +1,60 @@
+# parley.parallel
+# Entry points of the worker processes that analyze model evaluations in parallel.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Mon Oct 19 09:12:27 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: parallel.py [] benjamin@rotational.io $
+
+"""
+Entry points of the worker processes that analyze model evaluations in parallel.
+
+Worker processes are spawned rather than forked so that they do not share the
+parent's database connection. A spawned process unpickles these functions by
+importing this module before Django is configured, so this module must not import
+any models (or modules that do) at the top level; they are imported after
+django.setup() has been called in init_worker.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import time
+import django
+import traceback
+
+
+##########################################################################
+## Worker Processes
+##########################################################################
+
+
+def init_worker():
+    """
+    Configures Django in the worker process; each worker connects to the database
+    on its first query.
+    """
+    django.setup()
+
+
+def analyze_model_evaluation(pk, kwargs):
+    """
+    Runs the analysis of a single model evaluation with tasks.analyze. This function
+    is run in worker processes so it only takes picklable arguments and returns the id
+    of the model evaluation, the elapsed time, and the formatted traceback if an error
+    occurred rather than raising it.
+    """
+    from parley.tasks import analyze
+    from parley.models import ModelEvaluation
+
+    start = time.perf_counter()
+    try:
+        me = ModelEvaluation.objects.get(pk=pk)
+        analyze(me, **kwargs)
+    except Exception:
+        return pk, time.perf_counter() - start, traceback.format_exc()
+    return pk, time.perf_counter() - start, None
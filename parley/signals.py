@@ -17,11 +17,22 @@ Signals used by the parley app to maintain database correctness.
 ## Imports
 ##########################################################################
 
+from django.conf import settings
 from django.utils import timezone
 from django.dispatch import receiver
-from django.db.models.signals import post_save, post_delete
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_init, post_save, post_delete
 
-from parley.models import Response, ModelEvaluation, ResponseReview
+from parley.cache import invalidate
+from parley.metrics import aggregator, metric_deltas
+from parley.linkage import CHANGED, LINKED, UNLINKED, current_linkage
+from parley.models import Evaluation, Prompt, Response, ModelEvaluation, ResponseReview
+from parley.models import LLM, ReviewTask, Sensitive
+from parley.models.sensitive import invalidate_sensitive_scanner
+from parley.stats import statistics_changed
+from parley.tasks import METRIC_FIELDS, AGREEMENT_BOOLEAN_FIELDS, AGREEMENT_LIKERT_FIELDS
+from parley.tasks import collect_agreement, count_review_task_prompts
 
 
 ##########################################################################
@@ -36,6 +47,11 @@ def model_evaluation_linkage(sender, instance, created, *args, **kwargs):
     model evaluation object to track it.
     """
     if created:
+        linkage = current_linkage()
+        if linkage is not None:
+            linkage.record(LINKED, instance)
+            return
+
         kwargs = {
             "model": instance.model,
             "evaluation": instance.prompt.evaluation
@@ -51,6 +67,11 @@ def model_evaluation_unlink(sender, instance, *args, **kwargs):
     If a response has been deleted and the model is no longer associated with any
     prompts in the evaluation, unlink the model and the evaluation from the db.
     """
+    linkage = current_linkage()
+    if linkage is not None:
+        linkage.record(UNLINKED, instance)
+        return
+
     kwargs = {
         "model": instance.model,
         "prompt__evaluation": instance.prompt.evaluation
@@ -65,46 +86,264 @@ def model_evaluation_unlink(sender, instance, *args, **kwargs):
 
 
 ##########################################################################
-## Ensure ReviewTasks are
+## Maintain ReviewTask Progress
 ##########################################################################
 
 @receiver(post_save, sender=ResponseReview, dispatch_uid="check_review_task_completion")
 def check_review_task_completion(sender, instance, created, *args, **kwargs):
-    task = instance.review
-    changed = False
-
-    if not task.started_on:
-        task.started_on = timezone.localtime()
-        changed = True
-
-    if not task.completed_on:
-        n_prompts = task.prompts().count()
-        if n_prompts == 0 or task.response_reviews.count() == n_prompts:
-            task.completed_on = timezone.localtime()
-            changed = True
+    """
+    Increment the number of reviews of the task and mark it as started and, if every
+    prompt has been reviewed, as completed in a single update. The conditions are
+    evaluated by the database against the values before the update so that
+    concurrent reviews of the same task cannot lose a count.
+    """
+    if not created:
+        return
 
-    if changed:
-        task.save()
+    now = timezone.localtime()
+    ReviewTask.objects.filter(pk=instance.review_id).update(
+        n_reviewed=F("n_reviewed") + 1,
+        started_on=Coalesce("started_on", Value(now)),
+        completed_on=Case(
+            When(
+                completed_on=None,
+                n_prompts__lte=F("n_reviewed") + 1,
+                then=Value(now),
+            ),
+            default=F("completed_on"),
+        ),
+    )
 
 
 @receiver(post_delete, sender=ResponseReview, dispatch_uid="check_review_task_unfinished")
 def check_review_task_unfinished(sender, instance, *args, **kwargs):
-    task = instance.review
-    if task.completed_on:
-        n_prompts = task.prompts().count()
-        if n_prompts == 0:
+    """
+    Decrement the number of reviews of the task and mark a completed task as
+    unfinished (and not started if it has no reviews left) in a single update.
+    """
+    linkage = current_linkage()
+    if linkage is not None:
+        linkage.review_deleted(instance)
+        return
+
+    completed = Q(completed_on__isnull=False, n_prompts__gt=0)
+    ReviewTask.objects.filter(pk=instance.review_id).update(
+        n_reviewed=Greatest(F("n_reviewed") - 1, 0),
+        completed_on=Case(
+            When(completed & Q(n_prompts__gt=F("n_reviewed") - 1), then=None),
+            default=F("completed_on"),
+        ),
+        started_on=Case(
+            When(completed & Q(n_reviewed__lte=1), then=None),
+            default=F("started_on"),
+        ),
+    )
+
+
+@receiver(post_save, sender=Prompt, dispatch_uid="prompt_review_tasks_saved")
+def prompt_review_tasks_saved(sender, instance, created, update_fields, *args, **kwargs):
+    if not created and update_fields is not None:
+        if not set(update_fields) & {"exclude", "evaluation"}:
             return
+    count_review_task_prompts(instance.evaluation_id)
+
+
+##########################################################################
+## Maintain Cached Model Evaluation Metrics
+##########################################################################
+
+def metric_snapshot(instance):
+    """
+    Returns the metric values of the response as loaded or last saved, or None if any
+    of the metric fields were deferred when the response was loaded.
+    """
+    if any(field not in instance.__dict__ for field in METRIC_FIELDS):
+        return None
+    return {field: instance.__dict__[field] for field in METRIC_FIELDS}
+
+
+@receiver(post_init, sender=Response, dispatch_uid="snapshot_response_metrics")
+def snapshot_response_metrics(sender, instance, *args, **kwargs):
+    """
+    Record the metric values of the response when it is loaded so that the change to
+    the cached model evaluation metrics can be computed when it is saved.
+    """
+    instance._metric_snapshot = metric_snapshot(instance)
+
+
+@receiver(post_save, sender=Response, dispatch_uid="update_response_metrics")
+def update_response_metrics(sender, instance, created, raw, update_fields, **kwargs):
+    """
+    Apply the change in the response's metric values to the cached metrics of its
+    model evaluation. If the previous values are not known (e.g. when loading fixtures
+    or if the metric fields were deferred) the metrics are fully recomputed instead.
+    """
+    if update_fields is not None and not set(update_fields) & set(METRIC_FIELDS):
+        return
+
+    linkage = current_linkage()
+    if linkage is not None:
+        linkage.record(CHANGED, instance)
+        instance._metric_snapshot = metric_snapshot(instance)
+        return
 
-        n_reviews = task.response_reviews.count()
-        changed = False
+    prompt = instance.prompt
+    if not prompt.exclude:
+        key = (instance.model_id, prompt.evaluation_id)
+        old = None if created else getattr(instance, "_metric_snapshot", None)
+        new = metric_snapshot(instance)
 
-        if n_reviews < n_prompts:
-            task.completed_on = None
-            changed = True
+        if raw or new is None or (old is None and not created):
+            aggregator.record_stale(*key)
+        else:
+            aggregator.record(*key, metric_deltas(old, new))
 
-        if n_reviews == 0:
-            task.started_on = None
-            changed = True
+    instance._metric_snapshot = metric_snapshot(instance)
 
-        if changed:
-            task.save()
+
+@receiver(post_delete, sender=Response, dispatch_uid="remove_response_metrics")
+def remove_response_metrics(sender, instance, *args, **kwargs):
+    """
+    Remove the deleted response's metric values from the cached metrics of its model
+    evaluation.
+    """
+    if current_linkage() is not None:
+        return
+
+    prompt = instance.prompt
+    if prompt.exclude:
+        return
+
+    key = (instance.model_id, prompt.evaluation_id)
+    old = getattr(instance, "_metric_snapshot", None)
+    if old is None:
+        aggregator.record_stale(*key)
+    else:
+        aggregator.record(*key, metric_deltas(old, None))
+
+
+def update_response_agreement(response_id):
+    """
+    Recompute reviewer agreement for a single response and save any changed values;
+    saving the response in turn updates the cached model evaluation metrics. Agreement
+    is computed with the options last used by compute_agreement for the model
+    evaluation, or with the configured defaults if it has never been computed.
+    """
+    try:
+        response = Response.objects.select_related("prompt").get(pk=response_id)
+    except Response.DoesNotExist:
+        return
+
+    options = ModelEvaluation.objects.filter(
+        model_id=response.model_id, evaluation_id=response.prompt.evaluation_id
+    ).values_list("agreement_options", flat=True).first()
+
+    if options is None:
+        options = {
+            "thresholds": dict.fromkeys(
+                AGREEMENT_BOOLEAN_FIELDS, settings.PARLANCE_AGREEMENT_THRESHOLD
+            ),
+            "likert_method": settings.PARLANCE_AGREEMENT_LIKERT_METHOD,
+        }
+
+    fields = AGREEMENT_BOOLEAN_FIELDS + AGREEMENT_LIKERT_FIELDS
+    agreement = collect_agreement(
+        Response.objects.filter(pk=response_id),
+        thresholds=options["thresholds"],
+        likert_method=options["likert_method"],
+    )
+
+    changed = []
+    for field, value in agreement.get(response_id, dict.fromkeys(fields)).items():
+        if getattr(response, field) != value:
+            setattr(response, field, value)
+            changed.append(field)
+
+    if changed:
+        response.save(update_fields=changed)
+
+
+@receiver(post_save, sender=ResponseReview, dispatch_uid="review_agreement_updated")
+def review_agreement_updated(sender, instance, raw, *args, **kwargs):
+    if not raw:
+        update_response_agreement(instance.response_id)
+
+
+@receiver(post_delete, sender=ResponseReview, dispatch_uid="review_agreement_removed")
+def review_agreement_removed(sender, instance, origin=None, *args, **kwargs):
+    # If the review is being deleted because its response is being deleted, there is
+    # no agreement to update.
+    model = getattr(origin, "model", type(origin))
+    if model not in (Response, Prompt, Evaluation):
+        update_response_agreement(instance.response_id)
+
+
+##########################################################################
+## Invalidate Cached Sensitive Scanner
+##########################################################################
+
+@receiver(post_save, sender=Sensitive, dispatch_uid="sensitive_saved")
+@receiver(post_delete, sender=Sensitive, dispatch_uid="sensitive_deleted")
+def sensitive_changed(sender, *args, **kwargs):
+    invalidate_sensitive_scanner()
+
+
+##########################################################################
+## Invalidate Cached Statistics
+##########################################################################
+
+@receiver(post_save, sender=LLM, dispatch_uid="llm_statistics_saved")
+@receiver(post_save, sender=Evaluation, dispatch_uid="evaluation_statistics_saved")
+@receiver(post_save, sender=Prompt, dispatch_uid="prompt_statistics_saved")
+@receiver(post_save, sender=Response, dispatch_uid="response_statistics_saved")
+def statistics_saved(sender, created, raw, *args, **kwargs):
+    if created and not raw:
+        statistics_changed()
+
+
+# NOTE: prompts are deliberately not connected to post_delete so that they can still
+# be fast-deleted; they are only deleted in bulk when their evaluation is deleted.
+@receiver(post_delete, sender=LLM, dispatch_uid="llm_statistics_deleted")
+@receiver(post_delete, sender=Evaluation, dispatch_uid="evaluation_statistics_deleted")
+@receiver(post_delete, sender=Response, dispatch_uid="response_statistics_deleted")
+def statistics_deleted(sender, *args, **kwargs):
+    statistics_changed()
+
+
+##########################################################################
+## Invalidate Cached Fragments
+##########################################################################
+
+@receiver(post_save, sender=LLM, dispatch_uid="llm_fragments_saved")
+@receiver(post_delete, sender=LLM, dispatch_uid="llm_fragments_deleted")
+def llm_fragments_changed(sender, instance, *args, **kwargs):
+    invalidate("llm", instance.pk)
+
+
+@receiver(post_save, sender=Evaluation, dispatch_uid="evaluation_fragments_saved")
+@receiver(post_delete, sender=Evaluation, dispatch_uid="evaluation_fragments_deleted")
+def evaluation_fragments_changed(sender, instance, *args, **kwargs):
+    """
+    The metrics of every model of the evaluation are displayed with its name; when
+    the evaluation is deleted its model evaluations send their own signals.
+    """
+    invalidate("evaluation", instance.pk)
+    if kwargs.get("created") is False:
+        models = ModelEvaluation.objects.filter(evaluation_id=instance.pk)
+        invalidate("llm", *models.values_list("model_id", flat=True))
+
+
+@receiver(post_save, sender=ModelEvaluation, dispatch_uid="model_evaluation_fragments_saved")
+@receiver(
+    post_delete, sender=ModelEvaluation, dispatch_uid="model_evaluation_fragments_deleted"
+)
+def model_evaluation_fragments_changed(sender, instance, *args, **kwargs):
+    invalidate("llm", instance.model_id)
+    invalidate("evaluation", instance.evaluation_id)
+
+
+@receiver(post_save, sender=Prompt, dispatch_uid="prompt_fragments_saved")
+def prompt_fragments_saved(sender, instance, created, *args, **kwargs):
+    # The evaluation cards display the number of prompts
+    if created:
+        invalidate("evaluation", instance.evaluation_id)
@@ -0,0 +1,159 @@
+# parley.similarity
+# Similarity scoring of LLM output against the expected output of prompts.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 12:31:45 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: similarity.py [] benjamin@rotational.io $
+
+"""
+Similarity scoring of LLM output against the expected output of prompts.
+
+Documents are represented as sparse vectors (dictionaries mapping terms to weights)
+so that scoring a batch of responses only touches the terms that actually occur in
+each document. Expected outputs are shared by every model's response to a prompt, so
+their vectors are computed once per batch.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import re
+import math
+
+from operator import mul
+from collections import Counter
+from parley.models.enums import SimilarityMetric
+
+
+TOKEN = re.compile(r"\w+")
+
+# The similarity metrics that score_similarity can compute; the embedding metrics
+# require language models that are not available yet.
+SCORED_METRICS = frozenset({
+    SimilarityMetric.COSINE_TFIDF,
+    SimilarityMetric.COSINE_TF,
+    SimilarityMetric.JACCARD,
+})
+
+
+##########################################################################
+## Vectorization
+##########################################################################
+
+
+def tokenize(text: str) -> list:
+    """
+    Splits the text into casefolded word tokens.
+    """
+    return TOKEN.findall(text.casefold())
+
+
+def inverse_document_frequencies(documents) -> dict:
+    """
+    Computes the smoothed inverse document frequency of every term in the documents,
+    where each document is a collection of distinct terms (e.g. the keys of a term
+    frequency Counter): idf = ln((1 + n) / (1 + df)) + 1.
+    """
+    n = 0
+    df = Counter()
+    for terms in documents:
+        n += 1
+        df.update(terms)
+    return {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+
+
+def norm(vector: dict, weights: dict = None) -> float:
+    """
+    Length of the sparse vector, optionally multiplied elementwise by weights.
+    """
+    if weights is None:
+        return math.hypot(*vector.values())
+    return math.hypot(*map(mul, vector.values(), map(weights.__getitem__, vector)))
+
+
+def normalize(vector: dict, weights: dict = None) -> dict:
+    """
+    Scales the sparse vector (optionally multiplied elementwise by weights) to unit
+    length.
+    """
+    length = norm(vector, weights)
+    if length == 0:
+        return {}
+
+    if weights is None:
+        return {term: value / length for term, value in vector.items()}
+    return {term: value * weights[term] / length for term, value in vector.items()}
+
+
+def cosine(a: dict, b: dict, weights: dict = None) -> float:
+    """
+    Cosine similarity of the normalized sparse vector a and the sparse vector b, which
+    is optionally multiplied elementwise by weights. Only the terms the vectors have in
+    common are visited, so b does not need to be normalized beforehand.
+    """
+    length = norm(b, weights)
+    if length == 0:
+        return 0.0
+
+    shared = a.keys() & b.keys()
+    if weights is None:
+        dot = sum(a[term] * b[term] for term in shared)
+    else:
+        dot = sum(a[term] * b[term] * weights[term] for term in shared)
+    return dot / length
+
+
+def jaccard(a: set, b: set) -> float:
+    """
+    Jaccard similarity of two sets of terms; two empty documents are identical.
+    """
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+##########################################################################
+## Batch Scoring
+##########################################################################
+
+
+def score_similarity(pairs, metric: str = SimilarityMetric.COSINE_TFIDF) -> list:
+    """
+    Scores a batch of (expected, output) text pairs with the similarity metric and
+    returns the list of scores in the same order. For TF-IDF the document frequencies
+    are computed over the batch, counting each distinct expected output once. Raises
+    a ValueError if the metric is not one of the SCORED_METRICS.
+    """
+    if metric not in SCORED_METRICS:
+        raise ValueError(f"cannot score similarity with {metric}")
+
+    pairs = list(pairs)
+    expected = {text: tokenize(text) for text in {pair[0] for pair in pairs}}
+    outputs = [tokenize(pair[1]) for pair in pairs]
+
+    if metric == SimilarityMetric.JACCARD:
+        sets = {text: set(tokens) for text, tokens in expected.items()}
+        return [
+            jaccard(sets[text], set(tokens))
+            for (text, _), tokens in zip(pairs, outputs)
+        ]
+
+    weights = True if metric == SimilarityMetric.COSINE_TFIDF else None
+
+    expected = {text: Counter(tokens) for text, tokens in expected.items()}
+    outputs = [Counter(tokens) for tokens in outputs]
+
+    if weights is not None:
+        weights = inverse_document_frequencies(
+            tf.keys() for corpus in (expected.values(), outputs) for tf in corpus
+        )
+
+    vectors = {text: normalize(tf, weights) for text, tf in expected.items()}
+    return [
+        cosine(vectors[text], tf, weights) for (text, _), tf in zip(pairs, outputs)
+    ]
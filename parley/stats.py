@@ -0,0 +1,143 @@
+# parley.stats
+# Cached global statistics for the dashboard.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 17:58:12 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: stats.py [] benjamin@rotational.io $
+
+"""
+Cached global statistics for the dashboard.
+
+Counting the rows of the responses table requires a full scan in Postgres, so the
+totals are cached and only recomputed when objects are created or deleted (or the
+cache expires). Tables that the planner estimates to be larger than the
+PARLANCE_STATS_EXACT_LIMIT are not counted at all; the estimate from pg_class is
+used instead, which is updated by autovacuum and ANALYZE.
+
+The statistics are invalidated by whichever process creates or deletes the objects,
+often the job worker, so they rely on a cache that is shared by all processes.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import weakref
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from parley.cache import stats as cache_stats
+from parley.models import LLM, Evaluation, Prompt, Response
+
+
+STATISTICS_CACHE_KEY = "parlance:statistics"
+
+STATISTICS = {
+    "n_llms": LLM,
+    "n_evaluations": Evaluation,
+    "n_prompts": Prompt,
+    "n_responses": Response,
+}
+
+# Tracks the invalidation scheduled by the current thread's transaction
+_local = threading.local()
+
+
+##########################################################################
+## Statistics
+##########################################################################
+
+
+def global_statistics() -> dict:
+    """
+    Returns the number of LLMs, evaluations, prompts, and responses, either from the
+    cache or by computing them if they are not cached.
+    """
+    stats = cache.get(STATISTICS_CACHE_KEY)
+    cache_stats.record("statistics", hit=stats is not None)
+    if stats is None:
+        stats = collect_statistics(table_estimates(), count_objects)
+        cache.set(STATISTICS_CACHE_KEY, stats, settings.PARLANCE_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def collect_statistics(estimates: dict, count, limit: int = None) -> dict:
+    """
+    Uses the estimated number of rows of each table if it is at least limit rows,
+    otherwise the rows are counted exactly with count(model). Tables that have not
+    been analyzed yet have no estimate and are always counted.
+    """
+    if limit is None:
+        limit = settings.PARLANCE_STATS_EXACT_LIMIT
+
+    stats = {}
+    for name, model in STATISTICS.items():
+        estimate = estimates.get(model._meta.db_table, None)
+        if estimate is None or estimate < limit:
+            stats[name] = count(model)
+        else:
+            stats[name] = estimate
+    return stats
+
+
+def count_objects(model) -> int:
+    """
+    Counts the rows of the model, excluding evaluations that are marked as deleted
+    but whose rows have not been removed by the deletion job yet.
+    """
+    queryset = model.objects.all()
+    if model is Evaluation:
+        queryset = queryset.filter(deleted_on=None)
+    return queryset.count()
+
+
+def table_estimates() -> dict:
+    """
+    Returns the planner's estimate of the number of rows of each statistics table.
+    Postgres reports -1 rows for tables that have never been analyzed.
+    """
+    tables = [model._meta.db_table for model in STATISTICS.values()]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname, reltuples::bigint FROM pg_class "
+            "WHERE oid = ANY(%s::regclass[])",
+            [tables],
+        )
+        return {table: rows for table, rows in cursor.fetchall() if rows >= 0}
+
+
+def invalidate_statistics():
+    cache.delete(STATISTICS_CACHE_KEY)
+
+
+def statistics_changed():
+    """
+    Invalidates the statistics when the current transaction commits; a transaction
+    that creates or deletes many objects only invalidates them once.
+
+    The thread keeps a weak reference to the scheduled commit hook, which the hook
+    clears when it runs. If the hook is discarded because its transaction (or
+    savepoint) is rolled back then the reference is dead, so the next change schedules
+    a new hook.
+    """
+    if not connection.in_atomic_block:
+        invalidate_statistics()
+        return
+
+    scheduled = getattr(_local, "scheduled", None)
+    if scheduled is not None and scheduled() is not None:
+        return
+
+    def hook():
+        _local.scheduled = None
+        invalidate_statistics()
+
+    _local.scheduled = weakref.ref(hook)
+    transaction.on_commit(hook)
@@ -12,19 +12,31 @@
 """
 Long running and analytics tasks for the parley app.
 
-TODO: convert to celery jobs and tasks.
+These functions run synchronously; parley.jobs registers them as background tasks
+that can be enqueued and run by the worker command.
 """
 
 ##########################################################################
 ## Imports
 ##########################################################################
 
-from typing import Iterable
+import warnings
+
+from typing import Iterable, Union
+from django.db import transaction
 from django.utils import timezone
-from collections import defaultdict
+from django.db.models.functions import Now
+from django.db.models import Avg, Case, Count, F, Q, QuerySet, When
+from django.contrib.postgres.aggregates import ArrayAgg
+
+from parley.aggregates import Median
+from parley.similarity import SCORED_METRICS, score_similarity
 
 from parley.models.enums import OutputFormat
-from parley.models import ModelEvaluation, Response, Sensitive
+from parley.models import ModelEvaluation, Response, ResponseReview, Sensitive
+from parley.models import Prompt, ReviewTask
+from parley.models.llm import boolean_agreement, likert_agreement
+from parley.models.sensitive import SensitiveScanner, sensitive_scanner
 
 
 ##########################################################################
@@ -44,7 +56,7 @@ METRIC_FIELDS = [
 
 
 BOOLEAN_METRICS = {
-    "is_similar": ("n_is_similar", "n_not_similar"),
+    "is_similar": ("n_similar", "n_not_similar"),
     "label_correct": ("n_labeled_correctly", "n_labeled_incorrectly"),
     "valid_output_type": ("n_valid_output_type", "n_invalid_output_type"),
     "leaks_sensitive": ("n_leaks_sensitive", "n_no_sensitive_leaks"),
@@ -58,55 +70,238 @@ SCALAR_METRICS = {
 }
 
 
-def cache_metrics(me: ModelEvaluation):
+AGREEMENT_BOOLEAN_FIELDS = ["is_factual", "is_readable", "is_correct_style"]
+AGREEMENT_LIKERT_FIELDS = ["helpfulness"]
+
+
+def collect_agreement(
+    responses: QuerySet, thresholds: dict = None, likert_method: str = "mean"
+) -> dict:
+    """
+    Computes reviewer agreement for the responses in the queryset. Rather than running
+    COUNT queries per response, the true and false votes and likert values of all
+    reviews are collected with a single grouped aggregate query and agreement is
+    computed in memory with the same threshold semantics as Response.agree_boolean and
+    Response.agree_likert. Thresholds are specified per boolean field and default to
+    0.5. Returns a dictionary mapping the id of every reviewed response to its
+    agreement values; responses without reviews are omitted.
     """
-    Runs through all current responses and reviewer annotations for a model evaluation
-    and caches the metrics on the model for display purposes.
+    thresholds = {
+        field: (thresholds or {}).get(field, 0.5)
+        for field in AGREEMENT_BOOLEAN_FIELDS
+    }
+
+    if any(threshold < 0 for threshold in thresholds.values()):
+        raise ValueError("Threshold must be greater than or equal to 0")
+
+    if likert_method not in ("mean", "median"):
+        raise ValueError("Method must be either mean or median")
+
+    # Aggregate the votes of all reviews grouped by response
+    aggregates = {}
+    for field in AGREEMENT_BOOLEAN_FIELDS:
+        aggregates[f"{field}_true"] = Count("response", filter=Q(**{field: True}))
+        aggregates[f"{field}_false"] = Count("response", filter=Q(**{field: False}))
+
+    for field in AGREEMENT_LIKERT_FIELDS:
+        aggregates[f"{field}_values"] = ArrayAgg(
+            field, filter=Q(**{f"{field}__isnull": False}), default=[]
+        )
+
+    votes = (
+        ResponseReview.objects.filter(response__in=responses)
+        .values("response_id")
+        .annotate(**aggregates)
+        .order_by()
+    )
+
+    agreement = {}
+    for row in votes:
+        values = {}
+        for field in AGREEMENT_BOOLEAN_FIELDS:
+            values[field] = boolean_agreement(
+                row[f"{field}_true"], row[f"{field}_false"], thresholds[field]
+            )
+
+        for field in AGREEMENT_LIKERT_FIELDS:
+            values[field] = likert_agreement(row[f"{field}_values"], likert_method)
+
+        agreement[row["response_id"]] = values
+    return agreement
+
+
+def compute_agreement(
+    me: ModelEvaluation,
+    thresholds: dict = None,
+    likert_method: str = "mean",
+    batch_size: int = 1000,
+):
     """
+    Computes reviewer agreement for every response of a model evaluation using
+    collect_agreement and writes the results back with one bulk update. Responses
+    without reviews are reset to None. The thresholds and likert method are stored on
+    the model evaluation so that agreement is recomputed with the same options when a
+    single review changes. Returns the number of responses updated.
+    """
+    fields = AGREEMENT_BOOLEAN_FIELDS + AGREEMENT_LIKERT_FIELDS
+    agreement = collect_agreement(me.responses(), thresholds, likert_method)
 
-    me.n_prompts = me.prompts().count()
-    me.n_responses = me.responses().count()
+    responses = []
+    unreviewed = dict.fromkeys(fields)
+    for response in me.responses().only("id").iterator(chunk_size=batch_size):
+        for field, value in agreement.get(response.id, unreviewed).items():
+            setattr(response, field, value)
+        responses.append(response)
 
-    # TODO: Handle annotator agreement for reviewers
+    Response.objects.bulk_update(responses, fields, batch_size=batch_size)
+
+    me.agreement_options = {
+        "thresholds": thresholds or {},
+        "likert_method": likert_method,
+    }
+    ModelEvaluation.objects.filter(pk=me.pk).update(
+        agreement_options=me.agreement_options
+    )
+    return len(responses)
 
-    # Count all of the metrics across all responses
-    counts = defaultdict(lambda: defaultdict(int))
-    values = defaultdict(lambda: defaultdict(list))
-    for response in me.responses():
-        for field in METRIC_FIELDS:
-            metric = getattr(response, field)
-            if metric is not None:
-                counts[field][metric] += 1
-                if field in SCALAR_METRICS:
-                    values[field][metric].append(response.helpfulness)
-
-    # Assign the counts to their metrics
-    for field, (pos, neg) in BOOLEAN_METRICS.items():
-        if field not in counts:
-            setattr(me, pos, None)
-            setattr(me, neg, None)
-            continue
 
-        count = counts[field]
-        setattr(me, pos, count.get(True, 0))
-        setattr(me, neg, count.get(False, 0))
+def compute_metrics(me: ModelEvaluation) -> dict:
+    """
+    Computes the metrics of a model evaluation in the database using conditional
+    aggregates over its responses so that the responses are summarized in a single
+    query rather than materialized in Python. Returns a dictionary of the metric values
+    keyed by the ModelEvaluation field they are cached on. Boolean metrics without any
+    values and scalar metrics with no values are None.
+    """
+    aggregates = {"n_responses": Count("id")}
+    for field, (pos, neg) in BOOLEAN_METRICS.items():
+        aggregates[pos] = Count("id", filter=Q(**{field: True}))
+        aggregates[neg] = Count("id", filter=Q(**{field: False}))
 
-    # Assign the scalar metrics
     for field, (mean, median) in SCALAR_METRICS.items():
-        if field not in values:
-            setattr(me, mean, None)
-            setattr(me, median, None)
-            continue
+        aggregates[mean] = Avg(field)
+        aggregates[median] = Median(field)
+
+    metrics = me.responses().aggregate(**aggregates)
+    for field, (pos, neg) in BOOLEAN_METRICS.items():
+        if metrics[pos] == 0 and metrics[neg] == 0:
+            metrics[pos] = None
+            metrics[neg] = None
+
+    metrics["n_prompts"] = me.prompts().count()
+    return metrics
 
-        vals = [item for sublist in values[field].values() for item in sublist]
-        setattr(me, mean, sum(vals) / len(vals) if len(vals) > 0 else None)
-        setattr(me, median, sorted(vals)[len(vals) // 2] if len(vals) > 0 else None)
+
+def cache_metrics(me: ModelEvaluation):
+    """
+    Computes the metrics across all current responses and reviewer annotations for a
+    model evaluation and caches the metrics on the model for display purposes.
+    """
+
+    # TODO: Handle annotator agreement for reviewers
+    for field, value in compute_metrics(me).items():
+        setattr(me, field, value)
 
     me.metrics_cached = True
     me.metrics_last_cached_on = timezone.localtime()
     me.save()
 
 
+def reconcile_metrics(me: ModelEvaluation, fix: bool = False, tol: float = 1e-6):
+    """
+    Checks the cached metrics of a model evaluation, which are maintained incrementally
+    as responses and reviews change, against a full recomputation. Returns a dictionary
+    mapping each mismatched field to its (cached, expected) values. If fix is True then
+    the mismatched fields are replaced with the recomputed values.
+    """
+    mismatches = {}
+    for field, expected in compute_metrics(me).items():
+        cached = getattr(me, field)
+        if cached is None or expected is None:
+            if cached is not expected:
+                mismatches[field] = (cached, expected)
+        elif abs(cached - expected) > tol:
+            mismatches[field] = (cached, expected)
+
+    if fix and mismatches:
+        for field, (_, expected) in mismatches.items():
+            setattr(me, field, expected)
+
+        me.metrics_cached = True
+        me.metrics_last_cached_on = timezone.localtime()
+        me.save()
+
+    return mismatches
+
+
+def count_review_task_prompts(evaluation_id):
+    """
+    Updates the number of prompts of the review tasks of an evaluation after its
+    prompts have been added or excluded. Tasks that have now reviewed every prompt are
+    marked as completed and completed tasks with new prompts to review are reopened in
+    the same update.
+    """
+    tasks = ReviewTask.objects.filter(model_evaluation__evaluation_id=evaluation_id)
+    if tasks.exists():
+        n_prompts = Prompt.objects.filter(
+            evaluation_id=evaluation_id, exclude=False
+        ).count()
+
+        tasks.update(
+            n_prompts=n_prompts,
+            completed_on=Case(
+                When(
+                    completed_on=None,
+                    n_reviewed__gt=0,
+                    n_reviewed__gte=n_prompts,
+                    then=Now(),
+                ),
+                When(n_reviewed__lt=n_prompts, then=None),
+                default=F("completed_on"),
+            ),
+        )
+
+
+def review_task_completed(n_prompts: int, n_reviewed: int) -> bool:
+    """
+    A review task is completed once it has at least as many reviews as it has prompts.
+    """
+    return n_reviewed > 0 and n_reviewed >= n_prompts
+
+
+def reconcile_review_task(task: ReviewTask, fix: bool = False):
+    """
+    Checks the progress counters and completion of a review task, which are maintained
+    as reviews are created and deleted, against a count of its prompts and reviews.
+    Returns a dictionary mapping each mismatched field to its (cached, expected)
+    values. If fix is True then the mismatched fields are replaced with the counted
+    values.
+    """
+    expected = {
+        "n_prompts": task.prompts().count(),
+        "n_reviewed": task.response_reviews.count(),
+    }
+
+    mismatches = {
+        field: (getattr(task, field), value)
+        for field, value in expected.items()
+        if getattr(task, field) != value
+    }
+
+    completed = review_task_completed(expected["n_prompts"], expected["n_reviewed"])
+    if completed != task.is_completed:
+        mismatches["completed_on"] = (
+            task.completed_on, timezone.now() if completed else None
+        )
+
+    if fix and mismatches:
+        ReviewTask.objects.filter(pk=task.pk).update(
+            **{field: value for field, (_, value) in mismatches.items()}
+        )
+
+    return mismatches
+
+
 def extract_cyberjudge_label(response: Response):
     if response.valid_output_type:
         data = response.load_json()
@@ -195,19 +390,129 @@ def evaluate_valid_output_type(response: Response):
     response.save()
 
 
-def evaluate_leaks_sensitive(response: Response, sensitive: Iterable[Sensitive]):
+def evaluate_similarity(me: ModelEvaluation, batch_size: int = 1000) -> int:
     """
-    Loop over all sensitive terms specified and check if they are contained in the
-    response output. If so, mark the response as leaking sensitive data.
+    Scores the output of every response of the model evaluation against the expected
+    output of its prompt in a single batch using the similarity metric of the
+    evaluation, then marks responses as similar if their score meets the evaluation's
+    similarity threshold. Responses to prompts without an expected output are skipped.
+    Results are written with bulk updates; returns the number of responses scored.
+    If the similarity metric of the evaluation cannot be scored yet, a warning is
+    issued and no responses are scored.
     """
-    for term in sensitive:
-        if term.search(response.output):
-            response.leaks_sensitive = True
-            break
-    else:
-        # Break means we found sensitive output, if we don't break, this else block
-        # is triggered, which means we did not find any sensitive output.
-        response.leaks_sensitive = False
+    evaluation = me.evaluation
+    if evaluation.similarity_metric not in SCORED_METRICS:
+        warnings.warn(
+            f"skipping similarity of {me}: cannot score "
+            f"{evaluation.get_similarity_metric_display()} similarity",
+            RuntimeWarning,
+        )
+        return 0
+
+    rows = list(
+        me.responses()
+        .filter(prompt__expected_output__isnull=False)
+        .values_list("id", "prompt__expected_output", "output")
+    )
+
+    scores = score_similarity(
+        ((expected, output) for _, expected, output in rows),
+        evaluation.similarity_metric,
+    )
+
+    responses = [
+        Response(
+            id=rid,
+            output_similarity=score,
+            is_similar=score >= evaluation.similarity_threshold,
+        )
+        for (rid, _, _), score in zip(rows, scores)
+    ]
+
+    Response.objects.bulk_update(
+        responses, ["output_similarity", "is_similar"], batch_size=batch_size
+    )
+    return len(responses)
+
+
+def evaluate_leaks_sensitive(
+    response: Response, sensitive: Union[SensitiveScanner, Iterable[Sensitive]]
+):
+    """
+    Scan the response output for any of the sensitive terms and if found, mark the
+    response as leaking sensitive data. The scanner should be built once per run, e.g.
+    with sensitive_scanner(); an iterable of terms is compiled into a scanner.
+    """
+    if not isinstance(sensitive, SensitiveScanner):
+        sensitive = SensitiveScanner(sensitive)
+
+    response.leaks_sensitive = sensitive.search(response.output)
 
     # Must save the response because column is set either way.
     response.save()
+
+
+##########################################################################
+## Analysis
+##########################################################################
+
+PRECHECKS = ("output_type", "sensitive", "cyberjudge", "labels")
+
+
+def evaluate_cyberjudge(response: Response):
+    extract_cyberjudge_label(response)
+    evaluate_cyberjudge_label_correct(response)
+
+
+def run_prechecks(
+    me: ModelEvaluation,
+    output_type: bool = False,
+    sensitive: bool = False,
+    cyberjudge: bool = False,
+    labels: bool = False,
+):
+    """
+    Runs the specified per-response evaluations over every response of the model
+    evaluation in a single pass, in application order.
+    """
+    checks = []
+    if output_type:
+        checks.append(evaluate_valid_output_type)
+
+    if sensitive:
+        scanner = sensitive_scanner()
+        checks.append(lambda response: evaluate_leaks_sensitive(response, scanner))
+
+    if cyberjudge:
+        checks.append(evaluate_cyberjudge)
+
+    if labels:
+        checks.append(evaluate_label_correct)
+
+    # In a transaction the changes to the cached metrics of every saved response are
+    # applied with a single update when it commits rather than one per response.
+    if len(checks) > 0:
+        with transaction.atomic():
+            for response in me.responses().select_related("prompt"):
+                for check in checks:
+                    check(response)
+
+
+def analyze(
+    me: ModelEvaluation,
+    similarity: bool = False,
+    thresholds: dict = None,
+    likert_method: str = "mean",
+    **prechecks,
+):
+    """
+    Runs the complete analysis of a model evaluation: the specified prechecks (see
+    run_prechecks), similarity scoring, reviewer agreement, and metrics caching.
+    """
+    run_prechecks(me, **prechecks)
+
+    if similarity:
+        evaluate_similarity(me)
+
+    compute_agreement(me, thresholds=thresholds, likert_method=likert_method)
+    cache_metrics(me)
@@ -16,6 +16,7 @@ Template tag helpers for parlance apps
 
 from parlance import get_version
 from parley.models import ReviewTask
+from parley.cache import cached_fragment
 
 from django import template
 from django.contrib.messages import constants as messages
@@ -49,3 +50,43 @@ def get_review_task(user, evaluation):
         return ReviewTask.objects.get(user=user, model_evaluation=evaluation)
     except ReviewTask.DoesNotExist:
         return None
+
+
+class CacheFragmentNode(template.Node):
+
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return cached_fragment(name, vary_on, lambda: self.nodelist.render(context))
+
+
+@register.tag("cachefragment")
+def cachefragment(parser, token):
+    """
+    Caches the enclosed fragment by name and the values it varies on; the hits and
+    misses of the fragment are recorded by name. The values should include the cache
+    version of the objects the fragment is rendered from (see parley.cache), e.g.:
+
+        {% cachefragment "evaluation-card" evaluation.pk evaluation.cache_version %}
+            ...
+        {% endcachefragment %}
+    """
+    nodelist = parser.parse(("endcachefragment",))
+    parser.delete_first_token()
+
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least a fragment name"
+        )
+
+    return CacheFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -17,14 +17,47 @@ Parley test cases.
 ## Imports
 ##########################################################################
 
+import json
+import uuid
+import zlib
 import pytest
+import threading
+import tracemalloc
 
+from django.db.models import Q
+from django.template import Template, TemplateSyntaxError
+from django.core.files.base import ContentFile
 from django.core.exceptions import ValidationError
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 from parley.validators import validate_semver
-from parley.tasks import cyberjudge_almost
-from parley.models import LLM, Sensitive
+from parley.exports import arrow_schema, gzip_stream, record_batch, write_columnar
+from parley.exports import analytics_header, analytics_pivot, analytics_row
+from parley.charts import compute_evaluation_chart
+from parley.pagination import decode_cursor, encode_cursor
+from parley.stats import collect_statistics
+from parley.aggregates import Median
+from parley.checks import LOCMEM_BACKEND, check_shared_cache
+from parley.cache import CacheStatistics, fragment_key, hit_ratio
+from parley.deletion import deletion_steps
+from parley.navigation import KEY_FIELDS, follows, precedes
+from parley.linkage import BulkLinkage, LINKED, UNLINKED, bulk_linkage, current_linkage
+from parley.forms import BaseUploader, IngestBatch, UpsertBatch, IdentityMap
+from parley.forms import EvaluationUploader, UploaderCounts
+from parley.forms import iter_decompressed, iter_jsonlines
+from parley.exceptions import ParlanceUploadError, ParlanceJobError
+from parley.uploads import delete_stored_files
+from parley.jobs import REGISTRY, Task, heartbeat, task
+from parley.management.commands.analyze import Command as AnalyzeCommand
+from parley.management.commands.analyze import ANALYSIS_OPTIONS
+from parley.tasks import cyberjudge_almost, evaluate_similarity, review_task_completed
+from parley.metrics import metric_deltas
+from parley.models.enums import SimilarityMetric
+from parley.similarity import SCORED_METRICS, score_similarity
+from parley.models import LLM, Evaluation, ModelEvaluation, Prompt, Response, Sensitive
+from parley.models import Job, ResponseReview, ReviewTask, UploadFile
+from parley.models.sensitive import SensitiveScanner
+from parley.models.llm import boolean_agreement, likert_agreement
 
 
 @pytest.mark.parametrize("value", [
@@ -109,6 +142,42 @@ def test_sensitive_search_no_leak(text):
     assert sensitive.search(text) is False
 
 
+SCANNER_TERMS = [
+    Sensitive(term="Rotational"),
+    Sensitive(term="Rotational Labs", case_sensitive=True),
+    Sensitive(term="tion"),
+    Sensitive(term="Ensign", case_sensitive=True),
+    Sensitive(term=r"\b\d{3}-\d{2}-\d{4}\b", is_regex=True),
+    Sensitive(term=r"secret", is_regex=True),
+]
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("nothing to see here", set()),
+        ("ROTATIONAL", {"Rotational", "tion"}),
+        ("Rotational Labs", {"Rotational", "Rotational Labs", "tion"}),
+        ("rotational labs", {"Rotational", "tion"}),
+        ("ensign and Ensign", {"Ensign"}),
+        ("my ssn is 123-45-6789", {r"\b\d{3}-\d{2}-\d{4}\b"}),
+        ("a SECRET station", {"secret", "tion"}),
+    ],
+)
+def test_sensitive_scanner(text, expected):
+    scanner = SensitiveScanner(SCANNER_TERMS)
+    assert {item.term for item in scanner.matches(text)} == expected
+    assert scanner.search(text) is bool(expected)
+    assert scanner.search(text) is any(item.search(text) for item in SCANNER_TERMS)
+
+
+def test_sensitive_scanner_empty():
+    scanner = SensitiveScanner([])
+    assert len(scanner) == 0
+    assert scanner.search("Rotational") is False
+    assert scanner.matches("Rotational") == []
+
+
 @pytest.mark.parametrize(
     "expected,actual",
     [
@@ -153,3 +222,668 @@ def test_cyberjudge_almost_true(expected, actual):
 )
 def test_cyberjudge_almost_false(expected, actual):
     assert cyberjudge_almost(expected, actual) is False
+
+
+class FakeManager(object):
+
+    def __init__(self, log):
+        self.log = log
+
+    def bulk_create(self, objs, batch_size=None):
+        self.log.append(list(objs))
+
+
+def test_ingest_batch_flush_order():
+    log = []
+
+    class Parent(object):
+        objects = FakeManager(log)
+
+    class Child(object):
+        objects = FakeManager(log)
+
+    batch = IngestBatch(batch_size=3)
+    objs = [Parent(), Child(), Child(), Parent()]
+    for obj in objs:
+        batch.add(obj)
+
+    # The first flush happens when three objects are buffered, parents first.
+    assert log == [[objs[0]], [objs[1], objs[2]]]
+    assert batch.n_buffered == 1
+
+    batch.flush()
+    assert log[-1] == [objs[3]]
+    assert batch.n_buffered == 0
+
+
+class StreamedUpload(object):
+    """
+    Mimics the chunks interface of a Django UploadedFile without holding the file.
+    """
+
+    def __init__(self, name, n_rows, chunk_size=64 * 2**10, compress=False):
+        self.name = name
+        self.n_rows = n_rows
+        self.chunk_size = chunk_size
+        self.compress = compress
+
+    def lines(self):
+        for i in range(self.n_rows):
+            row = {"type": "prompt", "prompt": f"Prompt number {i}", "order": i}
+            yield json.dumps(row).encode("utf-8") + b"\n"
+
+    def chunks(self):
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if self.compress else None
+        buf = b""
+        for line in self.lines():
+            buf += compressor.compress(line) if compressor else line
+            if len(buf) >= self.chunk_size:
+                yield buf
+                buf = b""
+        if compressor:
+            buf += compressor.flush()
+        if buf:
+            yield buf
+
+
+class FixedUpload(object):
+
+    def __init__(self, name, content, chunk_size=7):
+        self.name = name
+        self.content = content
+        self.chunk_size = chunk_size
+
+    def chunks(self):
+        for i in range(0, len(self.content), self.chunk_size):
+            yield self.content[i:i+self.chunk_size]
+
+
+def test_evaluation_uploader_batches(monkeypatch):
+    log = []
+    monkeypatch.setattr(Prompt, "objects", FakeManager(log))
+    monkeypatch.setattr(Response, "objects", FakeManager(log))
+
+    lines = [
+        {"prompt": "first", "response": "a", "model": "alpha"},
+        {"prompt": "first", "response": "b", "model": "beta"},
+        {"prompt": "second", "response": "c", "model": "alpha"},
+        {"system": "sys", "prompt": "second", "response": "d", "model": "alpha"},
+    ]
+    content = "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+
+    uploader = EvaluationUploader()
+    uploader.cleaned_data = {"prompts_file": FixedUpload("prompts.jsonl", content)}
+    llms = {name: LLM(name=name) for name in ("alpha", "beta")}
+
+    batch = IngestBatch(batch_size=3)
+    counts = UploaderCounts()
+    uploader.ingest_prompts(Evaluation(name="test"), llms, batch, counts)
+    batch.flush()
+
+    # Lines that repeat a prompt only add a response; a prompt with a different
+    # system message is a new prompt. Every flush writes prompts before responses,
+    # and the last response references a prompt written by an earlier flush.
+    assert [[type(obj).__name__ for obj in objs] for objs in log] == [
+        ["Prompt"], ["Response", "Response"],
+        ["Prompt", "Prompt"], ["Response"],
+        ["Response"],
+    ]
+    prompts = [obj for objs in log for obj in objs if isinstance(obj, Prompt)]
+    assert [prompt.order for prompt in prompts] == [1, 2, 3]
+    assert [obj.prompt_id for objs in log for obj in objs if isinstance(obj, Response)] == [
+        prompts[0].id, prompts[0].id, prompts[1].id, prompts[2].id
+    ]
+    assert counts.counts["prompts.jsonl"]["Prompt"]["created"] == 3
+    assert counts.counts["prompts.jsonl"]["Response"]["created"] == 4
+
+    # Only one response per prompt per model is allowed, even across batches
+    duplicate = json.dumps(lines[0]).encode("utf-8") + b"\n"
+    uploader.cleaned_data["prompts_file"] = FixedUpload("prompts.jsonl", content + duplicate)
+    with pytest.raises(ParlanceUploadError, match="duplicate prompt for model 'alpha' at line 5"):
+        uploader.ingest_prompts(Evaluation(name="test"), llms, IngestBatch(batch_size=3), counts)
+
+
+@pytest.mark.parametrize("model,row,expected", [
+    (LLM, {"id": "x", "name": "a", "version": "1.0.0"}, ("id",)),
+    (LLM, {"name": "a", "version": "1.0.0"}, ("name", "version")),
+    (LLM, {"name": "a"}, None),
+    (Response, {"model": "x", "prompt": "y", "output": ""}, ("model", "prompt")),
+    (Sensitive, {"term": "secret"}, ("term",)),
+    (Prompt, {"evaluation": "x", "prompt": "hello"}, None),
+])
+def test_upsert_natural_key(model, row, expected):
+    assert UpsertBatch.natural_key(model, row) == expected
+
+
+def test_upsert_key_filter():
+    model_id, prompt_ids = uuid.uuid4(), [uuid.uuid4(), uuid.uuid4()]
+    values = [(model_id, prompt_id) for prompt_id in prompt_ids]
+
+    # Composite keys are matched on every field, not just the first one
+    sql = str(
+        Response.objects.filter(
+            UpsertBatch.key_filter(["model_id", "prompt_id"], values)
+        ).query
+    )
+    assert sql.count('"model_id" =') == 2
+    assert sql.count('"prompt_id" =') == 2
+
+
+def test_identity_map():
+    pk = "5b1f7a0e-6a0e-4d4e-9f3c-2f4c1d2b3a4e"
+    references = IdentityMap()
+    assert references.resolve(Prompt, pk) is None
+
+    # Prefetching known references does not query the database
+    references.add(Prompt, pk)
+    references.prefetch([(Prompt, pk), (Prompt, "not a uuid")])
+
+    obj = references.resolve(Prompt, pk.upper())
+    assert isinstance(obj, Prompt)
+    assert str(obj.pk) == pk
+
+    assert references.resolve(Prompt, "not a uuid") is None
+    assert references.resolve(Prompt, None) is None
+    assert references.resolve(LLM, pk) is None
+
+
+def test_read_jsonlines_progress():
+    seen = []
+
+    def progress(f, rows):
+        for lineno, row in rows:
+            seen.append((f.name, lineno))
+            yield lineno, row
+
+    uploader = BaseUploader()
+    uploader.progress = progress
+
+    upload = FixedUpload("data.jsonl", b'{"a": 1}\n{"a": 2}\n')
+    rows = list(uploader.read_jsonlines(upload))
+    assert rows == [(1, {"a": 1}), (2, {"a": 2})]
+    assert seen == [("data.jsonl", 1), ("data.jsonl", 2)]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_iter_jsonlines(compress):
+    upload = StreamedUpload("prompts.jsonl", 2500, chunk_size=512, compress=compress)
+    rows = list(iter_jsonlines(upload, max_line_size=2**20))
+    assert len(rows) == 2500
+    assert rows[0] == (1, {"type": "prompt", "prompt": "Prompt number 0", "order": 0})
+    assert rows[-1][0] == 2500
+    assert rows[-1][1]["order"] == 2499
+
+
+def test_iter_jsonlines_no_trailing_newline():
+    upload = FixedUpload("data.jsonl", b'{"a": 1}\n{"a": 2}\r\n{"a": 3}')
+    assert list(iter_jsonlines(upload)) == [(1, {"a": 1}), (2, {"a": 2}), (3, {"a": 3})]
+
+
+def test_iter_jsonlines_error_offset():
+    upload = FixedUpload("data.jsonl", b'{"a": 1}\n{"a": 2}\n{"a": \n')
+    with pytest.raises(ParlanceUploadError, match=r"line 3 \(byte offset 18\) of data.jsonl"):
+        list(iter_jsonlines(upload))
+
+
+def test_iter_jsonlines_max_line_size():
+    upload = FixedUpload("data.jsonl", b'{"a": "' + b"x" * 100 + b'"}\n', chunk_size=16)
+    with pytest.raises(ParlanceUploadError, match="exceeds the maximum line size"):
+        list(iter_jsonlines(upload, max_line_size=64))
+
+
+def test_delete_stored_files(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    upload_file = UploadFile(name="data.jsonl")
+    upload_file.file.save("data.jsonl", ContentFile(b'{"a": 1}\n'), save=False)
+
+    path = tmp_path / upload_file.file.name
+    assert path.exists()
+
+    # Files that were already deleted are skipped
+    delete_stored_files([upload_file, UploadFile(name="missing.jsonl")])
+    assert not path.exists()
+    assert not upload_file.file
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_iter_jsonlines_flat_memory(compress):
+    """
+    Peak memory while streaming must not grow with the size of the upload.
+    """
+    sizes, peaks = [], []
+    for n_rows in (4000, 32000):
+        upload = StreamedUpload("prompts.jsonl", n_rows, 16 * 2**10, compress)
+        sizes.append(sum(len(line) for line in upload.lines()))
+
+        tracemalloc.start()
+        for _ in iter_jsonlines(upload, max_line_size=2**20):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+
+    # An 8x larger file must use a fraction of its size and not 8x the memory
+    assert peaks[1] < sizes[1] / 2
+    assert peaks[1] < peaks[0] * 4
+
+
+@pytest.mark.parametrize(
+    "true_count,false_count,threshold,expected",
+    [
+        (0, 0, 0.5, None),
+        (1, 1, 0.5, True),
+        (1, 2, 0.5, False),
+        (2, 1, 0.75, False),
+        (3, 1, 0.75, True),
+        (0, 0, 2, None),
+        (2, 5, 2, True),
+        (1, 2, 2, False),
+        (1, 1, 2, None),
+    ],
+)
+def test_boolean_agreement(true_count, false_count, threshold, expected):
+    assert boolean_agreement(true_count, false_count, threshold) is expected
+
+
+def test_boolean_agreement_negative_threshold():
+    with pytest.raises(ValueError):
+        boolean_agreement(1, 1, -0.5)
+
+
+@pytest.mark.parametrize(
+    "values,method,expected",
+    [
+        ([], "mean", None),
+        ([None, None], "median", None),
+        ([1, 2, 3, 5], "mean", 2.75),
+        ([4, None, 2], "mean", 3.0),
+        ([5, 1, 3], "median", 3),
+        ([4, 1, 3, 2], "median", 3),
+    ],
+)
+def test_likert_agreement(values, method, expected):
+    assert likert_agreement(values, method) == expected
+
+
+@pytest.mark.parametrize(
+    "old,new,expected",
+    [
+        (None, {}, {"n_responses": 1}),
+        ({}, None, {"n_responses": -1}),
+        ({}, {}, {}),
+        (None, {"is_similar": True}, {"n_responses": 1, "n_similar": 1}),
+        ({"is_factual": False}, None, {"n_responses": -1, "n_not_factual": -1}),
+        ({"is_readable": True}, {"is_readable": False}, {
+            "n_readable": -1, "n_not_readable": 1,
+        }),
+        ({"leaks_sensitive": None}, {"leaks_sensitive": True}, {
+            "n_leaks_sensitive": 1,
+        }),
+        ({"label_correct": True}, {"label_correct": True}, {}),
+        ({"helpfulness": 0.5}, {"helpfulness": 0.75}, {"helpfulness": 1}),
+        ({"helpfulness": 0.5}, {"helpfulness": 0.5}, {}),
+    ],
+)
+def test_metric_deltas(old, new, expected):
+    assert metric_deltas(old, new) == expected
+
+
+@pytest.mark.parametrize(
+    "metric",
+    [SimilarityMetric.COSINE_TFIDF, SimilarityMetric.COSINE_TF, SimilarityMetric.JACCARD],
+)
+def test_score_similarity(metric):
+    pairs = [
+        ("the quick brown fox", "The quick brown fox"),
+        ("the quick brown fox", "a lazy dog"),
+        ("the quick brown fox", "the quick red fox"),
+        ("", ""),
+    ]
+
+    scores = score_similarity(pairs, metric)
+    assert len(scores) == len(pairs)
+    assert scores[0] == pytest.approx(1.0)
+    assert scores[1] == pytest.approx(0.0)
+    assert 0.0 < scores[2] < 1.0
+
+
+@pytest.mark.parametrize(
+    "metric,expected",
+    [
+        (SimilarityMetric.COSINE_TF, 0.75),
+        (SimilarityMetric.JACCARD, 0.6),
+    ],
+)
+def test_score_similarity_values(metric, expected):
+    scores = score_similarity([("a b c d", "a b c e")], metric)
+    assert scores[0] == pytest.approx(expected)
+
+
+def test_score_similarity_unscored_metric():
+    assert SimilarityMetric.BERT not in SCORED_METRICS
+    with pytest.raises(ValueError):
+        score_similarity([("a", "b")], SimilarityMetric.BERT)
+
+
+def test_evaluate_similarity_unscored_metric():
+    evaluation = Evaluation(similarity_metric=SimilarityMetric.GLOVE)
+    me = ModelEvaluation(model=LLM(name="test"), evaluation=evaluation)
+    with pytest.warns(RuntimeWarning, match="cannot score"):
+        assert evaluate_similarity(me) == 0
+
+
+def test_task_registry():
+    assert {"analyze", "cache_metrics", "process_upload"} <= set(REGISTRY)
+    assert REGISTRY["cache_metrics"].dedupe is True
+    assert REGISTRY["process_upload"].bind is True
+    assert REGISTRY["delete_evaluation"].atomic is False
+
+    with pytest.raises(ParlanceJobError):
+        task("cache_metrics")(lambda model_evaluation: None)
+
+
+def test_heartbeat_stops():
+    # The heartbeat thread exits with the block, before its first beat is due
+    job = Job(id=uuid.uuid4())
+    with heartbeat(job, interval=3600):
+        assert any(t.name == f"heartbeat-{job.pk}" for t in threading.enumerate())
+    assert not any(t.name == f"heartbeat-{job.pk}" for t in threading.enumerate())
+
+
+@pytest.mark.parametrize("bind", [False, True])
+def test_task_call(bind):
+    class FakeJob(object):
+        args = {"a": 1, "b": 2}
+
+    def fn(*args, **kwargs):
+        return args, kwargs
+
+    job = FakeJob()
+    args, kwargs = Task(fn, bind=bind)(job)
+    assert args == ((job,) if bind else ())
+    assert kwargs == {"a": 1, "b": 2}
+
+
+def test_gzip_stream_resume():
+    lines = [f'{{"id": {i}}}\n'.encode("utf-8") for i in range(1000)]
+
+    # A resumed download is a second gzip member appended to the partial download
+    data = b"".join(gzip_stream(lines[:400])) + b"".join(gzip_stream(lines[400:]))
+    assert b"".join(iter_decompressed([data])) == b"".join(lines)
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_write_columnar(fmt):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    schema = arrow_schema("prompts")
+    created = datetime(2026, 10, 18, tzinfo=timezone.utc)
+    rows = [
+        (uuid.uuid4(), f"prompt {i}", i, i % 2 == 0, None, "text", "text", None, None, created)
+        for i in range(5)
+    ]
+
+    # Each record batch is drained from the stream sink as soon as it is written
+    batches = [record_batch(rows[:3], [0], schema), record_batch(rows[3:], [0], schema)]
+    data = b"".join(write_columnar(batches, schema, fmt))
+
+    if fmt == "parquet":
+        table = pq.read_table(pa.BufferReader(data))
+    else:
+        table = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+
+    assert table.schema == schema
+    assert table.num_rows == 5
+    assert table.column("id").to_pylist() == [str(row[0]) for row in rows]
+    assert table.column("exclude").to_pylist() == [True, False, True, False, True]
+    assert table.column("system").to_pylist() == [None] * 5
+    assert table.column("created").to_pylist() == [created] * 5
+
+
+def test_analytics_rows():
+    models = [(uuid.uuid4(), "alpha", "1.0.0"), (uuid.uuid4(), "beta", "2.1.0")]
+    assert analytics_header(models) == ["id", "prompt", "expected", "alpha-1.0.0", "beta-2.1.0"]
+
+    # The pivoted columns are in the order of the models
+    pivot = analytics_pivot(models)
+    assert list(pivot) == ["model_0", "model_1"]
+    assert pivot["model_1"].filter == Q(responses__model_id=models[1][0])
+
+    evaluation = Evaluation(name="Safety")
+    row = {
+        "id": uuid.uuid4(),
+        "title": None,
+        "order": 3,
+        "expected_label": "low",
+        "model_0": "high",
+        "model_1": None,
+    }
+    assert analytics_row(row, pivot, evaluation) == [
+        row["id"], "Safety Prompt #3", "low", "high", None
+    ]
+
+    row.update(title="Phishing", model_0=None, model_1="low")
+    assert analytics_row(row, pivot, evaluation) == [row["id"], "Phishing", "low", None, "low"]
+
+
+def test_evaluation_chart_no_models():
+    assert compute_evaluation_chart([]) == {"labels": [], "datasets": []}
+
+
+def test_evaluation_chart():
+    first = ModelEvaluation(model=LLM(name="first"), n_similar=1, n_not_similar=3)
+    second = ModelEvaluation(
+        model=LLM(name="second"), n_factual=2, n_not_factual=2
+    )
+
+    # Labels include metrics processed by any model, not just the first
+    chart = compute_evaluation_chart([first, second])
+    assert chart["labels"] == ["Similarity", "Is Factual"]
+    assert [ds["label"] for ds in chart["datasets"]] == ["first", "second"]
+    assert chart["datasets"][0]["data"] == [1.0, 0]
+    assert chart["datasets"][1]["data"] == [0, 1.0]
+    assert chart["datasets"][0]["trueValues"] == ["25.0 %", 0]
+
+
+def test_keyset_cursor():
+    obj = Evaluation(created=datetime(2024, 10, 1, 12, 30, tzinfo=timezone.utc))
+    assert decode_cursor(encode_cursor(obj)) == (obj.created, obj.pk)
+
+
+@pytest.mark.parametrize("cursor", ["", "notacursor", "bm90YWN1cnNvcg", "YXxi"])
+def test_keyset_cursor_invalid(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_collect_statistics():
+    counted = []
+
+    def count(model):
+        counted.append(model)
+        return 42
+
+    # Large tables use the estimate, small or unanalyzed tables are counted
+    estimates = {"llms": 10, "prompts": 200000, "responses": 4000000}
+    stats = collect_statistics(estimates, count, limit=100000)
+    assert stats == {
+        "n_llms": 42,
+        "n_evaluations": 42,
+        "n_prompts": 200000,
+        "n_responses": 4000000,
+    }
+    assert counted == [LLM, Evaluation]
+
+
+def matches(q, row):
+    """
+    Evaluates the keyset filter q against a row of field values in Python.
+    """
+    results = []
+    for child in q.children:
+        if isinstance(child, Q):
+            results.append(matches(child, row))
+            continue
+
+        lookup, value = child
+        field, _, op = lookup.rpartition("__")
+        if op not in {"gt", "lt", "isnull"}:
+            field, op = lookup, "exact"
+
+        actual = row[field]
+        results.append({
+            "exact": lambda: actual == value,
+            "isnull": lambda: (actual is None) == value,
+            "gt": lambda: actual is not None and actual > value,
+            "lt": lambda: actual is not None and actual < value,
+        }[op]())
+
+    result = any(results) if q.connector == Q.OR else all(results)
+    return not result if q.negated else result
+
+
+def test_response_sequence_keyset():
+    early, late = datetime(2026, 10, 1), datetime(2026, 10, 2)
+    ids = sorted(uuid.uuid4() for _ in range(3))
+
+    # Keys in review order: by prompt order with unordered prompts last, then newest
+    # prompt first, then by id.
+    keys = [
+        (1, late, ids[0]),
+        (1, early, ids[0]),
+        (1, early, ids[1]),
+        (2, late, ids[2]),
+        (None, late, ids[1]),
+        (None, early, ids[0]),
+        (None, early, ids[2]),
+    ]
+    rows = [dict(zip(KEY_FIELDS, key)) for key in keys]
+
+    for i, key in enumerate(keys):
+        assert [matches(follows(key), row) for row in rows] == [j > i for j in range(7)]
+        assert [matches(precedes(key), row) for row in rows] == [j < i for j in range(7)]
+
+
+@pytest.mark.parametrize(
+    "n_prompts,n_reviewed,expected",
+    [(0, 0, 0), (4, 0, 0), (4, 1, 25), (3, 2, 66), (4, 4, 100)],
+)
+def test_review_task_percent_complete(n_prompts, n_reviewed, expected):
+    task = ReviewTask(n_prompts=n_prompts, n_reviewed=n_reviewed)
+    assert task.percent_complete == expected
+
+
+@pytest.mark.parametrize(
+    "n_prompts,n_reviewed,expected",
+    [(0, 0, False), (4, 0, False), (4, 3, False), (4, 4, True), (3, 4, True)],
+)
+def test_review_task_completed(n_prompts, n_reviewed, expected):
+    assert review_task_completed(n_prompts, n_reviewed) is expected
+
+
+def test_bulk_linkage_nesting():
+    assert current_linkage() is None
+    with bulk_linkage() as outer:
+        with bulk_linkage() as inner:
+            assert inner is outer
+        assert current_linkage() is outer
+    assert current_linkage() is None
+
+    with pytest.raises(ValueError):
+        with bulk_linkage():
+            raise ValueError("rolled back")
+    assert current_linkage() is None
+
+
+def test_bulk_linkage_record():
+    model_id, prompt_id = uuid.uuid4(), uuid.uuid4()
+    prompt = Prompt(id=uuid.uuid4(), evaluation_id=uuid.uuid4())
+
+    # Responses are recorded by evaluation without a query if the prompt is loaded
+    linkage = BulkLinkage()
+    linkage.record(LINKED, Response(model_id=model_id, prompt=prompt))
+    linkage.record(UNLINKED, Response(model_id=model_id, prompt_id=prompt_id))
+
+    assert linkage.pairs[LINKED] == {(model_id, prompt.evaluation_id)}
+    assert linkage.prompts[UNLINKED] == {(model_id, prompt_id)}
+
+
+def test_deletion_steps_order():
+    # Rows must be deleted before the rows that they reference
+    order = [queryset.model for queryset in deletion_steps(Evaluation())]
+    references = [
+        (ResponseReview, Response),
+        (ResponseReview, ReviewTask),
+        (Job, ModelEvaluation),
+        (ReviewTask, ModelEvaluation),
+        (Response, Prompt),
+    ]
+
+    for child, parent in references:
+        assert order.index(child) < order.index(parent)
+
+
+def test_fragment_key():
+    key = fragment_key("evaluation-card", [1, "abc", True])
+    assert key.startswith("parlance:fragment:evaluation-card:")
+    assert key == fragment_key("evaluation-card", [1, "abc", True])
+    assert key != fragment_key("evaluation-card", [1, "abd", True])
+    assert key != fragment_key("evaluation-card", [1, "abc", False])
+
+
+def test_cache_statistics():
+    # Counts are kept in the process until the flush interval has elapsed
+    stats = CacheStatistics(interval=3600)
+    for hit in (True, True, False):
+        stats.record("charts", hit=hit)
+
+    assert stats.counts == {("charts", "hits"): 2, ("charts", "misses"): 1}
+    assert hit_ratio(2, 1) == pytest.approx(0.6667, abs=1e-4)
+    assert hit_ratio(0, 0) is None
+
+
+def test_cachefragment_requires_name():
+    with pytest.raises(TemplateSyntaxError):
+        Template("{% load parlance %}{% cachefragment %}x{% endcachefragment %}")
+
+
+def test_analyze_worker_pool():
+    # Spawned workers must be able to configure Django and run the analysis; each
+    # result is reported (here the model evaluations do not exist) rather than the
+    # workers crashing the pool.
+    pks = [uuid.uuid4() for _ in range(3)]
+    opts = {key: False for key in ANALYSIS_OPTIONS}
+    opts.update(
+        readable_threshold=0.5,
+        factual_threshold=0.5,
+        style_threshold=0.5,
+        helpfulness_metric="mean",
+    )
+
+    results = list(AnalyzeCommand().analyze(pks, opts, workers=2))
+    assert {pk for pk, _, _ in results} == set(pks)
+    for _, _, error in results:
+        assert error is not None
+        assert "AppRegistryNotReady" not in error
+        assert "BrokenProcessPool" not in error
+
+
+@pytest.mark.parametrize(
+    "backend,debug,n_errors",
+    [
+        (LOCMEM_BACKEND, True, 0),
+        (LOCMEM_BACKEND, False, 1),
+        ("django.core.cache.backends.db.DatabaseCache", False, 0),
+    ],
+)
+def test_check_shared_cache(settings, backend, debug, n_errors):
+    settings.DEBUG = debug
+    settings.CACHES = {"default": {"BACKEND": backend}}
+    assert len(check_shared_cache(None)) == n_errors
+
+
+def test_median_is_discrete():
+    # The median is one of the values (as with likert_agreement), not interpolated
+    sql = str(Response.objects.values("model").annotate(m=Median("helpfulness")).query)
+    assert 'PERCENTILE_DISC(0.5) WITHIN GROUP (ORDER BY "responses"."helpfulness" DESC)' in sql
@@ -0,0 +1,285 @@
+# parley.uploads
+# Background ingest of uploaded files with progress reporting.
+#
+# Author:   Benjamin Bengfort <benjamin@rotational.io>
+# Created:  Sun Oct 18 15:24:09 2026 -0500
+#
+# Copyright (C) 2024 Rotational Labs, Inc.
+# For license information, see LICENSE
+#
+# ID: uploads.py [] benjamin@rotational.io $
+
+"""
+Background ingest of uploaded files with progress reporting.
+
+The uploader views store the submitted files as an Upload and enqueue an ingest job
+rather than processing the files in the request. The job re-validates the uploader
+form against the stored files and runs its handle_upload method in a transaction so
+that the ingest is still all or nothing. Progress is reported per file through the
+PARLANCE_PROGRESS_DATABASE connection so that it is visible while the ingest
+transaction is open.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import time
+
+from functools import partial
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from django.db import transaction
+from django.utils.datastructures import MultiValueDict
+
+from parley.exceptions import ParlanceUploadError
+from parley.forms import Uploader, EvaluationUploader
+from parley.stats import statistics_changed
+from parley.linkage import bulk_linkage
+from parley.models import JobStatus, Upload, UploadFile, UploadKind
+
+
+UPLOADERS = {
+    UploadKind.OBJECTS: Uploader,
+    UploadKind.EVALUATION: EvaluationUploader,
+}
+
+
+##########################################################################
+## Storing Uploads
+##########################################################################
+
+
+def store_upload(kind, files, params=None, user=None) -> Upload:
+    """
+    Store the uploaded files (a MultiValueDict such as request.FILES) for ingest by a
+    background job. Must be called in a transaction with the enqueue of the job.
+    """
+    upload = Upload.objects.create(
+        kind=kind,
+        params=params or {},
+        user=user if user is not None and user.is_authenticated else None,
+    )
+
+    for field, uploaded in files.lists():
+        for f in uploaded:
+            UploadFile.objects.create(
+                upload=upload, field=field, name=f.name, file=f, size=f.size
+            )
+
+    return upload
+
+
+def submit_upload(kind, files, params=None, user=None) -> Upload:
+    """
+    Store the uploaded files and enqueue the background job that ingests them.
+    """
+    # Prevent circular import, parley.jobs imports this module to register the task.
+    from parley.jobs import enqueue
+
+    upload = store_upload(kind, files, params=params, user=user)
+    upload.job = enqueue("ingest_upload", upload=upload.id)
+    upload.save(update_fields=["job"])
+    return upload
+
+
+def upload_status(upload) -> dict:
+    """
+    Serializes the status and per-file progress of an upload for polling.
+    """
+    status = {
+        "id": str(upload.id),
+        "status": upload.status,
+        "active": upload.is_active,
+        "error": upload.error,
+        "counts": upload.counts,
+        "evaluation": (
+            upload.evaluation.get_absolute_url() if upload.evaluation_id else None
+        ),
+        "files": [],
+    }
+
+    for f in upload.files.all():
+        rate = f.rows_per_second
+        status["files"].append({
+            "name": f.name,
+            "size": f.size,
+            "bytes_processed": f.bytes_processed,
+            "rows_processed": f.rows_processed,
+            "rows_per_second": round(rate, 1) if rate is not None else None,
+            "percent_complete": f.percent_complete,
+            "completed": f.completed_on is not None,
+        })
+    return status
+
+
+##########################################################################
+## Ingest Progress
+##########################################################################
+
+
+class ProgressFile(File):
+    """
+    Wraps a stored upload file so that it has its original name and so that the
+    number of (possibly compressed) bytes read by the ingest can be reported.
+    """
+
+    def __init__(self, upload_file):
+        super().__init__(upload_file.file.open("rb"), name=upload_file.name)
+        self.upload_file = upload_file
+        self.bytes_processed = 0
+
+    def chunks(self, chunk_size=None):
+        for chunk in super().chunks(chunk_size):
+            self.bytes_processed += len(chunk)
+            yield chunk
+
+
+class IngestProgress(object):
+    """
+    Wraps the JSON lines iterator of an uploader to record the rows and bytes of each
+    file processed at most once every interval seconds.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.using = settings.PARLANCE_PROGRESS_DATABASE
+
+    def __call__(self, f, rows):
+        if not isinstance(f, ProgressFile):
+            yield from rows
+            return
+
+        self.update(f, started_on=timezone.now())
+
+        n_rows = 0
+        last = time.monotonic()
+        for lineno, row in rows:
+            yield lineno, row
+            n_rows = lineno
+
+            if time.monotonic() - last >= self.interval:
+                self.update(f, rows_processed=n_rows, bytes_processed=f.bytes_processed)
+                last = time.monotonic()
+
+        self.update(
+            f,
+            rows_processed=n_rows,
+            bytes_processed=f.bytes_processed,
+            completed_on=timezone.now(),
+        )
+
+    def update(self, f, **fields):
+        fields["modified"] = timezone.now()
+        UploadFile.objects.using(self.using).filter(pk=f.upload_file.pk).update(**fields)
+
+
+##########################################################################
+## Ingest
+##########################################################################
+
+
+def set_status(upload, **fields):
+    """
+    Update the upload outside of the ingest transaction.
+    """
+    using = settings.PARLANCE_PROGRESS_DATABASE
+    Upload.objects.using(using).filter(pk=upload.pk).update(
+        modified=timezone.now(), **fields
+    )
+
+
+def delete_stored_files(upload_files):
+    """
+    Delete the stored copies of the upload files from storage.
+    """
+    for upload_file in upload_files:
+        if upload_file.file:
+            upload_file.file.delete(save=False)
+
+
+def delete_upload_files(upload):
+    """
+    Delete the stored copies of the files of an upload once its ingest has succeeded
+    or failed for good. The file rows are kept so that the progress of the upload can
+    still be reported.
+    """
+    files = UploadFile.objects.using(settings.PARLANCE_PROGRESS_DATABASE).filter(
+        upload=upload
+    )
+    delete_stored_files(files.exclude(file=""))
+    files.update(file="", modified=timezone.now())
+
+
+def ingest(job, upload):
+    """
+    Ingest the files of an upload with its uploader form. Upload errors (e.g. invalid
+    JSON) fail the upload without retrying the job; other errors are raised so that
+    the job is retried. Either way the database is left unchanged on failure. The
+    stored files are deleted once the upload has succeeded or failed for good.
+    """
+    # Prevent circular import, parley.jobs imports this module to register the task.
+    from parley.jobs import enqueue
+
+    upload = Upload.objects.get(pk=upload)
+    set_status(upload, status=JobStatus.RUNNING, error=None)
+
+    files = [ProgressFile(f) for f in upload.files.all()]
+    UploadFile.objects.using(settings.PARLANCE_PROGRESS_DATABASE).filter(
+        upload=upload
+    ).update(rows_processed=0, bytes_processed=0, started_on=None, completed_on=None)
+
+    try:
+        with transaction.atomic(), bulk_linkage():
+            data = MultiValueDict()
+            for f in files:
+                data.appendlist(f.upload_file.field, f)
+
+            form = UPLOADERS[upload.kind](data=upload.params, files=data)
+            if not form.is_valid():
+                raise ParlanceUploadError(
+                    "; ".join(e for errors in form.errors.values() for e in errors)
+                )
+
+            form.progress = IngestProgress()
+            if upload.kind == UploadKind.EVALUATION:
+                evaluation, counts = form.handle_upload()
+                enqueue("process_upload", evaluation=evaluation.id)
+            else:
+                evaluation, counts = None, form.handle_upload()
+
+            # Objects are bulk inserted without signals
+            statistics_changed()
+
+    except ParlanceUploadError as e:
+        set_status(upload, status=JobStatus.FAILED, error=str(e))
+        transaction.on_commit(partial(delete_upload_files, upload))
+        return
+
+    except Exception as e:
+        retrying = job is not None and job.attempts < job.max_attempts
+        set_status(
+            upload,
+            status=JobStatus.QUEUED if retrying else JobStatus.FAILED,
+            error=f"an internal error occurred: {e}",
+        )
+
+        # The job's transaction is rolled back, so the files of an upload that will
+        # not be retried are deleted right away rather than on commit.
+        if not retrying:
+            delete_upload_files(upload)
+        raise
+
+    finally:
+        for f in files:
+            f.close()
+
+    # The evaluation is only visible to this transaction so the upload must be
+    # updated with the default connection rather than the progress connection.
+    upload.status = JobStatus.SUCCEEDED
+    upload.error = None
+    upload.counts = counts.html()
+    upload.evaluation = evaluation
+    upload.save()
+    transaction.on_commit(partial(delete_upload_files, upload))
@@ -17,92 +17,39 @@ Parley views and controllers.
 ## Imports
 ##########################################################################
 
-import csv
-import json
-
-from collections import defaultdict
-
 from django.views import View
+from django.db.models.functions import Coalesce
+from django.db.models import Count, OuterRef, Prefetch, Subquery
 from django.db import transaction
-from django.contrib import messages
 from django.urls import reverse_lazy
 from django.utils.text import slugify
-from django.utils.safestring import mark_safe
 from django.views.generic.edit import FormView
 from django.views.generic import DetailView, ListView, UpdateView, DeleteView
-from django.core.exceptions import SuspiciousOperation
-from django.http import HttpResponse, Http404, HttpResponseNotAllowed
-
-from parley.exceptions import ParlanceUploadError
+from django.core.exceptions import ImproperlyConfigured, SuspiciousOperation
+from django.core.exceptions import ValidationError
+from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponseNotAllowed, HttpResponseBadRequest
+from django.http import HttpResponseRedirect
+from django.http import JsonResponse, StreamingHttpResponse
+
+from parley.aggregates import SubqueryCount
+from parley.cache import cache_version, cache_versions, object_digest
+from parley.charts import evaluation_chart, llm_chart
+from parley.deletion import mark_deleted
+from parley.navigation import response_sequence
+from parley.pagination import KeysetPaginationMixin
+from parley.exports import analytics_csv, gzip_stream, prompts_jsonl
+from parley.exports import COLUMNAR_FORMATS, COLUMNAR_TABLES, columnar_export, pa
+from parley.uploads import submit_upload, upload_status
 from parley.forms import (
     Uploader,
     CreateReviewForm,
     UpdateResponseReviewForm,
     EvaluationUploader,
 )
-from parley.models import LLM, Response, Evaluation, Prompt, ReviewTask, ResponseReview
-
-BOOLEAN_METRICS = {
-    "Similarity": ("similarity_processed", "n_is_similar", "n_not_similar"),
-    "Correct Label": (
-        "labels_processed",
-        "n_labeled_correctly",
-        "n_labeled_incorrectly",
-    ),
-    "Valid Output": (
-        "valid_output_processed",
-        "n_valid_output_type",
-        "n_invalid_output_type",
-    ),
-    "Leaks Sensitive": (
-        "sensitive_processed",
-        "n_leaks_sensitive",
-        "n_no_sensitive_leaks",
-    ),
-    "Is Readable": ("readability_processed", "n_readable", "n_not_readable"),
-    "Is Factual": ("factual_processed", "n_factual", "n_not_factual"),
-    "Is Correct Style": ("style_processed", "n_correct_style", "n_incorrect_style"),
-}
-
-CHART_METRICS = {
-    "Similarity": (
-        "similarity_processed",
-        "percent_similar",
-        "similarity_normalized",
-    ),
-    "Correct Label": ("labels_processed", "labels_percent", "labels_normalized"),
-    "Valid Output": (
-        "valid_output_processed",
-        "percent_valid_output_type",
-        "valid_output_normalized",
-    ),
-    "Leaks Sensitive": (
-        "sensitive_processed",
-        "percent_leaks_sensitive",
-        "sensitive_normalized",
-    ),
-    "Is Readable": (
-        "readability_processed",
-        "percent_readable",
-        "readability_normalized",
-    ),
-    "Is Factual": ("factual_processed", "percent_factual", "factual_normalized"),
-    "Is Correct Style": (
-        "style_processed",
-        "percent_correct_style",
-        "style_normalized",
-    ),
-    "Mean Helpfulness": (
-        "helpfulness_processed",
-        "mean_helpfulness",
-        "mean_helpfulness_normalized",
-    ),
-    "Median Helpfulness": (
-        "helpfulness_processed",
-        "median_helpfulness",
-        "median_helpfulness_normalized",
-    ),
-}
+from parley.models import LLM, Response, Evaluation, ModelEvaluation, Prompt
+from parley.models import ReviewTask, ResponseReview
+from parley.models import Job, Upload, UploadKind
 
 
 ##########################################################################
@@ -117,31 +64,40 @@ class UploaderFormView(FormView):
     success_url = reverse_lazy("upload")
 
     def form_valid(self, form):
-        # Handle the uploaded data stored in the form
-        try:
-            counts = form.handle_upload()
-        except ParlanceUploadError as e:
-            # If an error occurs, stop processing and show the error to the user.
-            form.add_error(None, str(e))
-            return self.form_invalid(form)
-
-        # Create the success message with the counts
-        messages.success(self.request, mark_safe(counts.html()))
+        # Store the uploaded files and ingest them in a background job; the progress
+        # of the ingest is shown on the upload page.
+        submit_upload(UploadKind.OBJECTS, self.request.FILES, user=self.request.user)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["page_id"] = "upload"
+        context["uploads"] = (
+            Upload.objects.filter(user=self.request.user)
+            .select_related("evaluation")
+            .prefetch_related("files")[:5]
+        )
         return context
 
     @transaction.atomic
     def post(self, *args, **kwargs):
         """
-        Ensures that all database operations during a request are all or nothing.
+        Ensures that the upload is only stored if its ingest job is enqueued.
         """
         return super().post(*args, **kwargs)
 
 
+class UploadStatus(View):
+
+    def get(self, request, pk):
+        uploads = Upload.objects.select_related("evaluation")
+        if not request.user.is_staff:
+            uploads = uploads.filter(user=request.user)
+
+        upload = get_object_or_404(uploads, pk=pk)
+        return JsonResponse(upload_status(upload))
+
+
 ##########################################################################
 ## Evaluation Views
 ##########################################################################
@@ -151,23 +107,20 @@ class EvaluationCreate(FormView):
 
     template_name = "evaluation/list.html"
     form_class = EvaluationUploader
-
-    def get_success_url(self):
-        # Redirect to the evaluation detail page after successful upload
-        return reverse_lazy("evaluation-detail", kwargs={"pk": self.evaluation.pk})
+    success_url = reverse_lazy("upload")
 
     def form_valid(self, form):
-        try:
-            evaluation, counts = form.handle_upload()
-        except ParlanceUploadError as e:
-            # If an error occurs, stop processing and show the error to the user.
-            form.add_error(None, str(e))
-            return self.form_invalid(form)
-
-        self.evaluation = evaluation
-        messages.success(
-            self.request,
-            mark_safe(counts.html()),
+        # Store the uploaded files and create the evaluation in a background job; the
+        # progress of the ingest is shown on the upload page.
+        params = {
+            key: form.cleaned_data.get(key, "")
+            for key in ("name", "task", "description")
+        }
+        submit_upload(
+            UploadKind.EVALUATION,
+            self.request.FILES,
+            params=params,
+            user=self.request.user,
         )
         return super().form_valid(form)
 
@@ -177,23 +130,42 @@ class EvaluationCreate(FormView):
     @transaction.atomic
     def post(self, *args, **kwargs):
         """
-        Ensures that all database operations during a request are all or nothing.
+        Ensures that the upload is only stored if its ingest job is enqueued.
         """
         return super().post(*args, **kwargs)
 
 
-class EvaluationList(ListView):
+class EvaluationList(KeysetPaginationMixin, ListView):
 
     model = Evaluation
     template_name = "evaluation/list.html"
     context_object_name = "evaluations"
 
     def get_queryset(self):
-        return super().get_queryset().filter(active=True)
+        return (
+            super()
+            .get_queryset()
+            .filter(active=True, deleted_on=None)
+            .annotate(
+                n_prompts=SubqueryCount(Prompt.objects.filter(evaluation=OuterRef("pk"))),
+                n_models=SubqueryCount(
+                    ModelEvaluation.objects.filter(evaluation=OuterRef("pk"))
+                ),
+            )
+        )
 
     def get_context_data(self, **kwargs):
+        """
+        The cards are cached fragments keyed by the version of their evaluation so
+        that cached cards are not rendered again.
+        """
         context = super().get_context_data(**kwargs)
         context["page_id"] = "evaluation"
+
+        evaluations = context["evaluations"]
+        versions = cache_versions("evaluation", [obj.pk for obj in evaluations])
+        for evaluation in evaluations:
+            evaluation.cache_version = versions.get(evaluation.pk)
         return context
 
 
@@ -203,82 +175,71 @@ class EvaluationDetail(DetailView):
     template_name = "evaluation/detail.html"
     context_object_name = "evaluation"
 
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_on=None)
+
     def get_chart_data(self):
-        # Colors
-        # TODO: Use an actual color palette that we can dynamically select colors from
-        colors = [
-            "rgb(255, 99, 132)",
-            "rgb(54, 162, 235)",
-            "rgb(255, 206, 86)",
-            "rgb(75, 192, 192)",
-            "rgb(153, 102, 255)",
-        ]
-        color_index = 0
-
-        models = self.object.model_evaluations.all()
-        labels = [
-            label
-            for label, (has_metric, _, _) in CHART_METRICS.items()
-            if getattr(models[0], has_metric)
-        ]
-        model_colors = {}
-        for model in models:
-            # Create a color for each model
-            color = colors[color_index % len(colors)]
-            color_index += 1
-            model_colors[str(model.id)] = color
-
-        # Create chart data
-        datasets = []
-        for model in models:
-            dataset = {"label": model.model.name, "data": [], "trueValues": []}
-
-            for metric_name, (
-                processed,
-                true_value,
-                normalized,
-            ) in CHART_METRICS.items():
-                if metric_name not in labels:
-                    continue
-
-                if getattr(model, processed):
-                    dataset["data"].append(getattr(model, normalized))
-                    true_value = round(getattr(model, true_value), 2)
-                    if metric_name in BOOLEAN_METRICS:
-                        # Handle percentages
-                        true_value = f"{true_value} %"
-                    dataset["trueValues"].append(true_value)
-                else:
-                    dataset["data"].append(0)
-                    dataset["trueValues"].append(0)
-
-                dataset["borderColor"] = model_colors[str(model.id)]
-                dataset["backgroundColor"] = model_colors[str(model.id)]
-
-            datasets.append(dataset)
-
-        # Ensure dataset values sum to 1 for each metric
-        for i in range(len(labels)):
-            # Get the values for this metric across all datasets
-            total = sum(
-                [
-                    datasets[j]["data"][i]
-                    for j in range(len(datasets))
-                    if len(datasets[j]["data"]) > 0
-                ]
+        return evaluation_chart(self.object)
+
+    def get_model_evaluations(self):
+        """
+        Fetch the model evaluations with everything the template displays for them
+        in a constant number of queries: the response and reviewer counts are
+        annotated, the user's review task is prefetched, and the latest job of every
+        model evaluation is fetched with a single DISTINCT ON query.
+        """
+        n_responses = (
+            Response.objects.filter(
+                model=OuterRef("model"),
+                prompt__evaluation=OuterRef("evaluation"),
+                prompt__exclude=False,
             )
-            if total > 0:
-                for j in range(len(datasets)):
-                    if len(datasets[j]["data"]) > 0:
-                        datasets[j]["data"][i] /= total
-                        datasets[j]["data"][i] = round(datasets[j]["data"][i], 2)
+            .order_by()
+            .values("model")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
 
-        return {"labels": labels, "datasets": datasets}
+        model_evaluations = list(
+            self.object.model_evaluations.select_related("model")
+            .annotate(
+                n_completed=Coalesce(Subquery(n_responses), 0),
+                n_reviewers=Count("reviewers", distinct=True),
+            )
+            .prefetch_related(
+                Prefetch(
+                    "review_tasks",
+                    queryset=ReviewTask.objects.filter(user=self.request.user),
+                    to_attr="user_review_tasks",
+                )
+            )
+            .order_by("-created")
+        )
+
+        jobs = {
+            job.model_evaluation_id: job
+            for job in Job.objects.filter(model_evaluation__in=model_evaluations)
+            .order_by("model_evaluation_id", "-created")
+            .distinct("model_evaluation_id")
+        }
+
+        for me in model_evaluations:
+            me.evaluation = self.object
+            me.job = jobs.get(me.id, None)
+            me.review_task = me.user_review_tasks[0] if me.user_review_tasks else None
+            me.responses_completed = (
+                me.n_completed / self.n_prompts * 100 if self.n_prompts else 0.0
+            )
+        return model_evaluations
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["page_id"] = "evaluation"
         context["chart"] = self.get_chart_data()
+
+        self.n_prompts = self.object.prompts.count()
+        context["n_prompts"] = self.n_prompts
+        context["model_evaluations"] = self.get_model_evaluations()
         return context
 
 
@@ -297,73 +258,76 @@ class EvaluationDelete(DeleteView):
         """
         return HttpResponseNotAllowed(["POST"])
 
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_on=None)
+
+    def form_valid(self, form):
+        # The evaluation is hidden immediately and its data deleted in the background
+        with transaction.atomic():
+            mark_deleted(self.object)
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class DownloadPrompts(View):
 
     def get(self, request, pk=None):
-        if pk is None or not Evaluation.objects.filter(pk=pk).exists():
-            raise Http404("evaluation not found")
+        evaluation = get_object_or_404(Evaluation, pk=pk, deleted_on=None)
 
-        prompts = Prompt.objects.filter(evaluation__id=pk, exclude=False)
+        # Partial downloads are resumed by skipping the prompts already received
+        try:
+            offset = int(request.GET.get("offset", 0))
+            limit = request.GET.get("limit", None)
+            limit = int(limit) if limit is not None else None
+        except ValueError:
+            return HttpResponseBadRequest("offset and limit must be integers")
 
-        reply = HttpResponse(
-            content_type="application/jsonlines",
-            headers={"Content-Disposition": 'attachment; filename="prompts.jsonl"'},
-        )
+        if offset < 0 or (limit is not None and limit < 0):
+            return HttpResponseBadRequest("offset and limit must not be negative")
 
-        for prompt in prompts:
-            data = {
-                "id": str(prompt.id),
-                "evaluation": str(pk),
-                "system": prompt.system,
-                "prompt": prompt.prompt,
-                "history": prompt.history,
-                "notes": prompt.notes,
-                "expected_output_type": prompt.expected_output_type,
-                "expected_output": prompt.expected_output,
-                "expected_label": prompt.expected_label,
-            }
+        content = prompts_jsonl(evaluation, offset=offset, limit=limit)
+        content_type, filename = "application/jsonlines", "prompts.jsonl"
 
-            reply.write(json.dumps(data) + "\n")
+        if request.GET.get("compress", None) == "gzip":
+            content = gzip_stream(content)
+            content_type, filename = "application/gzip", "prompts.jsonl.gz"
 
-        return reply
+        return StreamingHttpResponse(
+            content,
+            content_type=content_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
 
 
 class DownloadAnalytics(View):
 
     def get(self, request, pk=None):
-        if pk is None or not Evaluation.objects.filter(pk=pk).exists():
-            raise Http404("evaluation not found")
-
-        evaluation = Evaluation.objects.get(pk=pk)
+        evaluation = get_object_or_404(Evaluation, pk=pk, deleted_on=None)
         filename = slugify(f"{evaluation.name}") + ".csv"
 
-        reply = HttpResponse(
+        return StreamingHttpResponse(
+            analytics_csv(evaluation),
             content_type="text/csv",
             headers={"Content-Disposition": f'attachment; filename="{filename}"'},
         )
 
-        fieldnames = ["id", "prompt", "expected"]
-        models = [(llm.id, llm.name, llm.version) for llm in evaluation.llms.all()]
-        for _, name, version in models:
-            fieldnames.append(name + "-" + version)
 
-        prompts = Prompt.objects.filter(evaluation__id=pk, exclude=False)
-        writer = csv.DictWriter(reply, fieldnames=fieldnames)
-        writer.writeheader()
+class ExportEvaluation(View):
 
-        for prompt in prompts:
-            values = [prompt.id, str(prompt), prompt.expected_label]
-            for id, _, _ in models:
-                response = Response.objects.filter(model__id=id, prompt=prompt).first()
-                if response:
-                    values.append(response.label)
-                else:
-                    values.append(None)
+    def get(self, request, pk=None, table=None, fmt=None):
+        evaluation = get_object_or_404(Evaluation, pk=pk, deleted_on=None)
+        if table not in COLUMNAR_TABLES or fmt not in COLUMNAR_FORMATS:
+            raise Http404("unknown export table or format")
 
-            writer.writerow(dict(zip(fieldnames, values)))
+        # Fail before the response starts streaming rather than partway through it
+        if pa is None:
+            raise ImproperlyConfigured("pyarrow is required for columnar exports")
 
-        return reply
+        filename = slugify(f"{evaluation.name}-{table}") + f".{fmt}"
+        return StreamingHttpResponse(
+            columnar_export(evaluation, table, fmt),
+            content_type=COLUMNAR_FORMATS[fmt],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
 
 
 ##########################################################################
@@ -371,12 +335,21 @@ class DownloadAnalytics(View):
 ##########################################################################
 
 
-class LLMList(ListView):
+class LLMList(KeysetPaginationMixin, ListView):
 
     model = LLM
     template_name = "llm/list.html"
     context_object_name = "llms"
 
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .annotate(
+                n_responses=SubqueryCount(Response.objects.filter(model=OuterRef("pk")))
+            )
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["page_id"] = "model"
@@ -390,56 +363,18 @@ class LLMDetail(DetailView):
     context_object_name = "llm"
 
     def get_chart_data(self):
-        # Colors
-        # TODO: Use an actual color palette that we can dynamically select colors from
-        colors = [
-            "rgb(255, 99, 132)",
-            "rgb(54, 162, 235)",
-            "rgb(255, 206, 86)",
-            "rgb(75, 192, 192)",
-            "rgb(153, 102, 255)",
-        ]
-        color_index = 0
-
-        # Perform Aggregation
-        chart = {"labels": [], "datasets": []}
-        evaluations = {}
-        normalized_values = defaultdict(lambda: defaultdict(float))
-        for me in self.object.model_evaluations.all():
-            for metric, (has_metric, value, normalized) in CHART_METRICS.items():
-                if not getattr(me, has_metric):
-                    continue
-
-                # Get the normalized value
-                normalized_value = getattr(me, normalized)
-                normalized_values[metric][str(me.id)] = normalized_value
-                evaluations[str(me.id)] = me.evaluation.name
-
-        # Create the chart data
-        for metric, values in normalized_values.items():
-            chart["labels"].append(metric)
-            for model, value in values.items():
-                for ds in chart["datasets"]:
-                    if ds["label"] == evaluations[model]:
-                        break
-                else:
-                    color = colors[color_index % len(colors)]
-                    color_index += 1
-                    ds = {
-                        "label": evaluations[model],
-                        "data": [],
-                        "borderColor": color,
-                        "backgroundColor": color,
-                    }
-                    chart["datasets"].append(ds)
-                ds["data"].append(value)
-
-        return {key: json.dumps(val) for key, val in chart.items()}
+        return llm_chart(self.object)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["page_id"] = "model"
         context["chart"] = self.get_chart_data()
+
+        # Only queried if the metrics fragment is not cached
+        context["cache_version"] = cache_version("llm", self.object.pk)
+        context["model_evaluations"] = self.object.model_evaluations.filter(
+            evaluation__deleted_on=None
+        ).select_related("evaluation")
         return context
 
 
@@ -454,9 +389,26 @@ class ResponseDetail(DetailView):
     template_name = "response/detail.html"
     context_object_name = "response"
 
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .filter(prompt__evaluation__deleted_on=None)
+            .select_related("model", "prompt__evaluation")
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["page_id"] = "response"
+
+        sequence = response_sequence(
+            self.object.model_id, self.object.prompt.evaluation_id
+        )
+        context.update(sequence.navigation(self.object.pk))
+
+        context["cache_version"] = object_digest(
+            self.object, self.object.prompt, self.object.prompt.evaluation, self.object.model
+        )
         return context
 
 
@@ -487,32 +439,50 @@ class ReviewTaskDetail(DetailView):
     template_name = "reviews/detail.html"
     context_object_name = "review"
 
-    def get_response_object(self, **kwargs):
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .filter(model_evaluation__evaluation__deleted_on=None)
+            .select_related("model_evaluation")
+        )
+
+    def get_response_object(self, sequence, reviewed):
         # If the response is in the query string, fetch it.
         query = self.request.GET.get("response", None)
         if query:
             try:
-                obj = Response.objects.get(pk=query)
-                if (
-                    obj.model != self.object.model
-                    or obj.prompt.evaluation != self.object.evaluation
-                ):
-                    raise Http404
-                return obj
-            except Response.DoesNotExist:
+                obj = Response.objects.select_related("prompt").get(pk=query)
+            except (Response.DoesNotExist, ValidationError):
                 raise Http404
 
-        # Otherwise get the latest response
-        obj = Response.objects.filter(
-            model=self.object.model,
-            prompt__evaluation=self.object.evaluation,
-        ).first()
-        return obj
+            me = self.object.model_evaluation
+            if obj.model_id != me.model_id or obj.prompt.evaluation_id != me.evaluation_id:
+                raise Http404
+            return obj
+
+        # Otherwise get the first response that has not been reviewed yet
+        pk = sequence.next_unreviewed(reviewed) or sequence.first()
+        if pk is None:
+            return None
+        return Response.objects.filter(pk=pk).first()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["page_id"] = "review"
-        context["response"] = self.get_response_object()
+
+        me = self.object.model_evaluation
+        sequence = response_sequence(me.model_id, me.evaluation_id)
+        reviewed = self.object.response_reviews.values_list("response_id", flat=True)
+
+        response = self.get_response_object(sequence, reviewed)
+        context["response"] = response
+        if response is not None:
+            context.update(sequence.navigation(response.pk))
+            following = sequence.next_unreviewed(reviewed, after=response.pk)
+            if following != response.pk:
+                context["next_unreviewed"] = following
+
         context["form"] = UpdateResponseReviewForm(
             instance=self.object.response_reviews.filter(
                 review=context["review"], response=context["response"]